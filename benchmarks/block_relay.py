@@ -0,0 +1,103 @@
+"""Benchmark block propagation with full and compact block relay on loopback.
+
+Starts a network of nodes in this process, gossips transactions until every
+mempool holds them, mines a block on one node and measures how long the block
+takes to reach every node and how many bytes of block messages it took. Run
+from the repository root:
+
+    python -m benchmarks.block_relay --nodes 10 --transactions 500 --rsa
+"""
+import argparse
+import asyncio
+import base64
+import os
+import random
+import time
+from typing import List
+from blockchain.core.block import Block
+from blockchain.core.blockchain import Blockchain
+from blockchain.network.p2p import Node
+from blockchain.wallet.wallet import Wallet
+
+BLOCK_MESSAGES = ('BLOCK', 'CMPCTBLOCK', 'GETBLOCKTXN', 'BLOCKTXN')
+
+def address(rsa: bool, index: int) -> str:
+    # RSA wallet addresses are the base64 encoded public key; senders are Ed25519 wallets
+    return base64.b64encode(os.urandom(450)).decode() if rsa else f"address-{index}"
+
+async def wait_for(condition, timeout: float = 60) -> float:
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("Network did not converge")
+        await asyncio.sleep(0.001)
+    return time.perf_counter() - start
+
+def fund(senders: List[str]) -> List[Block]:
+    """Mine a block rewarding each sender, to be replayed on every node"""
+    source = Blockchain(difficulty=1)
+    for sender in senders:
+        source.mine_pending_transactions(sender)
+    return list(source.iter_blocks(1))
+
+async def run(nodes: int, degree: int, transactions: int, missing: float, rsa: bool, compact: bool) -> dict:
+    random.seed(1)
+    extra = int(transactions * missing)
+    senders = [Wallet() for _ in range(transactions + extra)]
+    funding = fund([sender.address for sender in senders])
+    network = []
+    for _ in range(nodes):
+        node = Node(Blockchain(difficulty=1), compact=compact)
+        for block in funding:
+            node.blockchain.add_block(block)
+        await node.start()
+        network.append(node)
+    for i in range(1, nodes):
+        peers = {random.randrange(i) for _ in range(degree)}
+        for j in peers:
+            await network[i].connect(*network[j].address)
+
+    for i in range(transactions):
+        network[i % nodes].blockchain.add_transaction(senders[i], address(rsa, i + 1), 1, fee=i % 7)
+    await wait_for(lambda: all(len(node.blockchain.pending_transactions) == transactions for node in network))
+
+    miner = network[0].blockchain
+    # Transactions only the miner has, which the others have to fetch; they are kept from gossip
+    listeners = miner.pending_transactions.listeners
+    miner.pending_transactions.listeners = []
+    for i in range(extra):
+        miner.add_transaction(senders[transactions + i], address(rsa, i), 1, fee=9)
+    miner.pending_transactions.listeners = listeners
+
+    before = sum(peer.sent_bytes[name] for node in network for peer in node.peers.values() for name in BLOCK_MESSAGES)
+    block = miner.mine_pending_transactions(address(rsa, 0))
+    start = time.perf_counter()
+    network[0].announce_block(block)
+    await wait_for(lambda: all(node.blockchain.get_latest_block().hash == block.hash for node in network))
+    elapsed = time.perf_counter() - start
+    sent = sum(peer.sent_bytes[name] for node in network for peer in node.peers.values()
+               for name in BLOCK_MESSAGES) - before
+
+    for node in network:
+        await node.stop()
+    return {'seconds': elapsed, 'bytes': sent, 'transactions': len(block.transactions),
+            'block_size': len(str(block.to_dict()))}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=10, help='Nodes in the network')
+    parser.add_argument('--degree', type=int, default=2, help='Outbound connections per node')
+    parser.add_argument('--transactions', type=int, default=500, help='Transactions in the block')
+    parser.add_argument('--missing', type=float, default=0.02,
+                        help='Share of extra block transactions only the miner has')
+    parser.add_argument('--rsa', action='store_true', help='Use RSA-sized recipient addresses')
+    args = parser.parse_args()
+
+    print(f"{'relay':>8} {'ms':>8} {'KB sent':>9} {'KB/node':>8}")
+    for compact in (False, True):
+        stats = asyncio.run(run(args.nodes, args.degree, args.transactions, args.missing, args.rsa, compact))
+        print(f"{'compact' if compact else 'full':>8} {stats['seconds'] * 1000:>8.1f} "
+              f"{stats['bytes'] / 1024:>9.1f} {stats['bytes'] / 1024 / (args.nodes - 1):>8.1f}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Benchmark Ethash hashes per second in light (cache-only) and full dataset mode.
+
+Run from the repository root:
+
+    python -m benchmarks.ethash_modes --full-size 67108864
+"""
+import argparse
+import os
+import tempfile
+import time
+from blockchain.miner.ethash import Ethash, DATASET_SIZE, EPOCH_LENGTH
+
+def hashrate(ethash: Ethash, header: bytes, batch: int, scalar: int) -> tuple:
+    start = time.perf_counter()
+    ethash.hashimoto_batch(header, 0, batch)
+    batch_rate = batch / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for nonce in range(scalar):
+        ethash.hashimoto(header, nonce, ethash.full_size)
+    scalar_rate = scalar / (time.perf_counter() - start)
+    return batch_rate, scalar_rate
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cache-size', type=int, default=Ethash().cache_size, help='Cache size in bytes')
+    parser.add_argument('--full-size', type=int, default=DATASET_SIZE, help='Dataset size in bytes')
+    parser.add_argument('--batch', type=int, default=4096, help='Nonces per hashimoto_batch call')
+    parser.add_argument('--scalar', type=int, default=200, help='Nonces for the scalar hashimoto run')
+    parser.add_argument('--processes', type=int, default=None, help='Processes for dataset generation')
+    args = parser.parse_args()
+
+    header = EPOCH_LENGTH.to_bytes(4, 'big') + os.urandom(60)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        light = Ethash(cache_size=args.cache_size, full_size=args.full_size, cache_dir=cache_dir)
+        full = Ethash(cache_size=args.cache_size, full_size=args.full_size, cache_dir=cache_dir,
+                      full=True, processes=args.processes)
+
+        start = time.perf_counter()
+        light.prepare_cache(1)
+        print(f"cache: {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        full.prepare_cache(1)
+        full.prepare_dataset(1)
+        print(f"dataset: {time.perf_counter() - start:.2f} s for {args.full_size // (1024 * 1024)} MB")
+
+        print(f"{'mode':>6} {'batch H/s':>10} {'scalar H/s':>11}")
+        for name, ethash in (('light', light), ('full', full)):
+            batch_rate, scalar_rate = hashrate(ethash, header, args.batch, args.scalar)
+            print(f"{name:>6} {batch_rate:>10.0f} {scalar_rate:>11.0f}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
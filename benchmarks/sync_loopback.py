@@ -0,0 +1,90 @@
+"""Benchmark headers-first chain sync between nodes on loopback.
+
+Builds a chain, serves it from several seed nodes in this process and syncs a
+fresh node from all of them. Seeds answer block requests after a simulated
+link latency; slow seeds after a longer one, to show ranges being moved to
+faster peers. Run from the repository root:
+
+    python -m benchmarks.sync_loopback --blocks 2000 --seeds 4 --slow 1 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+from blockchain.core.blockchain import Blockchain
+from blockchain.network.p2p import Node, MessageType
+from blockchain.network.sync import ChainSync
+from blockchain.wallet.wallet import Wallet
+
+def build_chain(blocks: int, transactions: int) -> Blockchain:
+    source = Blockchain(difficulty=1)
+    miner = Wallet()
+    # Each block spends under the reward the previous block paid the miner
+    share = source.mining_reward / (2 * transactions)
+    for height in range(blocks):
+        for i in range(transactions if height else 0):
+            source.add_transaction(miner, f"recipient-{i}", share, fee=share * (i % 5) / 5)
+        source.mine_pending_transactions(miner.address)
+    return source
+
+def copy_chain(source: Blockchain, height: int) -> Blockchain:
+    blockchain = Blockchain(difficulty=source.difficulty)
+    blockchain.chain = source.chain[:height + 1]
+    blockchain.rebuild_ledger()
+    return blockchain
+
+def add_latency(node: Node, delay: float) -> None:
+    """Answer block requests after a delay without holding up the connection"""
+    serve = node.handlers[MessageType.GETBLOCKS]
+
+    async def delayed(peer, payload):
+        await asyncio.sleep(delay)
+        await serve(peer, payload)
+
+    async def receive(peer, payload):
+        asyncio.ensure_future(delayed(peer, payload))
+
+    node.handlers[MessageType.GETBLOCKS] = receive
+
+async def run(source: Blockchain, seeds: int, slow: int, latency: float, delay: float) -> dict:
+    height = source.get_latest_block().index
+    nodes = []
+    for i in range(seeds):
+        node = Node(copy_chain(source, height))
+        add_latency(node, delay if i < slow else latency)
+        await node.start()
+        nodes.append(node)
+
+    fresh = Node(Blockchain(difficulty=source.difficulty))
+    await fresh.start()
+    sync = ChainSync(fresh)
+    for node in nodes:
+        await fresh.connect(*node.address)
+    stats = await sync.run()
+    assert fresh.blockchain.get_latest_block().hash == source.get_latest_block().hash
+
+    for node in nodes + [fresh]:
+        await node.stop()
+    return stats
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--blocks', type=int, default=2000, help='Blocks in the chain')
+    parser.add_argument('--transactions', type=int, default=10, help='Transactions per block')
+    parser.add_argument('--seeds', type=int, default=4, help='Nodes serving the chain')
+    parser.add_argument('--slow', type=int, default=1, help='Seeds that answer block requests late')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latency of the seeds in seconds')
+    parser.add_argument('--delay', type=float, default=1.0, help='Latency of the slow seeds in seconds')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    source = build_chain(args.blocks, args.transactions)
+    print(f"chain: {args.blocks} blocks in {time.perf_counter() - start:.2f} s")
+
+    print(f"{'seeds':>5} {'slow':>4} {'blocks/s':>9} {'seconds':>8} {'MB':>7} {'requests':>8} {'rerequests':>10}")
+    for seeds, slow in sorted({(1, 0), (args.seeds, args.slow)}):
+        stats = asyncio.run(run(source, seeds, slow, args.latency, args.delay))
+        print(f"{seeds:>5} {slow:>4} {stats['blocks_per_second']:>9.0f} {stats['seconds']:>8.2f} "
+              f"{stats['bytes_received'] / 1e6:>7.1f} {stats['requests']:>8} {stats['rerequests']:>10}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
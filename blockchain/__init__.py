@@ -1,6 +1,6 @@
-from .core.blockchain import Blockchain
-from .core.block import Block
-from .wallet.wallet import Wallet
-from .miner.miner import Miner
-
+from .core.blockchain import Blockchain
+from .core.block import Block
+from .wallet.wallet import Wallet
+from .miner.miner import Miner
+
 __version__ = '0.1.0' 
\ No newline at end of file
@@ -1,100 +1,151 @@
-import click
-import json
-from ..core.blockchain import Blockchain
-from ..wallet.wallet import Wallet
-from ..miner.miner import Miner
-
-@click.group()
-def cli():
-    """Blockchain CLI tool"""
-    pass
-
-@cli.command()
-@click.option('--difficulty', default=4, help='Mining difficulty')
-def init(difficulty):
-    """Initialize a new blockchain"""
-    blockchain = Blockchain(difficulty)
-    wallet = Wallet()
-    
-    # Save blockchain and wallet data
-    with open('blockchain.json', 'w') as f:
-        json.dump(blockchain.to_dict(), f, indent=4)
-    
-    with open('wallet.json', 'w') as f:
-        json.dump(wallet.to_dict(), f, indent=4)
-    
-    click.echo(f"Blockchain initialized with difficulty {difficulty}")
-    click.echo(f"Wallet address: {wallet.address}")
-
-@cli.command()
-def balance():
-    """Check wallet balance"""
-    try:
-        with open('blockchain.json', 'r') as f:
-            blockchain_data = json.load(f)
-        with open('wallet.json', 'r') as f:
-            wallet_data = json.load(f)
-        
-        blockchain = Blockchain()
-        blockchain.chain = blockchain_data['chain']
-        balance = blockchain.get_balance(wallet_data['address'])
-        click.echo(f"Balance: {balance}")
-    except FileNotFoundError:
-        click.echo("Blockchain not initialized. Run 'init' first.")
-
-@cli.command()
-@click.argument('recipient')
-@click.argument('amount', type=float)
-def send(recipient, amount):
-    """Send coins to another address"""
-    try:
-        with open('blockchain.json', 'r') as f:
-            blockchain_data = json.load(f)
-        with open('wallet.json', 'r') as f:
-            wallet_data = json.load(f)
-        
-        blockchain = Blockchain()
-        blockchain.chain = blockchain_data['chain']
-        wallet = Wallet.from_dict(wallet_data)
-        
-        # Create and sign transaction
-        transaction = {
-            'from': wallet.address,
-            'to': recipient,
-            'amount': amount
-        }
-        signature = wallet.sign_transaction(transaction)
-        transaction['signature'] = signature
-        
-        # Add transaction to blockchain
-        blockchain.add_transaction(wallet.address, recipient, amount)
-        
-        # Save updated blockchain
-        with open('blockchain.json', 'w') as f:
-            json.dump(blockchain.to_dict(), f, indent=4)
-        
-        click.echo(f"Transaction sent: {amount} to {recipient}")
-    except FileNotFoundError:
-        click.echo("Blockchain not initialized. Run 'init' first.")
-
-@cli.command()
-def mine():
-    """Start mining"""
-    try:
-        with open('blockchain.json', 'r') as f:
-            blockchain_data = json.load(f)
-        with open('wallet.json', 'r') as f:
-            wallet_data = json.load(f)
-        
-        blockchain = Blockchain()
-        blockchain.chain = blockchain_data['chain']
-        wallet = Wallet.from_dict(wallet_data)
-        
-        miner = Miner(blockchain, wallet)
-        click.echo("Starting mining...")
-        miner.start_mining()
-    except FileNotFoundError:
-        click.echo("Blockchain not initialized. Run 'init' first.")
-
-if __name__ == '__main__':
+import click
+import json
+import os
+import shutil
+from ..core.blockchain import Blockchain
+from ..wallet.wallet import Wallet
+from ..wallet.keystore import Keystore
+from ..miner.miner import Miner
+
+CHAIN_DIR = 'chaindata'
+LEGACY_CHAIN_FILE = 'blockchain.json'
+KEYSTORE_FILE = 'keystore.dat'
+
+@click.group()
+def cli():
+    """Blockchain CLI tool"""
+    pass
+
+@cli.command()
+@click.option('--difficulty', default=4, help='Mining difficulty')
+@click.option('--key-type', default='ed25519', type=click.Choice(['ed25519', 'rsa']), help='Wallet key type')
+def init(difficulty, key_type):
+    """Initialize a new blockchain"""
+    # Start from a fresh chain
+    if os.path.isdir(CHAIN_DIR):
+        shutil.rmtree(CHAIN_DIR)
+    blockchain = Blockchain.open(CHAIN_DIR, difficulty, create=True)
+    blockchain.close()
+    wallet = Wallet(key_type)
+    
+    # Save wallet data
+    with open('wallet.json', 'w') as f:
+        json.dump(wallet.to_dict(), f, indent=4)
+    
+    click.echo(f"Blockchain initialized with difficulty {difficulty}")
+    click.echo(f"Wallet address: {wallet.address}")
+
+@cli.command()
+@click.option('--height', default=None, type=int, help='Block height to query the balance at')
+def balance(height):
+    """Check wallet balance"""
+    try:
+        with open('wallet.json', 'r') as f:
+            wallet_data = json.load(f)
+        
+        blockchain = Blockchain.open(CHAIN_DIR, legacy_file=LEGACY_CHAIN_FILE)
+        balance = blockchain.get_balance(wallet_data['address'], height)
+        click.echo(f"Balance: {balance}")
+    except FileNotFoundError:
+        click.echo("Blockchain not initialized. Run 'init' first.")
+    except ValueError as e:
+        click.echo(f"Error: {e}")
+
+@cli.command()
+@click.argument('recipient')
+@click.argument('amount', type=float)
+@click.option('--fee', default=0.0, type=float, help='Transaction fee, higher fees are mined first')
+def send(recipient, amount, fee):
+    """Send coins to another address"""
+    try:
+        with open('wallet.json', 'r') as f:
+            wallet_data = json.load(f)
+        
+        blockchain = Blockchain.open(CHAIN_DIR, legacy_file=LEGACY_CHAIN_FILE)
+        wallet = Wallet.from_dict(wallet_data)
+        
+        # Sign the transaction and add it to the blockchain
+        transaction = blockchain.add_transaction(wallet, recipient, amount, fee)
+        blockchain.close()
+        
+        if transaction is not None:
+            click.echo(f"Transaction sent: {amount} to {recipient}")
+        else:
+            click.echo("Transaction rejected: invalid amount or fee, insufficient balance, duplicate or fee too low for the full mempool")
+    except FileNotFoundError:
+        click.echo("Blockchain not initialized. Run 'init' first.")
+
+@cli.command()
+@click.option('--processes', default=None, type=int, help='Number of mining processes (default: all cores)')
+def mine(processes):
+    """Start mining"""
+    try:
+        with open('wallet.json', 'r') as f:
+            wallet_data = json.load(f)
+        
+        blockchain = Blockchain.open(CHAIN_DIR, legacy_file=LEGACY_CHAIN_FILE)
+        wallet = Wallet.from_dict(wallet_data)
+        
+        miner = Miner(blockchain, wallet, processes)
+        click.echo(f"Starting mining with {miner.engine.processes} processes...")
+        miner.start_mining()
+    except FileNotFoundError:
+        click.echo("Blockchain not initialized. Run 'init' first.")
+
+@cli.command()
+@click.option('--full', is_flag=True, help='Revalidate from genesis instead of the last checkpoint')
+@click.option('--processes', default=None, type=int, help='Number of validation processes (default: all cores)')
+def validate(full, processes):
+    """Validate the blockchain"""
+    try:
+        blockchain = Blockchain.open(CHAIN_DIR, legacy_file=LEGACY_CHAIN_FILE)
+    except FileNotFoundError:
+        click.echo("Blockchain not initialized. Run 'init' first.")
+        return
+
+    if processes is not None:
+        blockchain.validator.processes = processes
+
+    def report(progress):
+        click.echo(f"Checked {progress['checked']}/{progress['end'] - progress['start']} blocks "
+                   f"up to height {progress['height']} ({progress['blocks_per_second']:.0f} blocks/s)")
+
+    valid = blockchain.is_chain_valid(full, report)
+    result = blockchain.validator.report
+    if valid:
+        click.echo(f"Blockchain is valid up to height {result['height']} "
+                   f"({result['checked']} blocks checked in {result['elapsed']:.2f}s)")
+    else:
+        click.echo(f"Invalid block at height {result['invalid_height']}: {result['reason']}")
+    blockchain.close()
+
+@cli.group()
+def account():
+    """Manage keystore accounts"""
+    pass
+
+@account.command('new')
+@click.option('--count', default=1, help='Number of accounts to create')
+@click.option('--key-type', default='ed25519', type=click.Choice(['ed25519', 'rsa']), help='Wallet key type')
+@click.option('--encrypt', is_flag=True, help='Encrypt the new accounts with a password')
+def account_new(count, key_type, encrypt):
+    """Create accounts in the keystore"""
+    password = click.prompt('Password', hide_input=True, confirmation_prompt=True) if encrypt else None
+    keystore = Keystore(KEYSTORE_FILE, password)
+    wallets = [Wallet(key_type) for _ in range(count)]
+    keystore.add(*wallets)
+    for wallet in wallets:
+        click.echo(f"Account created: {wallet.address}")
+
+@account.command('list')
+def account_list():
+    """List the accounts in the keystore"""
+    keystore = Keystore(KEYSTORE_FILE)
+    for address in keystore:
+        entry = keystore.index[address]
+        encrypted = ', encrypted' if entry.get('encrypted') else ''
+        click.echo(f"{address} ({entry['key_type']}{encrypted})")
+    click.echo(f"{len(keystore)} accounts")
+
+if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -0,0 +1,25 @@
+from typing import Dict, Any
+from .contract import GAS_LIMITS
+
+# Timestamp of the genesis block, fixed so that separately created nodes share it
+GENESIS_TIMESTAMP = 1704067200.0  # 2024-01-01 00:00:00 UTC
+
+# Maximum serialized size of the transactions in a block (in bytes)
+MAX_BLOCK_SIZE = 1024 * 1024  # 1MB
+
+# Maximum total gas of the transactions in a block
+MAX_BLOCK_GAS = 30000000
+
+def transaction_gas(transaction: Dict[str, Any]) -> int:
+    """Gas a transaction counts against the block gas limit"""
+    return transaction.get('gas', GAS_LIMITS['transfer'])
+
+def transaction_fee_paid(transaction: Dict[str, Any]) -> float:
+    """Coins a transaction pays the miner: its fee, or gas times gas price for contract calls"""
+    if 'fee' in transaction:
+        return transaction['fee']
+    return transaction_gas(transaction) * transaction.get('gas_price', 0)
+
+def transaction_cost(transaction: Dict[str, Any]) -> float:
+    """Coins taken from the sender: the amount plus the fee"""
+    return transaction['amount'] + transaction_fee_paid(transaction)
\ No newline at end of file
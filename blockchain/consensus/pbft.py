@@ -1,220 +1,565 @@
-from enum import Enum
-from typing import Dict, List, Any, Set
-import time
-import json
-import hashlib
-from ..core.block import Block
-
-class MessageType(Enum):
-    REQUEST = 'REQUEST'
-    PRE_PREPARE = 'PRE_PREPARE'
-    PREPARE = 'PREPARE'
-    COMMIT = 'COMMIT'
-    REPLY = 'REPLY'
-
-class PBFTNode:
-    def __init__(self, node_id: str, nodes: List[str]):
-        self.node_id = node_id
-        self.nodes = nodes  # List of all node IDs
-        self.n = len(nodes)  # Total number of nodes
-        self.f = (self.n - 1) // 3  # Maximum number of faulty nodes
-        
-        # State
-        self.view = 0
-        self.seq_num = 0
-        self.primary = self.nodes[self.view % self.n]
-        
-        # Message logs
-        self.request_log: Dict[str, Dict] = {}
-        self.pre_prepare_log: Dict[str, Dict] = {}
-        self.prepare_log: Dict[str, Dict] = {}
-        self.commit_log: Dict[str, Dict] = {}
-        
-        # Message counters
-        self.prepare_count: Dict[str, int] = {}
-        self.commit_count: Dict[str, int] = {}
-        
-        # Block cache
-        self.block_cache: Dict[str, Block] = {}
-
-    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle a client request"""
-        if self.node_id != self.primary:
-            return {'type': 'error', 'message': 'Not primary node'}
-        
-        # Generate request ID
-        request_id = self._generate_request_id(request)
-        
-        # Create pre-prepare message
-        pre_prepare = {
-            'type': MessageType.PRE_PREPARE,
-            'view': self.view,
-            'seq_num': self.seq_num,
-            'request_id': request_id,
-            'request': request,
-            'digest': self._hash_request(request)
-        }
-        
-        # Log the request and pre-prepare message
-        self.request_log[request_id] = request
-        self.pre_prepare_log[request_id] = pre_prepare
-        
-        # Broadcast pre-prepare message
-        return pre_prepare
-
-    def handle_pre_prepare(self, message: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle a pre-prepare message"""
-        # Verify the message
-        if not self._verify_pre_prepare(message):
-            return {'type': 'error', 'message': 'Invalid pre-prepare message'}
-        
-        request_id = message['request_id']
-        request = message['request']
-        
-        # Log the request and pre-prepare message
-        self.request_log[request_id] = request
-        self.pre_prepare_log[request_id] = message
-        
-        # Create prepare message
-        prepare = {
-            'type': MessageType.PREPARE,
-            'view': self.view,
-            'seq_num': message['seq_num'],
-            'request_id': request_id,
-            'digest': message['digest']
-        }
-        
-        # Initialize prepare counter
-        self.prepare_count[request_id] = 1
-        
-        return prepare
-
-    def handle_prepare(self, message: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle a prepare message"""
-        # Verify the message
-        if not self._verify_prepare(message):
-            return {'type': 'error', 'message': 'Invalid prepare message'}
-        
-        request_id = message['request_id']
-        
-        # Update prepare counter
-        self.prepare_count[request_id] = self.prepare_count.get(request_id, 0) + 1
-        
-        # Check if we have enough prepare messages
-        if self.prepare_count[request_id] >= 2 * self.f + 1:
-            # Create commit message
-            commit = {
-                'type': MessageType.COMMIT,
-                'view': self.view,
-                'seq_num': message['seq_num'],
-                'request_id': request_id,
-                'digest': message['digest']
-            }
-            
-            # Initialize commit counter
-            self.commit_count[request_id] = 1
-            
-            return commit
-        
-        return None
-
-    def handle_commit(self, message: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle a commit message"""
-        # Verify the message
-        if not self._verify_commit(message):
-            return {'type': 'error', 'message': 'Invalid commit message'}
-        
-        request_id = message['request_id']
-        
-        # Update commit counter
-        self.commit_count[request_id] = self.commit_count.get(request_id, 0) + 1
-        
-        # Check if we have enough commit messages
-        if self.commit_count[request_id] >= 2 * self.f + 1:
-            # Execute the request
-            request = self.request_log[request_id]
-            return self._execute_request(request)
-        
-        return None
-
-    def _verify_pre_prepare(self, message: Dict[str, Any]) -> bool:
-        """Verify a pre-prepare message"""
-        # Check if the primary is correct
-        if message['view'] % self.n != self.nodes.index(self.primary):
-            return False
-        
-        # Check if the request hash matches
-        request = message['request']
-        if message['digest'] != self._hash_request(request):
-            return False
-        
-        return True
-
-    def _verify_prepare(self, message: Dict[str, Any]) -> bool:
-        """Verify a prepare message"""
-        request_id = message['request_id']
-        
-        # Check if we have the corresponding pre-prepare message
-        if request_id not in self.pre_prepare_log:
-            return False
-        
-        pre_prepare = self.pre_prepare_log[request_id]
-        
-        # Check if the view and sequence number match
-        if (message['view'] != pre_prepare['view'] or 
-            message['seq_num'] != pre_prepare['seq_num'] or
-            message['digest'] != pre_prepare['digest']):
-            return False
-        
-        return True
-
-    def _verify_commit(self, message: Dict[str, Any]) -> bool:
-        """Verify a commit message"""
-        request_id = message['request_id']
-        
-        # Check if we have the corresponding pre-prepare message
-        if request_id not in self.pre_prepare_log:
-            return False
-        
-        pre_prepare = self.pre_prepare_log[request_id]
-        
-        # Check if the view and sequence number match
-        if (message['view'] != pre_prepare['view'] or 
-            message['seq_num'] != pre_prepare['seq_num'] or
-            message['digest'] != pre_prepare['digest']):
-            return False
-        
-        return True
-
-    def _execute_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a request and return the result"""
-        # This is where you would execute the actual request
-        # For example, adding a block to the blockchain
-        return {
-            'type': MessageType.REPLY,
-            'view': self.view,
-            'request_id': self._generate_request_id(request),
-            'result': 'success'
-        }
-
-    def _generate_request_id(self, request: Dict[str, Any]) -> str:
-        """Generate a unique request ID"""
-        request_str = json.dumps(request, sort_keys=True)
-        return hashlib.sha256(request_str.encode()).hexdigest()
-
-    def _hash_request(self, request: Dict[str, Any]) -> str:
-        """Hash a request"""
-        request_str = json.dumps(request, sort_keys=True)
-        return hashlib.sha256(request_str.encode()).hexdigest()
-
-    def change_view(self) -> None:
-        """Change the view (primary node)"""
-        self.view += 1
-        self.primary = self.nodes[self.view % self.n]
-        # Reset message logs and counters
-        self.request_log.clear()
-        self.pre_prepare_log.clear()
-        self.prepare_log.clear()
-        self.commit_log.clear()
-        self.prepare_count.clear()
-        self.commit_count.clear() 
\ No newline at end of file
+from enum import Enum
+from typing import Dict, List, Any, Set, Optional, Tuple
+from collections import Counter
+import time
+import json
+import hashlib
+from ..core.block import Block
+
+# Most requests the primary puts in one PRE_PREPARE
+BATCH_SIZE = 100
+# Seconds a partial batch waits for more requests before it is proposed anyway
+BATCH_TIMEOUT = 0.05
+# Sequence numbers that may be in flight above the low watermark
+WATERMARK_WINDOW = 16
+# Sequence numbers between checkpoints; the low watermark is the last stable checkpoint
+CHECKPOINT_INTERVAL = 8
+
+class MessageType(Enum):
+    REQUEST = 'REQUEST'
+    PRE_PREPARE = 'PRE_PREPARE'
+    PREPARE = 'PREPARE'
+    COMMIT = 'COMMIT'
+    REPLY = 'REPLY'
+    CHECKPOINT = 'CHECKPOINT'
+    STATE_REQUEST = 'STATE_REQUEST'
+    STATE = 'STATE'
+
+class PBFTNode:
+    """A PBFT replica ordering batches of client requests.
+
+    The primary collects requests into batches of up to batch_size, proposing a
+    partial batch once its oldest request has waited batch_timeout, and gives
+    each batch the next sequence number. Any sequence number between the low
+    and high watermark may be in flight at once. Batches are delivered in
+    sequence order as they commit, each one becoming a block when the node has
+    a blockchain. Requests that are not valid transactions at delivery are
+    left out of the block, the same ones on every node, and answered with a
+    'rejected' reply. PBFT blocks carry no proof of work, so the blockchain
+    must be a separate one with difficulty 0.
+
+    Every checkpoint_interval sequence numbers each node votes for a digest of
+    its state. A checkpoint with 2f+1 matching votes is stable: it becomes the
+    low watermark and the logs below it are dropped. A node that sees a stable
+    checkpoint it has not reached asks one of the voters for the blocks up to
+    it, checking them against the agreed digest before applying them. With a
+    blockchain the state digest is the hash of the tip block.
+
+    The handlers return the messages to send on: REPLYs for the clients,
+    STATE_REQUESTs and STATEs for the node named in 'to', and everything else
+    for all other nodes.
+    """
+
+    def __init__(self, node_id: str, nodes: List[str], blockchain=None,
+                 batch_size: int = BATCH_SIZE, batch_timeout: float = BATCH_TIMEOUT,
+                 window: int = WATERMARK_WINDOW, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+        self.node_id = node_id
+        self.nodes = nodes  # List of all node IDs
+        self.n = len(nodes)  # Total number of nodes
+        self.f = (self.n - 1) // 3  # Maximum number of faulty nodes
+        self.blockchain = blockchain  # Committed batches are appended as blocks
+        if blockchain is not None and blockchain.difficulty != 0:
+            raise ValueError("PBFT blocks have no proof of work; use a blockchain with difficulty 0")
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.window = window
+        self.checkpoint_interval = checkpoint_interval
+        if window < checkpoint_interval:
+            # The window only moves at checkpoints, so it has to reach the next one
+            raise ValueError("Watermark window must cover a checkpoint interval")
+
+        # State
+        self.view = 0
+        self.seq_num = 0  # Last sequence number assigned by this node as primary
+        self.last_executed = 0  # Last sequence number delivered
+        # Tip block hash, or without a blockchain a chained digest of the delivered batches
+        self.state_digest = '0' * 64 if blockchain is None else blockchain.get_latest_block().hash
+        self.primary = self.nodes[self.view % self.n]
+
+        # Requests waiting for the primary to batch them, with their arrival times
+        self.pending_requests: List[Tuple[str, Dict[str, Any], float]] = []
+
+        # Message logs, by sequence number except for requests
+        self.request_log: Dict[str, Dict] = {}
+        self.pre_prepare_log: Dict[int, Dict] = {}
+        self.prepare_log: Dict[int, Dict[str, str]] = {}  # Digest voted for by each node
+        self.commit_log: Dict[int, Dict[str, str]] = {}
+
+        # Message counters, counting votes for the pre-prepared digest
+        self.prepare_count: Dict[int, int] = {}
+        self.commit_count: Dict[int, int] = {}
+
+        # Sequence numbers this node has sent a commit for, and those waiting for delivery
+        self.prepared: Set[int] = set()
+        self.committed: Set[int] = set()
+
+        # Messages up to a window above the high watermark, from nodes a little ahead of this one
+        self.early_messages: Dict[Tuple[str, int, str], Dict] = {}
+
+        # Own checkpoints from the stable one up, with the chain height at each
+        self.stable_checkpoint = 0
+        self.checkpoints: Dict[int, Dict[str, Any]] = {0: {'digest': self.state_digest, 'height': self._height()}}
+        # Digest voted for by each node, for checkpoints above the stable one
+        self.checkpoint_votes: Dict[int, Dict[str, str]] = {}
+        self.requested_state = 0  # Stable checkpoint this node has asked for the state of
+
+        # Block cache
+        self.block_cache: Dict[str, Block] = {}
+
+    @property
+    def low_watermark(self) -> int:
+        return self.stable_checkpoint
+
+    @property
+    def high_watermark(self) -> int:
+        return self.low_watermark + self.window
+
+    def handle_request(self, request: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Handle a client request, returning any batches it completes"""
+        if self.node_id != self.primary:
+            return [{'type': 'error', 'message': 'Not primary node'}]
+
+        # Only signed transactions are batched; nonces and balances are checked at delivery
+        if self.blockchain is not None and not self.blockchain.verify_transaction(request):
+            return [{'type': 'error', 'message': 'Invalid transaction'}]
+
+        # Generate request ID and ignore requests already being ordered
+        request_id = self._generate_request_id(request)
+        if request_id in self.request_log:
+            return []
+        self.request_log[request_id] = request
+
+        self.pending_requests.append((request_id, request, time.time() if now is None else now))
+        return self._propose()
+
+    def tick(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Propose a partial batch whose oldest request has waited long enough"""
+        if self.node_id != self.primary or not self.pending_requests:
+            return []
+        now = time.time() if now is None else now
+        return self._propose(now - self.pending_requests[0][2] >= self.batch_timeout)
+
+    def _propose(self, flush: bool = False) -> List[Dict[str, Any]]:
+        """Cut pending requests into pre-prepares while the watermark window has room"""
+        messages = []
+        while self.pending_requests and self.seq_num < self.high_watermark:
+            if len(self.pending_requests) < self.batch_size and not flush:
+                break
+            batch = self.pending_requests[:self.batch_size]
+            del self.pending_requests[:self.batch_size]
+            self.seq_num += 1
+
+            # Create pre-prepare message
+            requests = [request for _, request, _ in batch]
+            timestamp = time.time()
+            pre_prepare = {
+                'type': MessageType.PRE_PREPARE,
+                'view': self.view,
+                'seq_num': self.seq_num,
+                'node_id': self.node_id,
+                'request_ids': [request_id for request_id, _, _ in batch],
+                'requests': requests,
+                'timestamp': timestamp,
+                'digest': self._hash_batch(requests, timestamp, self.node_id)
+            }
+
+            # Log the pre-prepare, which stands for the primary's prepare
+            self.pre_prepare_log[self.seq_num] = pre_prepare
+            self._vote(self.prepare_log, self.prepare_count, pre_prepare)
+            messages.append(pre_prepare)
+        return messages
+
+    def handle_pre_prepare(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle a pre-prepare message"""
+        if self._defer(message):
+            return []
+
+        # Verify the message
+        if not self._verify_pre_prepare(message):
+            return [{'type': 'error', 'message': 'Invalid pre-prepare message'}]
+
+        seq_num = message['seq_num']
+        if seq_num in self.pre_prepare_log:
+            return []
+
+        # Log the requests and pre-prepare message
+        for request_id, request in zip(message['request_ids'], message['requests']):
+            self.request_log[request_id] = request
+        self.pre_prepare_log[seq_num] = message
+
+        # Create prepare message
+        prepare = {
+            'type': MessageType.PREPARE,
+            'view': self.view,
+            'seq_num': seq_num,
+            'node_id': self.node_id,
+            'digest': message['digest']
+        }
+
+        # Count the primary's and our own vote, and any prepares that arrived first
+        self._vote(self.prepare_log, self.prepare_count, message)
+        self._vote(self.prepare_log, self.prepare_count, prepare)
+        self._recount(seq_num)
+        return [prepare] + self._advance(seq_num)
+
+    def handle_prepare(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle a prepare message"""
+        if self._defer(message):
+            return []
+
+        # Verify the message
+        if not self._verify_vote(message):
+            return [{'type': 'error', 'message': 'Invalid prepare message'}]
+        if message['seq_num'] <= self.low_watermark:
+            return []  # Late vote for a delivered batch
+
+        self._vote(self.prepare_log, self.prepare_count, message)
+        return self._advance(message['seq_num'])
+
+    def handle_commit(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle a commit message"""
+        if self._defer(message):
+            return []
+
+        # Verify the message
+        if not self._verify_vote(message):
+            return [{'type': 'error', 'message': 'Invalid commit message'}]
+        if message['seq_num'] <= self.low_watermark:
+            return []  # Late vote for a delivered batch
+
+        self._vote(self.commit_log, self.commit_count, message)
+        return self._advance(message['seq_num'])
+
+    def _defer(self, message: Dict[str, Any]) -> bool:
+        """Keep a message just above the window until the low watermark catches up"""
+        seq_num = message['seq_num']
+        if message['view'] != self.view or message['node_id'] not in self.nodes:
+            return False
+        if not self.high_watermark < seq_num <= self.high_watermark + self.window:
+            return False
+        self.early_messages[(message['type'].value, seq_num, message['node_id'])] = message
+        return True
+
+    def _replay(self) -> List[Dict[str, Any]]:
+        """Handle the early messages that the window has moved up to"""
+        handlers = {
+            MessageType.PRE_PREPARE: self.handle_pre_prepare,
+            MessageType.PREPARE: self.handle_prepare,
+            MessageType.COMMIT: self.handle_commit
+        }
+        ready = sorted((key for key in self.early_messages if key[1] <= self.high_watermark), key=lambda key: key[1])
+        messages = []
+        for key in ready:
+            message = self.early_messages.pop(key, None)
+            if message is not None:
+                messages.extend(handlers[message['type']](message))
+        return messages
+
+    def _vote(self, log: Dict[int, Dict[str, str]], count: Dict[int, int], message: Dict[str, Any]) -> None:
+        """Record a node's vote, counting it if it matches the pre-prepared digest"""
+        seq_num = message['seq_num']
+        votes = log.setdefault(seq_num, {})
+        if message['node_id'] in votes:
+            return
+        votes[message['node_id']] = message['digest']
+        pre_prepare = self.pre_prepare_log.get(seq_num)
+        if pre_prepare is not None and message['digest'] == pre_prepare['digest']:
+            count[seq_num] = count.get(seq_num, 0) + 1
+
+    def _recount(self, seq_num: int) -> None:
+        """Count the votes that arrived before the pre-prepare"""
+        digest = self.pre_prepare_log[seq_num]['digest']
+        for log, count in ((self.prepare_log, self.prepare_count), (self.commit_log, self.commit_count)):
+            votes = log.get(seq_num, {})
+            count[seq_num] = sum(1 for vote in votes.values() if vote == digest)
+
+    def _advance(self, seq_num: int) -> List[Dict[str, Any]]:
+        """Send a commit once prepared and deliver once committed"""
+        if seq_num not in self.pre_prepare_log:
+            return []
+        messages = []
+        quorum = 2 * self.f + 1
+
+        # Check if we have enough prepare messages
+        if seq_num not in self.prepared and self.prepare_count.get(seq_num, 0) >= quorum:
+            self.prepared.add(seq_num)
+            commit = {
+                'type': MessageType.COMMIT,
+                'view': self.view,
+                'seq_num': seq_num,
+                'node_id': self.node_id,
+                'digest': self.pre_prepare_log[seq_num]['digest']
+            }
+            self._vote(self.commit_log, self.commit_count, commit)
+            messages.append(commit)
+
+        # Check if we have enough commit messages
+        if (seq_num in self.prepared and seq_num > self.last_executed and
+                self.commit_count.get(seq_num, 0) >= quorum):
+            self.committed.add(seq_num)
+            messages.extend(self._deliver())
+        return messages
+
+    def _deliver(self) -> List[Dict[str, Any]]:
+        """Execute committed batches in sequence order, voting for each checkpoint reached"""
+        messages = []
+        while self.last_executed + 1 in self.committed:
+            self.committed.discard(self.last_executed + 1)
+            messages.extend(self._execute_batch(self.pre_prepare_log[self.last_executed + 1]))
+            if self.last_executed % self.checkpoint_interval == 0:
+                messages.extend(self._checkpoint())
+        return messages
+
+    def _checkpoint(self) -> List[Dict[str, Any]]:
+        """Snapshot the state at the last executed sequence number and vote for it"""
+        seq_num = self.last_executed
+        self.checkpoints[seq_num] = {'digest': self.state_digest, 'height': self._height()}
+        checkpoint = {
+            'type': MessageType.CHECKPOINT,
+            'seq_num': seq_num,
+            'node_id': self.node_id,
+            'digest': self.state_digest
+        }
+        self.checkpoint_votes.setdefault(seq_num, {})[self.node_id] = self.state_digest
+        return [checkpoint] + self._stabilize(seq_num)
+
+    def handle_checkpoint(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Handle a checkpoint vote"""
+        seq_num = message['seq_num']
+        if message['node_id'] not in self.nodes or seq_num % self.checkpoint_interval:
+            return [{'type': 'error', 'message': 'Invalid checkpoint message'}]
+        if seq_num <= self.stable_checkpoint:
+            return []
+
+        # Keep only the latest few votes of each node, enough to cover the window
+        self.checkpoint_votes.setdefault(seq_num, {})[message['node_id']] = message['digest']
+        voted = sorted(seq for seq, votes in self.checkpoint_votes.items() if message['node_id'] in votes)
+        for seq in voted[:-(self.window // self.checkpoint_interval + 1)]:
+            del self.checkpoint_votes[seq][message['node_id']]
+            if not self.checkpoint_votes[seq]:
+                del self.checkpoint_votes[seq]
+        return self._stabilize(seq_num, message['node_id'])
+
+    def _stable_digest(self, seq_num: int) -> Optional[str]:
+        """The digest 2f+1 nodes voted for at a checkpoint, if there is one"""
+        votes = Counter(self.checkpoint_votes.get(seq_num, {}).values())
+        for digest, count in votes.items():
+            if count >= 2 * self.f + 1:
+                return digest
+        return None
+
+    def _stabilize(self, seq_num: int, voter: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Make a checkpoint with a quorum stable, or ask for its state if this node is behind"""
+        if seq_num <= self.stable_checkpoint:
+            return []
+        digest = self._stable_digest(seq_num)
+        if digest is None:
+            return []
+
+        if seq_num > self.last_executed:
+            # Lagging behind the others: fetch the state from the node whose vote made the quorum
+            if seq_num <= self.requested_state or voter is None:
+                return []
+            self.requested_state = seq_num
+            return [{
+                'type': MessageType.STATE_REQUEST,
+                'seq_num': seq_num,
+                'node_id': self.node_id,
+                'to': voter,
+                'last_executed': self.last_executed
+            }]
+
+        # A checkpoint this node disagrees with is left for the next one
+        if self.checkpoints.get(seq_num, {}).get('digest') != digest:
+            return []
+        self._collect_garbage(seq_num)
+
+        # The window moved up, so the primary can propose waiting batches
+        messages = self._propose() if self.node_id == self.primary else []
+        return messages + self._replay()
+
+    def _collect_garbage(self, seq_num: int) -> None:
+        """Make a checkpoint stable and drop everything logged at or below it"""
+        self.stable_checkpoint = seq_num
+        for pre_prepare in [self.pre_prepare_log[seq] for seq in self.pre_prepare_log if seq <= seq_num]:
+            del self.pre_prepare_log[pre_prepare['seq_num']]
+            for request_id in pre_prepare['request_ids']:
+                self.request_log.pop(request_id, None)
+        for log in (self.prepare_log, self.commit_log, self.prepare_count, self.commit_count,
+                    self.checkpoint_votes):
+            for seq in [seq for seq in log if seq <= seq_num]:
+                del log[seq]
+        for seq in [seq for seq in self.checkpoints if seq < seq_num]:
+            del self.checkpoints[seq]
+        self.prepared = {seq for seq in self.prepared if seq > seq_num}
+        self.committed = {seq for seq in self.committed if seq > seq_num}
+
+    def handle_state_request(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Send a lagging node the blocks from its last executed batch up to a stable checkpoint"""
+        seq_num = message['seq_num']
+        checkpoint = self.checkpoints.get(seq_num)
+        if checkpoint is None or seq_num != self.stable_checkpoint:
+            return [{'type': 'error', 'message': 'No snapshot for checkpoint'}]
+
+        blocks = []
+        if self.blockchain is not None:
+            # One block per sequence number, so the node's missing batches are the last blocks
+            start = checkpoint['height'] - (seq_num - message['last_executed']) + 1
+            blocks = [block.to_dict() for block in self.blockchain.iter_blocks(start, checkpoint['height'] + 1)]
+        return [{
+            'type': MessageType.STATE,
+            'seq_num': seq_num,
+            'node_id': self.node_id,
+            'to': message['node_id'],
+            'last_executed': message['last_executed'],
+            'digest': checkpoint['digest'],
+            'blocks': blocks
+        }]
+
+    def handle_state(self, message: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Catch up to a stable checkpoint from a snapshot sent by another node"""
+        seq_num = message['seq_num']
+        if seq_num <= self.last_executed or message['last_executed'] != self.last_executed:
+            return []
+        digest = self._stable_digest(seq_num)
+        if digest is None or message['digest'] != digest:
+            return [{'type': 'error', 'message': 'Invalid state message'}]
+
+        # Check that the blocks extend the chain up to the agreed tip before applying any of them
+        if self.blockchain is not None:
+            blocks = [Block.from_dict(block) for block in message['blocks']]
+            if len(blocks) != seq_num - self.last_executed or not self._leads_to(blocks, digest):
+                return [{'type': 'error', 'message': 'Invalid state message'}]
+            for block in blocks:
+                self.blockchain.add_mined_block(block)
+
+        self.last_executed = seq_num
+        self.state_digest = digest
+        self.checkpoints[seq_num] = {'digest': digest, 'height': self._height()}
+        self._collect_garbage(seq_num)
+        self.seq_num = max(self.seq_num, seq_num)
+
+        # Batches above the checkpoint may have committed while this node was behind
+        messages = self._deliver()
+        if self.node_id == self.primary:
+            messages.extend(self._propose())
+        return messages + self._replay()
+
+    def _verify_pre_prepare(self, message: Dict[str, Any]) -> bool:
+        """Verify a pre-prepare message"""
+        # Check if the primary is correct
+        if message['view'] != self.view or message['node_id'] != self.primary:
+            return False
+
+        # Check if the sequence number is within the watermarks
+        if not self.low_watermark < message['seq_num'] <= self.high_watermark:
+            return False
+
+        # Check that no other batch was pre-prepared with this sequence number
+        logged = self.pre_prepare_log.get(message['seq_num'])
+        if logged is not None and logged['digest'] != message['digest']:
+            return False
+
+        # Check if the batch hash matches
+        if len(message['request_ids']) != len(message['requests']):
+            return False
+        if message['digest'] != self._hash_batch(message['requests'], message['timestamp'], message['node_id']):
+            return False
+
+        return True
+
+    def _verify_vote(self, message: Dict[str, Any]) -> bool:
+        """Verify a prepare or commit message"""
+        # Votes may arrive before the pre-prepare, so only the view and high watermark are checked here
+        if message['view'] != self.view or message['node_id'] not in self.nodes:
+            return False
+        return message['seq_num'] <= self.high_watermark
+
+    def _leads_to(self, blocks: List[Block], digest: str) -> bool:
+        """Check that blocks extend the local tip one by one and end at the given hash"""
+        previous = self.blockchain.get_latest_block()
+        for block in blocks:
+            if (block.index != previous.index + 1 or block.previous_hash != previous.hash
+                    or block.hash != block.calculate_hash()):
+                return False
+            previous = block
+        return previous.hash == digest
+
+    def _execute_batch(self, pre_prepare: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Deliver the next committed batch and reply to its requests"""
+        included = self._apply_batch(pre_prepare)
+        self.last_executed = pre_prepare['seq_num']
+        if self.blockchain is not None:
+            self.state_digest = self.blockchain.get_latest_block().hash
+        else:
+            self.state_digest = self._chain_digest(self.state_digest, pre_prepare['digest'])
+        return [self._execute_request(request_id, pre_prepare['seq_num'], 'success' if ok else 'rejected')
+                for request_id, ok in zip(pre_prepare['request_ids'], included)]
+
+    def _apply_batch(self, batch: Dict[str, Any]) -> List[bool]:
+        """Append a batch to the blockchain, returning which of its requests made it into the block"""
+        requests = batch['requests']
+        if self.blockchain is None:
+            return [True] * len(requests)
+        with self.blockchain.lock:
+            # Every node has the same ledger here, so every node leaves out the same requests
+            transactions = self.blockchain.applicable_transactions(requests)
+            # Every node builds the same block from them and the primary's timestamp
+            latest = self.blockchain.get_latest_block()
+            block = Block(latest.index + 1, transactions, batch['timestamp'],
+                          latest.hash, miner_address=batch['node_id'])
+            self.blockchain.add_mined_block(block)
+        kept = {id(transaction) for transaction in transactions}
+        return [id(request) in kept for request in requests]
+
+    def _height(self) -> Optional[int]:
+        if self.blockchain is None:
+            return None
+        return self.blockchain.get_latest_block().index
+
+    def _execute_request(self, request_id: str, seq_num: int, result: str = 'success') -> Dict[str, Any]:
+        """Reply to a request executed in the given batch"""
+        return {
+            'type': MessageType.REPLY,
+            'view': self.view,
+            'seq_num': seq_num,
+            'node_id': self.node_id,
+            'request_id': request_id,
+            'result': result
+        }
+
+    def _generate_request_id(self, request: Dict[str, Any]) -> str:
+        """Generate a unique request ID"""
+        request_str = json.dumps(request, sort_keys=True)
+        return hashlib.sha256(request_str.encode()).hexdigest()
+
+    def _hash_request(self, request: Dict[str, Any]) -> str:
+        """Hash a request"""
+        request_str = json.dumps(request, sort_keys=True)
+        return hashlib.sha256(request_str.encode()).hexdigest()
+
+    def _hash_batch(self, requests: List[Dict[str, Any]], timestamp: float, node_id: str) -> str:
+        """Hash a batch of requests with the timestamp and proposer, which its block records as the miner"""
+        return self._hash_request({'requests': requests, 'timestamp': timestamp, 'node_id': node_id})
+
+    def _chain_digest(self, state_digest: str, batch_digest: str) -> str:
+        """Fold a delivered batch into the state digest"""
+        return hashlib.sha256((state_digest + batch_digest).encode()).hexdigest()
+
+    def change_view(self) -> None:
+        """Change the view (primary node)"""
+        self.view += 1
+        self.primary = self.nodes[self.view % self.n]
+        # Batches that did not commit are proposed again by the new primary
+        self.seq_num = self.last_executed
+        self.pending_requests.clear()
+        # Reset message logs and counters
+        self.request_log.clear()
+        self.pre_prepare_log.clear()
+        self.prepare_log.clear()
+        self.commit_log.clear()
+        self.prepare_count.clear()
+        self.commit_count.clear()
+        self.prepared.clear()
+        self.committed.clear()
+        self.early_messages.clear()
\ No newline at end of file
@@ -1,67 +1,239 @@
-import hashlib
-import json
-import time
-from typing import List, Dict, Any
-from ..config.token import TOKEN_SYMBOL, get_block_reward
-
-class Block:
-    def __init__(self, index: int, transactions: List[Dict[str, Any]], timestamp: float,
-                 previous_hash: str, nonce: int = 0, miner_address: str = None):
-        self.index = index
-        self.timestamp = timestamp
-        self.transactions = transactions
-        self.previous_hash = previous_hash
-        self.nonce = nonce
-        self.miner_address = miner_address
-        self.reward = get_block_reward(index)
-        self.hash = self.calculate_hash()
-
-    def calculate_hash(self) -> str:
-        """Calculate the hash of the block"""
-        block_string = json.dumps({
-            'index': self.index,
-            'timestamp': self.timestamp,
-            'transactions': self.transactions,
-            'previous_hash': self.previous_hash,
-            'nonce': self.nonce,
-            'miner_address': self.miner_address,
-            'reward': self.reward
-        }, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
-
-    def mine_block(self, difficulty: int) -> None:
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
-
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert block to dictionary"""
-        return {
-            'index': self.index,
-            'timestamp': self.timestamp,
-            'transactions': self.transactions,
-            'previous_hash': self.previous_hash,
-            'hash': self.hash,
-            'nonce': self.nonce,
-            'miner_address': self.miner_address,
-            'reward': self.reward,
-            'reward_symbol': TOKEN_SYMBOL
-        }
-
-    @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> 'Block':
-        """Create block from dictionary"""
-        block = cls(
-            index=data['index'],
-            transactions=data['transactions'],
-            timestamp=data['timestamp'],
-            previous_hash=data['previous_hash'],
-            nonce=data['nonce'],
-            miner_address=data['miner_address']
-        )
-        block.hash = data['hash']
-        return block
-
-    def __str__(self) -> str:
+import hashlib
+import json
+import math
+import struct
+import time
+from typing import List, Dict, Any, Optional, Callable
+from ..config.token import TOKEN_SYMBOL, get_block_reward
+
+# Version 1 blocks hash a JSON dump of the whole block; version 2 blocks hash a
+# fixed-size binary header that commits to the transactions through a Merkle root
+LEGACY_BLOCK_VERSION = 1
+BLOCK_VERSION = 2
+
+# version, index, timestamp, previous hash, merkle root, coinbase commitment
+HEADER_PREFIX = struct.Struct('<IQd32s32s32s')
+NONCE = struct.Struct('<Q')
+HEADER_SIZE = HEADER_PREFIX.size + NONCE.size
+
+def transaction_hash(transaction: Dict[str, Any]) -> bytes:
+    """Hash a transaction for inclusion in a Merkle tree"""
+    return hashlib.sha256(json.dumps(transaction, sort_keys=True).encode()).digest()
+
+def _is_amount(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+def is_well_formed_transaction(transaction: Any) -> bool:
+    """Whether a signed transfer has the fields, types and ranges the ledger and mempool rely on"""
+    if not isinstance(transaction, dict):
+        return False
+    if not all(isinstance(transaction.get(field), str) for field in ('from', 'to', 'public_key', 'signature')):
+        return False
+    if transaction['from'] == 'network':
+        return False
+    nonce = transaction.get('nonce')
+    if not isinstance(nonce, int) or isinstance(nonce, bool) or nonce < 0:
+        return False
+    if not _is_amount(transaction.get('amount')) or transaction['amount'] == 0:
+        return False
+    # The fee, or gas and gas price for contract calls, are optional
+    return all(_is_amount(transaction[field]) for field in ('fee', 'gas', 'gas_price') if field in transaction)
+
+def merkle_root(transactions: List[Dict[str, Any]]) -> bytes:
+    """Calculate the Merkle root of a transaction list"""
+    return merkle_root_of_hashes([transaction_hash(transaction) for transaction in transactions])
+
+def merkle_root_of_hashes(hashes: List[bytes]) -> bytes:
+    """Calculate the Merkle root of a list of transaction hashes"""
+    if not hashes:
+        return b'\x00' * 32
+    level = list(hashes)
+    while len(level) > 1:
+        # Pair the last hash with itself on odd levels; blocks with repeated transactions are rejected
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0]
+
+class Block:
+    def __init__(self, index: int, transactions: List[Dict[str, Any]], timestamp: float,
+                 previous_hash: str, nonce: int = 0, miner_address: str = None,
+                 version: int = BLOCK_VERSION):
+        self.version = version
+        self.index = index
+        self.timestamp = timestamp
+        self.transactions = transactions
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.miner_address = miner_address
+        self.reward = get_block_reward(index)
+        self.hash = self.calculate_hash()
+
+    @property
+    def transactions(self) -> List[Dict[str, Any]]:
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions: List[Dict[str, Any]]) -> None:
+        self._transactions = transactions
+        self._transaction_hashes: Optional[List[bytes]] = None
+        self._merkle_root: Optional[bytes] = None
+
+    @property
+    def transaction_hashes(self) -> List[bytes]:
+        """Hashes of the transactions, computed once per transaction list"""
+        if self._transaction_hashes is None:
+            self._transaction_hashes = [transaction_hash(transaction) for transaction in self._transactions]
+        return self._transaction_hashes
+
+    @property
+    def merkle_root(self) -> bytes:
+        """Merkle root of the transactions, computed once per transaction list"""
+        if self._merkle_root is None:
+            self._merkle_root = merkle_root_of_hashes(self.transaction_hashes)
+        return self._merkle_root
+
+    def has_duplicate_transactions(self) -> bool:
+        """Whether a transaction appears twice, which the Merkle root cannot tell apart on odd levels"""
+        return len(set(self.transaction_hashes)) != len(self.transactions)
+
+    def reward_count(self) -> int:
+        """Number of reward transactions in the block"""
+        return sum(1 for transaction in self.transactions
+                   if isinstance(transaction, dict) and transaction.get('from') == 'network')
+
+    def header_prefix(self) -> bytes:
+        """Binary block header without the trailing nonce"""
+        coinbase = hashlib.sha256(json.dumps({
+            'miner_address': self.miner_address,
+            'reward': self.reward
+        }, sort_keys=True).encode()).digest()
+        return HEADER_PREFIX.pack(
+            self.version,
+            self.index,
+            self.timestamp,
+            bytes.fromhex(self.previous_hash),
+            self.merkle_root,
+            coinbase
+        )
+
+    def header(self) -> bytes:
+        """Fixed-size binary block header"""
+        return self.header_prefix() + NONCE.pack(self.nonce)
+
+    def calculate_hash(self) -> str:
+        """Calculate the hash of the block"""
+        if self.version == LEGACY_BLOCK_VERSION:
+            block_string = json.dumps({
+                'index': self.index,
+                'timestamp': self.timestamp,
+                'transactions': self.transactions,
+                'previous_hash': self.previous_hash,
+                'nonce': self.nonce,
+                'miner_address': self.miner_address,
+                'reward': self.reward
+            }, sort_keys=True).encode()
+            return hashlib.sha256(block_string).hexdigest()
+        return hashlib.sha256(self.header()).hexdigest()
+
+    def meets_difficulty(self, difficulty: int) -> bool:
+        """Check whether the block hash satisfies the proof-of-work difficulty"""
+        return self.hash[:difficulty] == "0" * difficulty
+
+    def mine_block(self, difficulty: int, engine=None,
+                   should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """Search for a nonce that meets the difficulty, returning False if the search was stopped"""
+        target = "0" * difficulty
+        if self.version == LEGACY_BLOCK_VERSION:
+            while self.hash[:difficulty] != target:
+                self.nonce += 1
+                self.hash = self.calculate_hash()
+            return True
+
+        # Spread the search over an engine's worker processes when one is given
+        if engine is not None:
+            result = engine.search(self.header_prefix(), difficulty, self.nonce, should_stop)
+            if result is None:
+                return False
+            self.nonce, self.hash, _ = result
+            return True
+
+        # Hash the constant part of the header once and only feed the nonce per attempt;
+        # a hex hash starting with d zeros is a 256-bit value below 2 ** (256 - 4d)
+        midstate = hashlib.sha256(self.header_prefix())
+        target_value = 1 << (256 - 4 * difficulty)
+        pack_nonce = NONCE.pack
+        nonce = self.nonce
+        while True:
+            attempt = midstate.copy()
+            attempt.update(pack_nonce(nonce))
+            digest = attempt.digest()
+            if int.from_bytes(digest, 'big') < target_value:
+                break
+            nonce += 1
+        self.nonce = nonce
+        self.hash = digest.hex()
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert block to dictionary"""
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'transactions': self.transactions,
+            'previous_hash': self.previous_hash,
+            'hash': self.hash,
+            'nonce': self.nonce,
+            'miner_address': self.miner_address,
+            'reward': self.reward,
+            'reward_symbol': TOKEN_SYMBOL,
+            'version': self.version,
+            'merkle_root': self.merkle_root.hex()
+        }
+
+    def header_dict(self) -> Dict[str, Any]:
+        """Block fields without the transactions, enough to check the proof of work of version 2 blocks"""
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'previous_hash': self.previous_hash,
+            'hash': self.hash,
+            'nonce': self.nonce,
+            'miner_address': self.miner_address,
+            'version': self.version,
+            'merkle_root': self.merkle_root.hex()
+        }
+
+    @classmethod
+    def from_header(cls, data: Dict[str, Any]) -> 'Block':
+        """Create a block without transactions from header fields, keeping the claimed hash"""
+        block = cls(
+            index=data['index'],
+            transactions=[],
+            timestamp=data['timestamp'],
+            previous_hash=data['previous_hash'],
+            nonce=data['nonce'],
+            miner_address=data['miner_address'],
+            version=data.get('version', LEGACY_BLOCK_VERSION)
+        )
+        block._merkle_root = bytes.fromhex(data['merkle_root'])
+        block.hash = data['hash']
+        return block
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Block':
+        """Create block from dictionary"""
+        block = cls(
+            index=data['index'],
+            transactions=data['transactions'],
+            timestamp=data['timestamp'],
+            previous_hash=data['previous_hash'],
+            nonce=data['nonce'],
+            miner_address=data['miner_address'],
+            version=data.get('version', LEGACY_BLOCK_VERSION)
+        )
+        block.hash = data['hash']
+        return block
+
+    def __str__(self) -> str:
         return f"Block #{self.index} - Reward: {self.reward} {TOKEN_SYMBOL}" 
\ No newline at end of file
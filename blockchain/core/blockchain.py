@@ -1,84 +1,332 @@
-import json
-import time
-from typing import List, Dict, Any
-from .block import Block
-
-class Blockchain:
-    def __init__(self, difficulty: int = 4):
-        self.chain: List[Block] = [self.create_genesis_block()]
-        self.difficulty = difficulty
-        self.pending_transactions: List[Dict[str, Any]] = []
-        self.mining_reward = 10
-
-    def create_genesis_block(self) -> Block:
-        return Block(0, [], time.time(), "0" * 64)
-
-    def get_latest_block(self) -> Block:
-        return self.chain[-1]
-
-    def mine_pending_transactions(self, miner_address: str) -> None:
-        # Create mining reward transaction
-        reward_tx = {
-            "from": "network",
-            "to": miner_address,
-            "amount": self.mining_reward
-        }
-        self.pending_transactions.append(reward_tx)
-
-        # Create new block with pending transactions
-        block = Block(
-            len(self.chain),
-            self.pending_transactions,
-            time.time(),
-            self.get_latest_block().hash
-        )
-
-        # Mine the block
-        block.mine_block(self.difficulty)
-
-        # Add the block to the chain
-        self.chain.append(block)
-
-        # Reset pending transactions
-        self.pending_transactions = []
-
-    def add_transaction(self, sender: str, recipient: str, amount: float) -> None:
-        self.pending_transactions.append({
-            "from": sender,
-            "to": recipient,
-            "amount": amount
-        })
-
-    def get_balance(self, address: str) -> float:
-        balance = 0
-
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction["from"] == address:
-                    balance -= transaction["amount"]
-                if transaction["to"] == address:
-                    balance += transaction["amount"]
-
-        return balance
-
-    def is_chain_valid(self) -> bool:
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-
-            # Verify current block's hash
-            if current_block.hash != current_block.calculate_hash():
-                return False
-
-            # Verify chain linkage
-            if current_block.previous_hash != previous_block.hash:
-                return False
-
-        return True
-
-    def to_dict(self) -> Dict[str, Any]:
-        return {
-            "chain": [block.to_dict() for block in self.chain],
-            "difficulty": self.difficulty,
-            "pending_transactions": self.pending_transactions
-        } 
\ No newline at end of file
+import json
+import os
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterator, Union, Callable
+from ..config.block import MAX_BLOCK_SIZE, MAX_BLOCK_GAS, GENESIS_TIMESTAMP, transaction_cost
+from ..wallet.wallet import Wallet
+from .block import Block, is_well_formed_transaction
+from .ledger import Ledger
+from .mempool import Mempool
+from .storage import BlockStore, StoredChain
+from .validator import ChainValidator
+
+class Blockchain:
+    def __init__(self, difficulty: int = 4):
+        self.chain: Union[List[Block], StoredChain] = [self.create_genesis_block()]
+        self.difficulty = difficulty
+        self.pending_transactions = Mempool()
+        self.mining_reward = 10
+        self.ledger = Ledger()
+        self.ledger.apply_block(self.chain[0])
+        self.store: Optional[BlockStore] = None
+        self.validator = ChainValidator()
+        # Shares parsed keys and signature verdicts with the wallets
+        self.verifier = Wallet.verifier
+        # Guards the chain, ledger, pending journal and block store against the mining thread
+        self.lock = threading.RLock()
+
+    def create_genesis_block(self) -> Block:
+        return Block(0, [], GENESIS_TIMESTAMP, "0" * 64)
+
+    def get_latest_block(self) -> Block:
+        with self.lock:
+            return self.chain[-1]
+
+    def reward_transaction(self, miner_address: str) -> Dict[str, Any]:
+        """Create the mining reward transaction for a new block"""
+        return {
+            "from": "network",
+            "to": miner_address,
+            "amount": self.mining_reward
+        }
+
+    def mine_pending_transactions(self, miner_address: str, engine=None,
+                                  should_stop: Optional[Callable[[], bool]] = None) -> Optional[Block]:
+        included = self.select_transactions()
+
+        # Create new block with pending transactions
+        block = Block(
+            len(self.chain),
+            included + [self.reward_transaction(miner_address)],
+            time.time(),
+            self.get_latest_block().hash
+        )
+
+        # Mine the block, giving up if another block extends the chain first
+        tip = block.previous_hash
+
+        def stale() -> bool:
+            if self.get_latest_block().hash != tip:
+                return True
+            return should_stop is not None and should_stop()
+
+        if not block.mine_block(self.difficulty, engine, stale):
+            return None
+        return block if self.add_mined_block(block) else None
+
+    def select_transactions(self, max_bytes: int = MAX_BLOCK_SIZE,
+                            max_gas: int = MAX_BLOCK_GAS) -> List[Dict[str, Any]]:
+        """The highest-fee pending transactions that fit in a block and apply to the current ledger"""
+        with self.lock:
+            selected = self.pending_transactions.select(max_bytes=max_bytes, max_gas=max_gas)
+            return self.ledger.applicable(selected)
+
+    def applicable_transactions(self, transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The well-formed, signed transactions that apply in order to the current ledger"""
+        signed = [transaction for transaction in transactions if self.verify_transaction(transaction)]
+        with self.lock:
+            return self.ledger.applicable(signed)
+
+    def add_block(self, block: Block) -> bool:
+        """Append a valid block received from a peer if it extends the tip, returning False otherwise"""
+        if block.index != self.get_latest_block().index + 1:
+            return False
+        if block.hash != block.calculate_hash() or not block.meets_difficulty(self.difficulty):
+            return False
+        if block.has_duplicate_transactions() or block.reward_count() != 1:
+            return False
+        # Exactly one reward, of the current amount; every other transaction signed by its sender
+        transfers = []
+        for transaction in block.transactions:
+            if not isinstance(transaction, dict) or transaction.get('from') != 'network':
+                if not is_well_formed_transaction(transaction):
+                    return False
+                transfers.append(transaction)
+            elif (not isinstance(transaction.get('to'), str)
+                  or transaction != self.reward_transaction(transaction['to'])):
+                return False
+        items = [(transaction, transaction['signature'], transaction['public_key']) for transaction in transfers]
+        if not all(self.verifier.verify_batch(items)):
+            return False
+
+        with self.lock:
+            latest = self.get_latest_block()
+            if block.index != latest.index + 1 or block.previous_hash != latest.hash:
+                return False
+            # Nonces and balances are checked in block order against the ledger at the tip
+            if len(self.ledger.applicable(block.transactions)) != len(block.transactions):
+                return False
+            return self.add_mined_block(block)
+
+    def add_mined_block(self, block: Block) -> bool:
+        """Append a freshly mined block and drop its transactions from the mempool
+
+        Returns False, leaving the chain untouched, if another block extended the
+        tip after the search started.
+        """
+        with self.lock:
+            latest = self.get_latest_block()
+            if block.index != latest.index + 1 or block.previous_hash != latest.hash:
+                return False
+            self._append_block(block)
+
+            # Drop the mined transactions, keeping any that arrived while mining
+            removed = self.pending_transactions.remove(block.transactions)
+
+            # Rewrite the pending transaction journal
+            if self.store is not None and removed:
+                self.store.rewrite_pending(list(self.pending_transactions))
+            return True
+
+    def _append_block(self, block: Block) -> None:
+        """Update the ledger and append a block to the chain; callers hold the lock"""
+        self.ledger.apply_block(block)
+        try:
+            # A StoredChain writes the block through to the block store
+            self.chain.append(block)
+        except BaseException:
+            # Keep the ledger in step with the chain if the block could not be written
+            self.ledger.revert_block()
+            raise
+        if self.store is not None and self.ledger.height % self.ledger.checkpoint_interval == 0:
+            self.store.save_state('ledger', self.ledger.to_dict())
+
+    def next_nonce(self, sender: str) -> int:
+        """Nonce of the sender's next transaction, after those already pending"""
+        with self.lock:
+            return self.pending_transactions.next_nonce(sender, self.ledger.get_nonce(sender))
+
+    def add_transaction(self, wallet: Wallet, recipient: str, amount: float,
+                        fee: float = 0) -> Optional[Dict[str, Any]]:
+        """Sign a transaction from a wallet and add it to the mempool, returning None if it was rejected"""
+        with self.lock:
+            transaction = {
+                "from": wallet.address,
+                "to": recipient,
+                "amount": amount,
+                "fee": fee,
+                # Orders the sender's transactions and keeps repeated payments distinct
+                "nonce": self.next_nonce(wallet.address),
+                "public_key": wallet.public_key_string()
+            }
+            transaction["signature"] = wallet.sign_transaction(transaction)
+            return transaction if self.add_pending_transaction(transaction) else None
+
+    def verify_transaction(self, transaction: Dict[str, Any]) -> bool:
+        """Whether a transaction is well formed and signed by its sender"""
+        if not is_well_formed_transaction(transaction):
+            return False
+        return self.verifier.verify(transaction, transaction['signature'], transaction['public_key'])
+
+    def add_pending_transaction(self, transaction: Dict[str, Any]) -> bool:
+        """Add a complete transaction, e.g. one relayed by a peer, if it is signed, affordable and next in order"""
+        # The signature is checked before taking the lock, the nonce and balance under it
+        if not self.verify_transaction(transaction):
+            return False
+        with self.lock:
+            if transaction['nonce'] != self.next_nonce(transaction['from']) or not self.can_afford(transaction):
+                return False
+            if not self.pending_transactions.add(transaction):
+                return False
+            if self.store is not None:
+                self.store.append_transaction(transaction)
+            return True
+
+    def can_afford(self, transaction: Dict[str, Any]) -> bool:
+        """Whether the sender's balance covers the amount and fee on top of its pending transactions"""
+        sender = transaction['from']
+        with self.lock:
+            spent = self.pending_transactions.sender_spend(sender, self.ledger.get_nonce(sender))
+            available = self.ledger.get_balance(sender) - spent
+            return transaction_cost(transaction) <= available
+
+    def get_balance(self, address: str, height: Optional[int] = None) -> float:
+        with self.lock:
+            if height is None:
+                return self.ledger.get_balance(address)
+            return self.ledger.get_balance_at(address, height, self.chain)
+
+    def get_block(self, height: int) -> Optional[Block]:
+        """Get a block by height"""
+        with self.lock:
+            if 0 <= height < len(self.chain):
+                return self.chain[height]
+            return None
+
+    def get_block_by_hash(self, block_hash: str) -> Optional[Block]:
+        """Get a block by hash"""
+        with self.lock:
+            height = self.get_height(block_hash)
+            return None if height is None else self.chain[height]
+
+    def get_height(self, block_hash: str) -> Optional[int]:
+        """Height of a block on the chain"""
+        with self.lock:
+            if self.store is not None:
+                return self.store.find_height(block_hash)
+            # Without a block store, search back from the tip where peers usually ask
+            for height in range(len(self.chain) - 1, -1, -1):
+                if self.chain[height].hash == block_hash:
+                    return height
+            return None
+
+    def iter_blocks(self, start: int = 0, end: Optional[int] = None) -> Iterator[Block]:
+        """Iterate over the blocks in [start, end)"""
+        with self.lock:
+            end = len(self.chain) if end is None else min(end, len(self.chain))
+            if self.store is None:
+                return iter(self.chain[max(start, 0):end])
+        return self._locked(self.store.iter_blocks(start, end))
+
+    def _locked(self, blocks: Iterator[Block]) -> Iterator[Block]:
+        """Read each stored block under the lock, so an append cannot reopen files mid-read"""
+        while True:
+            with self.lock:
+                block = next(blocks, None)
+            if block is None:
+                return
+            yield block
+
+    def rebuild_ledger(self) -> None:
+        """Rebuild the account ledger from the chain"""
+        with self.lock:
+            self.ledger.rebuild(self.chain)
+
+    def is_chain_valid(self, full: bool = False,
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
+        """Validate hashes, proof of work and linkage of the blocks after the trusted checkpoint"""
+        with self.lock:
+            return self.validator.validate(self.chain, self.difficulty, full, progress)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "chain": [block.to_dict() for block in self.chain],
+                "difficulty": self.difficulty,
+                "pending_transactions": list(self.pending_transactions)
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Blockchain':
+        """Create blockchain from dictionary"""
+        blockchain = cls(data.get('difficulty', 4))
+        blockchain.chain = [Block.from_dict(block) for block in data['chain']]
+        for transaction in data.get('pending_transactions', []):
+            blockchain.pending_transactions.add(transaction)
+        blockchain.rebuild_ledger()
+        return blockchain
+
+    def attach_store(self, store: BlockStore) -> None:
+        """Write the chain into an empty block store and serve it from there"""
+        if store.height >= 0:
+            raise ValueError(f"Block store at {store.path} is not empty")
+        store.set_meta('difficulty', self.difficulty)
+        for block in self.chain:
+            store.append_block(block)
+        store.rewrite_pending(list(self.pending_transactions))
+        store.save_state('ledger', self.ledger.to_dict())
+        self.store = store
+        self.chain = StoredChain(store)
+
+    @classmethod
+    def open(cls, path: str, difficulty: int = 4, create: bool = False,
+             legacy_file: Optional[str] = None) -> 'Blockchain':
+        """Open a blockchain persisted in a block store"""
+        if not os.path.isdir(path):
+            # Migrate a chain saved by older versions as a single JSON file
+            if legacy_file is not None and os.path.exists(legacy_file):
+                with open(legacy_file, 'r') as f:
+                    blockchain = cls.from_dict(json.load(f))
+                blockchain.attach_store(BlockStore(path))
+                return blockchain
+            if not create:
+                raise FileNotFoundError(f"Block store not found: {path}")
+
+        store = BlockStore(path)
+        if store.height < 0:
+            blockchain = cls(difficulty)
+            blockchain.attach_store(store)
+            return blockchain
+
+        blockchain = cls(store.meta.get('difficulty', difficulty))
+        blockchain.store = store
+        blockchain.chain = StoredChain(store)
+        for transaction in store.pending:
+            blockchain.pending_transactions.add(transaction)
+
+        # Resume the ledger from its last snapshot and replay only the blocks after it
+        state = store.load_state('ledger')
+        if (state is not None and state['height'] <= store.height
+                and state['block_hash'] == store.block_hash(state['height'])):
+            blockchain.ledger = Ledger.from_dict(state)
+            for block in store.iter_blocks(blockchain.ledger.height + 1):
+                blockchain.ledger.apply_block(block)
+        else:
+            blockchain.rebuild_ledger()
+
+        # Blocks up to the last validated checkpoint need not be checked again
+        checkpoint = store.load_state('validator')
+        if checkpoint is not None:
+            blockchain.validator.load(checkpoint)
+        return blockchain
+
+    def close(self) -> None:
+        """Flush and close the attached block store"""
+        with self.lock:
+            if self.store is not None:
+                self.store.save_state('ledger', self.ledger.to_dict())
+                if self.validator.checkpoint_hash is not None:
+                    self.store.save_state('validator', self.validator.to_dict())
+                self.store.close()
+                self.store = None
\ No newline at end of file
@@ -0,0 +1,194 @@
+import mmap
+import os
+import struct
+from typing import Optional, Tuple, Iterable
+
+HEIGHT_MAGIC = b'XGPH'
+HEIGHT_HEADER = struct.Struct('<4sQ')  # magic, entry count
+HEIGHT_ENTRY = struct.Struct('<32sIQI')  # block hash, segment, offset, record length
+
+HASH_MAGIC = b'XGPX'
+HASH_HEADER = struct.Struct('<4sQQ')  # magic, slot capacity, entry count
+HASH_SLOT = struct.Struct('<32sQ')  # block hash, height + 1 (0 marks an empty slot)
+
+def _map_file(path: str, size: int) -> mmap.mmap:
+    """Open a file for read/write mapping, growing it to at least size bytes"""
+    with open(path, 'a+b') as f:
+        if os.path.getsize(path) < size:
+            f.truncate(size)
+        return mmap.mmap(f.fileno(), 0)
+
+class HeightIndex:
+    """Fixed-size records mapping block height to its hash and store location"""
+
+    def __init__(self, path: str, initial_capacity: int = 4096):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEIGHT_HEADER.size
+        self._map = _map_file(path, HEIGHT_HEADER.size + initial_capacity * HEIGHT_ENTRY.size)
+        if exists:
+            magic, self.count = HEIGHT_HEADER.unpack_from(self._map, 0)
+            if magic != HEIGHT_MAGIC:
+                raise ValueError(f"Invalid height index: {path}")
+        else:
+            self.count = 0
+            self._write_header()
+        self.capacity = (len(self._map) - HEIGHT_HEADER.size) // HEIGHT_ENTRY.size
+        self.count = min(self.count, self.capacity)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _write_header(self) -> None:
+        HEIGHT_HEADER.pack_into(self._map, 0, HEIGHT_MAGIC, self.count)
+
+    def _grow(self) -> None:
+        size = HEIGHT_HEADER.size + self.capacity * 2 * HEIGHT_ENTRY.size
+        self._map.close()
+        self._map = _map_file(self.path, size)
+        self.capacity *= 2
+
+    def append(self, block_hash: str, segment: int, offset: int, length: int) -> int:
+        """Record the location of the next block and return its height"""
+        if self.count == self.capacity:
+            self._grow()
+        HEIGHT_ENTRY.pack_into(
+            self._map, HEIGHT_HEADER.size + self.count * HEIGHT_ENTRY.size,
+            bytes.fromhex(block_hash), segment, offset, length
+        )
+        self.count += 1
+        self._write_header()
+        return self.count - 1
+
+    def _entry(self, height: int) -> Tuple[bytes, int, int, int]:
+        if not 0 <= height < self.count:
+            raise IndexError(f"Height {height} not indexed")
+        return HEIGHT_ENTRY.unpack_from(self._map, HEIGHT_HEADER.size + height * HEIGHT_ENTRY.size)
+
+    def location(self, height: int) -> Tuple[int, int, int]:
+        """Get the (segment, offset, length) of the block at a height"""
+        _, segment, offset, length = self._entry(height)
+        return segment, offset, length
+
+    def block_hash(self, height: int) -> str:
+        """Get the hash of the block at a height"""
+        return self._entry(height)[0].hex()
+
+    def truncate(self, count: int) -> None:
+        """Drop all entries from the given height on"""
+        self.count = min(self.count, count)
+        self._write_header()
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        self._map.flush()
+        self._map.close()
+
+class HashIndex:
+    """Open-addressing hash table mapping block hash to height"""
+
+    def __init__(self, path: str, initial_capacity: int = 8192):
+        self.path = path
+        exists = os.path.exists(path) and os.path.getsize(path) >= HASH_HEADER.size
+        self._map = _map_file(path, HASH_HEADER.size + initial_capacity * HASH_SLOT.size)
+        if exists:
+            magic, self.capacity, self.count = HASH_HEADER.unpack_from(self._map, 0)
+            if magic != HASH_MAGIC:
+                raise ValueError(f"Invalid hash index: {path}")
+        else:
+            self.capacity = initial_capacity
+            self.count = 0
+            self._write_header()
+
+    def _write_header(self) -> None:
+        HASH_HEADER.pack_into(self._map, 0, HASH_MAGIC, self.capacity, self.count)
+
+    def _slot_offset(self, slot: int) -> int:
+        return HASH_HEADER.size + slot * HASH_SLOT.size
+
+    def _probe(self, key: bytes) -> int:
+        """Find the slot holding a key, or the empty slot where it belongs"""
+        slot = int.from_bytes(key[:8], 'little') % self.capacity
+        while True:
+            stored, value = HASH_SLOT.unpack_from(self._map, self._slot_offset(slot))
+            if value == 0 or stored == key:
+                return slot
+            slot = (slot + 1) % self.capacity
+
+    def get(self, block_hash: str) -> Optional[int]:
+        """Get the height of a block by hash"""
+        try:
+            key = bytes.fromhex(block_hash)
+        except ValueError:
+            return None
+        stored, value = HASH_SLOT.unpack_from(self._map, self._slot_offset(self._probe(key)))
+        return value - 1 if value and stored == key else None
+
+    def add(self, block_hash: str, height: int) -> None:
+        """Map a block hash to its height"""
+        # Keep the load factor below one half so probe sequences stay short
+        if (self.count + 1) * 2 > self.capacity:
+            self._resize(self.capacity * 2)
+        key = bytes.fromhex(block_hash)
+        slot = self._probe(key)
+        _, value = HASH_SLOT.unpack_from(self._map, self._slot_offset(slot))
+        if value == 0:
+            self.count += 1
+        HASH_SLOT.pack_into(self._map, self._slot_offset(slot), key, height + 1)
+        self._write_header()
+
+    def _resize(self, capacity: int) -> None:
+        """Rehash all entries into a table with the given capacity"""
+        entries = []
+        for slot in range(self.capacity):
+            key, value = HASH_SLOT.unpack_from(self._map, self._slot_offset(slot))
+            if value:
+                entries.append((key, value))
+        self._replace(capacity, entries)
+
+    def _replace(self, capacity: int, entries: Iterable[Tuple[bytes, int]]) -> None:
+        """Write (key, value) slots into a new table in a temp file and swap it in once complete
+
+        The index file is only replaced by a finished table, so a crash while
+        rehashing leaves the old one in place.
+        """
+        tmp_path = self.path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        old = self._map, self.capacity, self.count
+        self._map = _map_file(tmp_path, HASH_HEADER.size + capacity * HASH_SLOT.size)
+        self.capacity = capacity
+        self.count = 0
+        try:
+            for key, value in entries:
+                offset = self._slot_offset(self._probe(key))
+                if HASH_SLOT.unpack_from(self._map, offset)[1] == 0:
+                    self.count += 1
+                HASH_SLOT.pack_into(self._map, offset, key, value)
+            self._write_header()
+            self._map.flush()
+        except BaseException:
+            self._map.close()
+            os.remove(tmp_path)
+            self._map, self.capacity, self.count = old
+            raise
+        self._map.close()
+        old[0].close()
+        os.replace(tmp_path, self.path)
+        self._map = _map_file(self.path, 0)
+
+    def rebuild(self, entries: Iterable[Tuple[str, int]]) -> None:
+        """Replace the table contents with (block hash, height) entries"""
+        slots = [(bytes.fromhex(block_hash), height + 1) for block_hash, height in entries]
+        capacity = self.capacity
+        while len(slots) * 2 > capacity:
+            capacity *= 2
+        self._replace(capacity, slots)
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        self._map.flush()
+        self._map.close()
\ No newline at end of file
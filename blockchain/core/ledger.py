@@ -0,0 +1,194 @@
+from typing import Dict, Any, Iterable, Sequence, Optional, List, Tuple
+from ..config.block import transaction_fee_paid, transaction_cost
+from .block import Block
+
+# Balance snapshots kept; older heights are replayed from the nearest one below
+MAX_CHECKPOINTS = 8
+
+class Ledger:
+    def __init__(self, checkpoint_interval: int = 1000, max_checkpoints: int = MAX_CHECKPOINTS):
+        self.checkpoint_interval = checkpoint_interval
+        self.max_checkpoints = max_checkpoints
+        self.height = -1  # Height of the last applied block
+        self.block_hash = None  # Hash of the last applied block
+        # Account state: address -> balance, nonce and last touched height
+        self.accounts: Dict[str, Dict[str, Any]] = {}
+        # The last max_checkpoints balance snapshots, taken every checkpoint_interval blocks
+        self.checkpoints: Dict[int, Dict[str, float]] = {}
+        # Height, block hash and prior account states before the last applied block
+        self._undo: Optional[Tuple[int, Optional[str], Dict[str, Optional[Dict[str, Any]]]]] = None
+
+    def apply_block(self, block: Block) -> None:
+        """Apply the transactions of the next block to the account states, all or nothing"""
+        if block.index != self.height + 1:
+            raise ValueError(f"Expected block {self.height + 1}, got block {block.index}")
+
+        self._undo = (self.height, self.block_hash, {})
+        try:
+            fees = 0
+            for transaction in block.transactions:
+                self._apply_transaction(transaction, block.index)
+                fees += transaction_fee_paid(transaction)
+            # Fees go to whoever mined the block
+            recipient = self.fee_recipient(block)
+            if fees and recipient is not None:
+                self._touch(recipient, block.index)['balance'] += fees
+        except Exception:
+            self.revert_block()
+            raise
+        self.height = block.index
+        self.block_hash = block.hash
+
+        if self.height % self.checkpoint_interval == 0:
+            self.checkpoints[self.height] = {
+                address: state['balance'] for address, state in self.accounts.items()
+            }
+            self._prune_checkpoints()
+
+    def _prune_checkpoints(self) -> None:
+        """Drop the oldest snapshots so memory and saves do not grow with the height"""
+        while len(self.checkpoints) > self.max_checkpoints:
+            del self.checkpoints[min(self.checkpoints)]
+
+    def revert_block(self) -> None:
+        """Undo the last apply_block, e.g. when the block could not be stored"""
+        if self._undo is None:
+            raise ValueError("No block to revert")
+        height, block_hash, previous = self._undo
+        self._undo = None
+        for address, state in previous.items():
+            if state is None:
+                del self.accounts[address]
+            else:
+                self.accounts[address] = state
+        if self.height != height:
+            self.checkpoints.pop(self.height, None)
+        self.height = height
+        self.block_hash = block_hash
+
+    def applicable(self, transactions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The transactions that apply in order, skipping those with the wrong nonce or too little balance"""
+        accounts: Dict[str, List[float]] = {}
+
+        def account(address: str) -> List[float]:
+            if address not in accounts:
+                accounts[address] = [self.get_balance(address), self.get_nonce(address)]
+            return accounts[address]
+
+        applied = []
+        for transaction in transactions:
+            # Rewards are minted, so only their recipient is affected
+            if transaction['from'] != 'network':
+                sender = account(transaction['from'])
+                cost = transaction_cost(transaction)
+                if transaction.get('nonce') != sender[1] or cost > sender[0]:
+                    continue
+                sender[0] -= cost
+                sender[1] += 1
+            account(transaction['to'])[0] += transaction['amount']
+            applied.append(transaction)
+        return applied
+
+    def rebuild(self, chain: Iterable[Block]) -> None:
+        """Rebuild the account states from scratch by replaying the chain"""
+        self.height = -1
+        self.block_hash = None
+        self.accounts = {}
+        self.checkpoints = {}
+        self._undo = None
+        for block in chain:
+            self.apply_block(block)
+
+    def get_account(self, address: str) -> Dict[str, Any]:
+        """Get the state of an account"""
+        state = self.accounts.get(address)
+        if state is None:
+            return {'balance': 0, 'nonce': 0, 'last_height': None}
+        return dict(state)
+
+    def get_balance(self, address: str) -> float:
+        """Get the current balance of an account"""
+        state = self.accounts.get(address)
+        return state['balance'] if state else 0
+
+    def get_nonce(self, address: str) -> int:
+        """Get the number of transactions sent by an account"""
+        state = self.accounts.get(address)
+        return state['nonce'] if state else 0
+
+    def get_balance_at(self, address: str, height: int, chain: Sequence[Block]) -> float:
+        """Get the balance of an account at a given height"""
+        if height < 0 or height > self.height:
+            raise ValueError(f"Height {height} out of range")
+        if height == self.height:
+            return self.get_balance(address)
+
+        # Start from the nearest snapshot at or below the height and replay the blocks after it
+        below = [checkpoint for checkpoint in self.checkpoints if checkpoint <= height]
+        if below:
+            checkpoint = max(below)
+            balance = self.checkpoints[checkpoint].get(address, 0)
+            start = checkpoint + 1
+        else:
+            balance = 0
+            start = 0
+
+        for index in range(start, height + 1):
+            block = chain[index]
+            for transaction in block.transactions:
+                if transaction["from"] == address:
+                    balance -= transaction_cost(transaction)
+                if transaction["to"] == address:
+                    balance += transaction["amount"]
+            if self.fee_recipient(block) == address:
+                balance += sum(transaction_fee_paid(transaction) for transaction in block.transactions)
+
+        return balance
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert ledger to dictionary"""
+        return {
+            'checkpoint_interval': self.checkpoint_interval,
+            'height': self.height,
+            'block_hash': self.block_hash,
+            'accounts': self.accounts,
+            'checkpoints': {str(height): balances for height, balances in self.checkpoints.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Ledger':
+        """Create ledger from dictionary"""
+        ledger = cls(data['checkpoint_interval'])
+        ledger.height = data['height']
+        ledger.block_hash = data['block_hash']
+        ledger.accounts = data['accounts']
+        ledger.checkpoints = {int(height): balances for height, balances in data['checkpoints'].items()}
+        # Ledgers saved before snapshots were bounded may hold many more
+        ledger._prune_checkpoints()
+        return ledger
+
+    @staticmethod
+    def fee_recipient(block: Block) -> Optional[str]:
+        """The reward recipient, or the block's miner address if it has no reward"""
+        for transaction in block.transactions:
+            if transaction.get('from') == 'network':
+                return transaction['to']
+        return block.miner_address
+
+    def _apply_transaction(self, transaction: Dict[str, Any], height: int) -> None:
+        sender = self._touch(transaction["from"], height)
+        sender['balance'] -= transaction_cost(transaction)
+        sender['nonce'] += 1
+
+        recipient = self._touch(transaction["to"], height)
+        recipient['balance'] += transaction["amount"]
+
+    def _touch(self, address: str, height: int) -> Dict[str, Any]:
+        state = self.accounts.get(address)
+        if self._undo is not None and address not in self._undo[2]:
+            self._undo[2][address] = None if state is None else dict(state)
+        if state is None:
+            state = {'balance': 0, 'nonce': 0, 'last_height': height}
+            self.accounts[address] = state
+        state['last_height'] = height
+        return state
\ No newline at end of file
@@ -0,0 +1,262 @@
+import bisect
+import hashlib
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Iterator, Iterable, Tuple, Callable
+from ..config.block import transaction_gas, transaction_cost
+
+# Default pool limits
+MAX_TRANSACTIONS = 50000
+MAX_BYTES = 32 * 1024 * 1024
+EXPIRY = 3 * 60 * 60  # Seconds a transaction may wait for a block
+
+def transaction_fee(transaction: Dict[str, Any]) -> float:
+    """Priority of a transaction: its fee, or its gas price for contract calls"""
+    return transaction.get('fee', transaction.get('gas_price', 0))
+
+class _Entry:
+    __slots__ = ('transaction', 'tx_hash', 'sender', 'order', 'fee', 'gas', 'size', 'added', 'removed', 'queued')
+
+    def __init__(self, transaction: Dict[str, Any], tx_hash: str, order: Tuple[int, int],
+                 size: int, added: float):
+        self.transaction = transaction
+        self.tx_hash = tx_hash
+        self.sender = transaction['from']
+        self.order = order
+        self.fee = transaction_fee(transaction)
+        self.gas = transaction_gas(transaction)
+        self.size = size
+        self.added = added
+        self.removed = False
+        self.queued = False
+
+    def __lt__(self, other: '_Entry') -> bool:
+        return self.order < other.order
+
+class Mempool:
+    """Bounded pool of pending transactions, ordered per sender and prioritized by fee"""
+
+    def __init__(self, max_transactions: int = MAX_TRANSACTIONS, max_bytes: int = MAX_BYTES,
+                 expiry: float = EXPIRY):
+        self.max_transactions = max_transactions
+        self.max_bytes = max_bytes
+        self.expiry = expiry
+        self.bytes = 0
+        self._entries: Dict[str, _Entry] = {}
+        # Per-sender transactions sorted by nonce, then arrival
+        self._senders: Dict[str, List[_Entry]] = {}
+        # Max-heap of sender heads and min-heap of all entries, both cleaned lazily
+        self._ready: List[Tuple[float, int, _Entry]] = []
+        self._evictable: List[Tuple[float, int, _Entry]] = []
+        self._arrivals: deque = deque()
+        self._sequence = itertools.count()
+        # Transactions arrive on request threads while the miner selects from the pool
+        self._lock = threading.RLock()
+        # Called with ('add' or 'remove', tx hash, transaction) while the pool is locked
+        self.listeners: List[Callable[[str, str, Dict[str, Any]], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return (entry.transaction for entry in entries)
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """(hash, transaction) pairs of the pending transactions"""
+        with self._lock:
+            return [(tx_hash, entry.transaction) for tx_hash, entry in self._entries.items()]
+
+    def __contains__(self, tx_hash: str) -> bool:
+        return tx_hash in self._entries
+
+    def get(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(tx_hash)
+        return entry.transaction if entry else None
+
+    def sender_count(self, sender: str) -> int:
+        """Number of pending transactions sent by an address"""
+        return len(self._senders.get(sender, ()))
+
+    def _run(self, sender: str, nonce: int) -> List[_Entry]:
+        """The sender's pending entries with consecutive nonces from the given one"""
+        run = []
+        for entry in self._senders.get(sender, ()):
+            if entry.order[0] == nonce + len(run):
+                run.append(entry)
+            elif entry.order[0] > nonce + len(run):
+                break
+        return run
+
+    def next_nonce(self, sender: str, nonce: int) -> int:
+        """The nonce after the sender's pending transactions that follow on from its ledger nonce"""
+        with self._lock:
+            return nonce + len(self._run(sender, nonce))
+
+    def sender_spend(self, sender: str, nonce: int) -> float:
+        """Amounts plus fees of the sender's pending transactions that follow on from its ledger nonce"""
+        with self._lock:
+            return sum(transaction_cost(entry.transaction) for entry in self._run(sender, nonce))
+
+    def add(self, transaction: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Add a transaction, returning False if it is a duplicate or priced out of a full pool"""
+        payload = json.dumps(transaction, sort_keys=True).encode()
+        tx_hash = hashlib.sha256(payload).hexdigest()
+        with self._lock:
+            return self._add(transaction, tx_hash, len(payload), time.time() if now is None else now)
+
+    def _add(self, transaction: Dict[str, Any], tx_hash: str, size: int, now: float) -> bool:
+        if tx_hash in self._entries:
+            return False
+
+        self.expire(now)
+        sequence = next(self._sequence)
+        entry = _Entry(transaction, tx_hash, (transaction.get('nonce', 0), sequence), size, now)
+        if entry.size > self.max_bytes:
+            return False
+
+        # Make room by evicting the cheapest transactions, unless the new one is cheaper still
+        while self._entries and (len(self._entries) + 1 > self.max_transactions
+                                 or self.bytes + entry.size > self.max_bytes):
+            cheapest = self._peek_cheapest()
+            # Evicting the sender's own earlier transaction would strand the new one
+            if cheapest is None or cheapest.fee >= entry.fee or cheapest.sender == entry.sender:
+                return False
+            self._remove_following(cheapest)
+
+        self._entries[tx_hash] = entry
+        self.bytes += entry.size
+        queue = self._senders.setdefault(entry.sender, [])
+        bisect.insort(queue, entry)
+        heapq.heappush(self._evictable, (entry.fee, -sequence, entry))
+        self._arrivals.append(entry)
+        if queue[0] is entry:
+            self._enqueue(entry)
+        self._notify('add', entry)
+        return True
+
+    def _notify(self, event: str, entry: _Entry) -> None:
+        for listener in self.listeners:
+            listener(event, entry.tx_hash, entry.transaction)
+
+    def _enqueue(self, entry: _Entry) -> None:
+        if not entry.queued:
+            entry.queued = True
+            heapq.heappush(self._ready, (-entry.fee, entry.order[1], entry))
+
+    def _peek_cheapest(self) -> Optional[_Entry]:
+        while self._evictable:
+            entry = self._evictable[0][2]
+            if not entry.removed:
+                return entry
+            heapq.heappop(self._evictable)
+        return None
+
+    def _remove(self, entry: _Entry) -> None:
+        entry.removed = True
+        del self._entries[entry.tx_hash]
+        self.bytes -= entry.size
+        queue = self._senders[entry.sender]
+        index = bisect.bisect_left(queue, entry)
+        while queue[index] is not entry:
+            index += 1
+        del queue[index]
+        if not queue:
+            del self._senders[entry.sender]
+        elif index == 0:
+            self._enqueue(queue[0])
+        self._notify('remove', entry)
+        if len(self._evictable) > 2 * len(self._entries) + 1024:
+            self._compact()
+
+    def _remove_following(self, entry: _Entry) -> int:
+        """Drop an entry and the sender's later ones, which could no longer be mined without it"""
+        queue = self._senders[entry.sender]
+        following = [later for later in queue if later.order[0] > entry.order[0]]
+        for removed in [entry] + following:
+            self._remove(removed)
+        return 1 + len(following)
+
+    def _compact(self) -> None:
+        """Drop removed entries that the lazily cleaned heaps still hold"""
+        self._evictable = [item for item in self._evictable if not item[2].removed]
+        heapq.heapify(self._evictable)
+        for item in self._ready:
+            if item[2].removed:
+                item[2].queued = False
+        self._ready = [item for item in self._ready if not item[2].removed]
+        heapq.heapify(self._ready)
+        self._arrivals = deque(entry for entry in self._arrivals if not entry.removed)
+
+    def remove(self, transactions: Iterable[Dict[str, Any]]) -> int:
+        """Drop transactions, e.g. once they were included in a block"""
+        hashes = [hashlib.sha256(json.dumps(transaction, sort_keys=True).encode()).hexdigest()
+                  for transaction in transactions]
+        removed = 0
+        with self._lock:
+            for tx_hash in hashes:
+                entry = self._entries.get(tx_hash)
+                if entry is not None:
+                    self._remove(entry)
+                    removed += 1
+        return removed
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop transactions that have waited longer than the expiry"""
+        deadline = (time.time() if now is None else now) - self.expiry
+        expired = 0
+        with self._lock:
+            while self._arrivals and (self._arrivals[0].removed or self._arrivals[0].added <= deadline):
+                entry = self._arrivals.popleft()
+                if not entry.removed:
+                    expired += self._remove_following(entry)
+        return expired
+
+    def select(self, limit: Optional[int] = None, max_bytes: Optional[int] = None,
+               max_gas: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Pick up to limit transactions by fee within the size and gas budgets, keeping each sender's order"""
+        with self._lock:
+            selected: List[Dict[str, Any]] = []
+            taken: Dict[str, int] = {}
+            popped = []
+            # Entries popped before their predecessor was selected
+            waiting: Dict[_Entry, tuple] = {}
+            size = gas = 0
+            while self._ready and (limit is None or len(selected) < limit):
+                item = heapq.heappop(self._ready)
+                entry = item[2]
+                if entry.removed:
+                    entry.queued = False
+                    continue
+
+                # Only the next unselected transaction of a sender is eligible
+                position = taken.get(entry.sender, 0)
+                queue = self._senders[entry.sender]
+                if queue[position] is not entry:
+                    waiting[entry] = item
+                    continue
+                popped.append(item)
+                if max_bytes is not None and size + entry.size > max_bytes:
+                    continue
+                if max_gas is not None and gas + entry.gas > max_gas:
+                    continue
+                selected.append(entry.transaction)
+                size += entry.size
+                gas += entry.gas
+                taken[entry.sender] = position + 1
+                if position + 1 < len(queue):
+                    following = queue[position + 1]
+                    if following in waiting:
+                        heapq.heappush(self._ready, waiting.pop(following))
+                    else:
+                        self._enqueue(following)
+
+            # Selection leaves the pool unchanged
+            for item in popped + list(waiting.values()):
+                heapq.heappush(self._ready, item)
+            return selected
\ No newline at end of file
@@ -0,0 +1,368 @@
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import List, Dict, Any, Iterator, Tuple, Optional, Union
+from .block import Block
+from .index import HeightIndex, HashIndex
+
+# Every record is framed as: magic, payload length, crc32 of payload, payload
+RECORD_MAGIC = b'XGPR'
+RECORD_HEADER = struct.Struct('<4sII')
+
+SEGMENT_PREFIX = 'blk'
+SEGMENT_SUFFIX = '.dat'
+JOURNAL_FILE = 'pending.log'
+META_STATE = 'meta'
+HEIGHT_INDEX_FILE = 'height.idx'
+HASH_INDEX_FILE = 'hash.idx'
+
+def encode_record(payload: bytes) -> bytes:
+    """Frame a payload as a store record"""
+    return RECORD_HEADER.pack(RECORD_MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+def scan_records(data: bytes, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, payload) for each valid record, stopping at the first torn or corrupt one"""
+    end = len(data)
+    while offset + RECORD_HEADER.size <= end:
+        magic, length, checksum = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        if magic != RECORD_MAGIC or start + length > end:
+            return
+        payload = bytes(data[start:start + length])
+        if zlib.crc32(payload) != checksum:
+            return
+        yield offset, payload
+        offset = start + length
+
+def encode_json(data: Any) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode()
+
+class BlockStore:
+    def __init__(self, path: str, segment_size: int = 64 * 1024 * 1024,
+                 sync_every: int = 64, sync_interval: float = 1.0, max_mapped_segments: int = 16):
+        self.path = path
+        self.segment_size = segment_size
+        self.sync_every = sync_every  # Records written before an fsync is forced
+        self.sync_interval = sync_interval  # Seconds before an fsync is forced
+        self.max_mapped_segments = max_mapped_segments
+        os.makedirs(path, exist_ok=True)
+
+        self.meta: Dict[str, Any] = self._load_meta()
+        self.segments: List[int] = self._list_segments()
+        self.heights = HeightIndex(os.path.join(path, HEIGHT_INDEX_FILE))
+        self.hashes = HashIndex(os.path.join(path, HASH_INDEX_FILE))
+        self.pending: List[Dict[str, Any]] = []
+        self._maps: 'OrderedDict[int, mmap.mmap]' = OrderedDict()
+        self._recover()
+
+        self._segment_file = open(self._segment_path(self.segments[-1]), 'ab')
+        self._journal_file = open(os.path.join(path, JOURNAL_FILE), 'ab')
+        self._dirty = set()
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{SEGMENT_PREFIX}{segment:05d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self) -> List[int]:
+        segments = sorted(
+            int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.path)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        return segments or [0]
+
+    def _load_meta(self) -> Dict[str, Any]:
+        return self.load_state(META_STATE) or {}
+
+    @property
+    def height(self) -> int:
+        """Height of the last stored block, -1 when empty"""
+        return len(self.heights) - 1
+
+    def _recover(self) -> None:
+        """Reconcile the indexes with the segment files and truncate torn writes left by a crash"""
+        # Drop index entries whose records never made it to disk
+        while len(self.heights) and not self._record_valid(*self.heights.location(self.height)):
+            self.heights.truncate(self.height)
+        if self.hashes.count > len(self.heights):
+            self.hashes.rebuild(
+                (self.heights.block_hash(height), height) for height in range(len(self.heights))
+            )
+
+        # Only records written after the last indexed block need to be scanned
+        if len(self.heights):
+            segment, offset, length = self.heights.location(self.height)
+            offset += length
+        else:
+            segment, offset = self.segments[0], 0
+
+        for current in [s for s in self.segments if s >= segment]:
+            start = offset if current == segment else 0
+            file_path = self._segment_path(current)
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'rb') as f:
+                f.seek(start)
+                data = f.read()
+
+            valid_end = 0
+            for record_offset, payload in scan_records(data):
+                block = json.loads(payload)
+                if block['index'] != len(self.heights):
+                    break
+                valid_end = record_offset + RECORD_HEADER.size + len(payload)
+                self.heights.append(block['hash'], current, start + record_offset, valid_end - record_offset)
+
+            if valid_end < len(data):
+                with open(file_path, 'r+b') as f:
+                    f.truncate(start + valid_end)
+                    os.fsync(f.fileno())
+
+        for height in range(self.hashes.count, len(self.heights)):
+            self.hashes.add(self.heights.block_hash(height), height)
+        self.heights.flush()
+        self.hashes.flush()
+
+        journal_path = os.path.join(self.path, JOURNAL_FILE)
+        self._truncate_invalid_tail(journal_path)
+        self.pending = list(self._read_records(journal_path))
+
+    def _record_valid(self, segment: int, offset: int, length: int) -> bool:
+        """Check that a complete, uncorrupted record exists at a location"""
+        file_path = self._segment_path(segment)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) < offset + length:
+            return False
+        with open(file_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return any(True for _ in scan_records(data))
+
+    def _truncate_invalid_tail(self, file_path: str) -> None:
+        """Cut a file after its last valid record"""
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'rb') as f:
+            data = f.read()
+
+        valid_end = 0
+        for offset, payload in scan_records(data):
+            valid_end = offset + RECORD_HEADER.size + len(payload)
+
+        if valid_end < len(data):
+            with open(file_path, 'r+b') as f:
+                f.truncate(valid_end)
+                os.fsync(f.fileno())
+
+    def _read_records(self, file_path: str) -> Iterator[Any]:
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        for _, payload in scan_records(data):
+            yield json.loads(payload)
+
+    def set_meta(self, key: str, value: Any) -> None:
+        """Atomically update a metadata value"""
+        self.meta[key] = value
+        self.save_state(META_STATE, self.meta)
+
+    def append_block(self, block: Block) -> Tuple[int, int, int]:
+        """Append a block and return its (segment, offset, length) location"""
+        if block.index != self.height + 1:
+            raise ValueError(f"Expected block {self.height + 1}, got block {block.index}")
+
+        record = encode_record(encode_json(block.to_dict()))
+        offset = self._segment_file.tell()
+        if offset > 0 and offset + len(record) > self.segment_size:
+            self._roll_segment()
+            offset = 0
+
+        self._segment_file.write(record)
+        self._dirty.add(self._segment_file)
+        self.heights.append(block.hash, self.segments[-1], offset, len(record))
+        self.hashes.add(block.hash, block.index)
+        self._maybe_sync()
+        return self.segments[-1], offset, len(record)
+
+    def _roll_segment(self) -> None:
+        """Close the current segment and start a new one"""
+        self._sync_file(self._segment_file)
+        self._dirty.discard(self._segment_file)
+        self._segment_file.close()
+        self.segments.append(self.segments[-1] + 1)
+        self._segment_file = open(self._segment_path(self.segments[-1]), 'ab')
+        self._sync_directory()
+
+    def _segment_map(self, segment: int, end: int) -> mmap.mmap:
+        """Get a read-only mapping of a segment that covers at least end bytes"""
+        mapped = self._maps.get(segment)
+        if mapped is not None and len(mapped) >= end:
+            self._maps.move_to_end(segment)
+            return mapped
+
+        # The active segment grows, so its mapping is refreshed when a read goes past it
+        if mapped is not None:
+            mapped.close()
+        if segment == self.segments[-1]:
+            self._segment_file.flush()
+        with open(self._segment_path(segment), 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = mapped
+        self._maps.move_to_end(segment)
+        while len(self._maps) > self.max_mapped_segments:
+            _, evicted = self._maps.popitem(last=False)
+            evicted.close()
+        return mapped
+
+    def read_raw(self, height: int) -> bytes:
+        """Read the serialized block at a height without parsing it"""
+        segment, offset, length = self.heights.location(height)
+        mapped = self._segment_map(segment, offset + length)
+        return mapped[offset + RECORD_HEADER.size:offset + length]
+
+    def read_block(self, height: int) -> Block:
+        """Read the block at a height from the mapped segment files"""
+        return Block.from_dict(json.loads(self.read_raw(height)))
+
+    def find_height(self, block_hash: str) -> Optional[int]:
+        """Get the height of a block by hash"""
+        return self.hashes.get(block_hash)
+
+    def block_hash(self, height: int) -> str:
+        """Get the hash of the block at a height without reading the block"""
+        return self.heights.block_hash(height)
+
+    def iter_blocks(self, start: int = 0, end: Optional[int] = None) -> Iterator[Block]:
+        """Iterate over stored blocks in [start, end)"""
+        end = self.height + 1 if end is None else min(end, self.height + 1)
+        for height in range(max(start, 0), end):
+            yield self.read_block(height)
+
+    def load_state(self, name: str) -> Optional[Dict[str, Any]]:
+        """Load a JSON state snapshot saved with save_state"""
+        try:
+            with open(os.path.join(self.path, f"{name}.json"), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_state(self, name: str, state: Dict[str, Any]) -> None:
+        """Atomically save a JSON state snapshot"""
+        state_path = os.path.join(self.path, f"{name}.json")
+        with open(state_path + '.tmp', 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(state_path + '.tmp', state_path)
+
+    def append_transaction(self, transaction: Dict[str, Any]) -> None:
+        """Journal a pending transaction"""
+        self._journal_file.write(encode_record(encode_json(transaction)))
+        self._dirty.add(self._journal_file)
+        self.pending.append(transaction)
+        self._maybe_sync()
+
+    def rewrite_pending(self, transactions: List[Dict[str, Any]]) -> None:
+        """Replace the pending transaction journal, e.g. after a block was mined"""
+        # The block must be durable before the transactions it consumed are dropped
+        self.sync()
+
+        journal_path = os.path.join(self.path, JOURNAL_FILE)
+        with open(journal_path + '.tmp', 'wb') as f:
+            for transaction in transactions:
+                f.write(encode_record(encode_json(transaction)))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._journal_file.close()
+        os.replace(journal_path + '.tmp', journal_path)
+        self._sync_directory()
+        self._journal_file = open(journal_path, 'ab')
+        self.pending = list(transactions)
+
+    def _maybe_sync(self) -> None:
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.time() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush and fsync all files written since the last sync"""
+        for f in self._dirty:
+            self._sync_file(f)
+        self._dirty.clear()
+        self.heights.flush()
+        self.hashes.flush()
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def _sync_file(self, f) -> None:
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _sync_directory(self) -> None:
+        """Make file creations and renames durable"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(self.path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self) -> None:
+        """Sync and close the store"""
+        self.sync()
+        self._segment_file.close()
+        self._journal_file.close()
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        self.heights.close()
+        self.hashes.close()
+
+class StoredChain:
+    """List-like view of the blocks in a BlockStore, read lazily"""
+
+    def __init__(self, store: BlockStore, cache_size: int = 256):
+        self.store = store
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[int, Block]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.store.height + 1
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Block, List[Block]]:
+        if isinstance(key, slice):
+            return [self[height] for height in range(*key.indices(len(self)))]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("block index out of range")
+
+        block = self._cache.get(key)
+        if block is None:
+            block = self.store.read_block(key)
+            self._remember(key, block)
+        else:
+            self._cache.move_to_end(key)
+        return block
+
+    def __iter__(self) -> Iterator[Block]:
+        # Stream straight from the store so a full scan does not churn the cache
+        return self.store.iter_blocks()
+
+    def _remember(self, height: int, block: Block) -> None:
+        self._cache[height] = block
+        self._cache.move_to_end(height)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def append(self, block: Block) -> None:
+        """Append a block to the store"""
+        self.store.append_block(block)
+        self._remember(block.index, block)
\ No newline at end of file
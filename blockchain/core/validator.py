@@ -0,0 +1,152 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional, Tuple, Iterator, Callable, Union, List
+from .block import Block
+from .storage import StoredChain
+
+# Blocks checked per worker task
+CHUNK_SIZE = 2048
+
+ChunkResult = Tuple[int, int, Optional[str], Optional[str], Optional[int], Optional[str]]
+
+def _check_chunk(start: int, records: List[Union[bytes, Dict[str, Any]]], difficulty: int) -> ChunkResult:
+    """Check the hashes, proof of work and inner linkage of consecutive blocks
+
+    Returns (start, count, first previous hash, last hash, invalid height, reason).
+    """
+    first_previous = last_hash = None
+    for offset, record in enumerate(records):
+        height = start + offset
+        block = Block.from_dict(json.loads(record) if isinstance(record, bytes) else record)
+        if block.index != height:
+            return start, offset, first_previous, last_hash, height, 'index mismatch'
+        if block.hash != block.calculate_hash():
+            return start, offset, first_previous, last_hash, height, 'hash mismatch'
+        if not block.meets_difficulty(difficulty):
+            return start, offset, first_previous, last_hash, height, 'insufficient proof of work'
+        if block.has_duplicate_transactions() or block.reward_count() > 1:
+            return start, offset, first_previous, last_hash, height, 'duplicate transactions'
+        if last_hash is None:
+            first_previous = block.previous_hash
+        elif block.previous_hash != last_hash:
+            return start, offset, first_previous, last_hash, height, 'broken link'
+        last_hash = block.hash
+    return start, len(records), first_previous, last_hash, None, None
+
+class ChainValidator:
+    """Validates a chain past a trusted checkpoint, checking blocks in parallel chunks"""
+
+    def __init__(self, processes: Optional[int] = None, chunk_size: int = CHUNK_SIZE):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.checkpoint_height = 0
+        self.checkpoint_hash: Optional[str] = None
+        self.report: Dict[str, Any] = {}
+
+    def _checkpoint_matches(self, chain) -> bool:
+        """Check that the checkpoint is still part of the chain"""
+        if self.checkpoint_hash is None or self.checkpoint_height >= len(chain):
+            return False
+        if isinstance(chain, StoredChain):
+            return chain.store.block_hash(self.checkpoint_height) == self.checkpoint_hash
+        return chain[self.checkpoint_height].hash == self.checkpoint_hash
+
+    def reset(self, chain) -> None:
+        """Trust only the genesis block"""
+        self.checkpoint_height = 0
+        self.checkpoint_hash = chain[0].hash
+
+    def _chunks(self, chain, start: int, end: int) -> Iterator[Tuple[int, list]]:
+        """Serialized blocks in chunks; stored blocks are passed on without parsing"""
+        for chunk_start in range(start, end, self.chunk_size):
+            heights = range(chunk_start, min(chunk_start + self.chunk_size, end))
+            if isinstance(chain, StoredChain):
+                records = [chain.store.read_raw(height) for height in heights]
+            else:
+                records = [chain[height].to_dict() for height in heights]
+            yield chunk_start, records
+
+    def validate(self, chain, difficulty: int, full: bool = False,
+                 progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> bool:
+        """Validate the blocks after the checkpoint, or the whole chain if full is set"""
+        if full or not self._checkpoint_matches(chain):
+            self.reset(chain)
+        start, end = self.checkpoint_height + 1, len(chain)
+        self.report = {
+            'start': start,
+            'end': end,
+            'checked': 0,
+            'height': self.checkpoint_height,
+            'elapsed': 0.0,
+            'blocks_per_second': 0.0,
+            'valid': True
+        }
+        began = time.perf_counter()
+
+        # Chunks may finish out of order; linkage between them is checked in order
+        finished: Dict[int, ChunkResult] = {}
+        next_start = start
+
+        def collect(result: ChunkResult) -> bool:
+            nonlocal next_start
+            finished[result[0]] = result
+            while next_start in finished:
+                chunk_start, count, first_previous, last_hash, bad_height, reason = finished.pop(next_start)
+                if count and first_previous != self.checkpoint_hash:
+                    bad_height, reason = chunk_start, 'broken link'
+                if count and bad_height != chunk_start:
+                    # Everything before the first invalid block is now trusted
+                    self.checkpoint_height = chunk_start + count - 1
+                    self.checkpoint_hash = last_hash
+                self.report['checked'] += count
+                self.report['height'] = self.checkpoint_height
+                self.report['elapsed'] = time.perf_counter() - began
+                self.report['blocks_per_second'] = self.report['checked'] / max(self.report['elapsed'], 1e-9)
+                if bad_height is not None:
+                    self.report.update(valid=False, invalid_height=bad_height, reason=reason)
+                    return False
+                next_start = chunk_start + count
+                if progress is not None:
+                    progress(dict(self.report))
+            return True
+
+        chunks = self._chunks(chain, start, end)
+        if self.processes == 1 or end - start <= self.chunk_size:
+            return all(collect(_check_chunk(chunk_start, records, difficulty))
+                       for chunk_start, records in chunks)
+
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            pending = set()
+            for chunk_start, records in chunks:
+                # Bound the chunks in flight so memory stays flat on long chains
+                while len(pending) >= self.processes * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    if not all(collect(future.result()) for future in done):
+                        self._cancel(executor, pending)
+                        return False
+                pending.add(executor.submit(_check_chunk, chunk_start, records, difficulty))
+            for future in pending:
+                if not collect(future.result()):
+                    self._cancel(executor, pending)
+                    return False
+        return True
+
+    @staticmethod
+    def _cancel(executor: ProcessPoolExecutor, pending) -> None:
+        """Drop the chunks not started yet; shutdown(cancel_futures=True) needs Python 3.9"""
+        for future in pending:
+            future.cancel()
+        executor.shutdown()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'checkpoint_height': self.checkpoint_height,
+            'checkpoint_hash': self.checkpoint_hash
+        }
+
+    def load(self, data: Dict[str, Any]) -> None:
+        """Restore a checkpoint saved with to_dict"""
+        self.checkpoint_height = data['checkpoint_height']
+        self.checkpoint_hash = data['checkpoint_hash']
\ No newline at end of file
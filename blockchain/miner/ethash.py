@@ -1,154 +1,428 @@
-import hashlib
-import numpy as np
-from typing import Tuple, List, Optional
-import time
-import os
-import mmap
-import struct
-from ..config.token import get_block_reward, TOKEN_SYMBOL
-
-class Ethash:
-    def __init__(self, cache_size: int = 1024 * 1024 * 16):  # 16MB cache
-        self.cache_size = cache_size
-        self.cache = None
-        self.cache_epoch = -1
-        self.cache_file = "ethash_cache.dat"
-
-    def get_seedhash(self, epoch: int) -> bytes:
-        """Get the seed hash for a given epoch"""
-        seed = b'\x00' * 32
-        for _ in range(epoch):
-            seed = hashlib.sha3_256(seed).digest()
-        return seed
-
-    def generate_cache(self, epoch: int) -> None:
-        """Generate the cache for a given epoch"""
-        if self.cache_epoch == epoch and self.cache is not None:
-            return
-
-        seed = self.get_seedhash(epoch)
-        n = self.cache_size // 64
-        cache = np.zeros(n, dtype=np.uint32)
-
-        # Initialize cache
-        cache[0] = int.from_bytes(hashlib.sha3_256(seed).digest()[:4], 'little')
-        for i in range(1, n):
-            cache[i] = int.from_bytes(
-                hashlib.sha3_256(cache[i-1].tobytes()).digest()[:4],
-                'little'
-            )
-
-        # Perform cache generation rounds
-        for _ in range(3):
-            for i in range(n):
-                v = cache[i] % n
-                cache[i] = cache[i] ^ cache[v]
-                cache[i] = int.from_bytes(
-                    hashlib.sha3_256(cache[i].tobytes()).digest()[:4],
-                    'little'
-                )
-
-        self.cache = cache
-        self.cache_epoch = epoch
-
-        # Save cache to file
-        with open(self.cache_file, 'wb') as f:
-            f.write(cache.tobytes())
-
-    def load_cache(self, epoch: int) -> bool:
-        """Load cache from file if it exists"""
-        if not os.path.exists(self.cache_file):
-            return False
-
-        try:
-            with open(self.cache_file, 'rb') as f:
-                cache_data = f.read()
-            self.cache = np.frombuffer(cache_data, dtype=np.uint32)
-            self.cache_epoch = epoch
-            return True
-        except:
-            return False
-
-    def hashimoto(self, header: bytes, nonce: int, full_size: int) -> Tuple[bytes, bytes]:
-        """Hashimoto algorithm implementation"""
-        if self.cache is None:
-            raise ValueError("Cache not initialized")
-
-        n = len(self.cache)
-        mix = hashlib.sha3_256(header + nonce.to_bytes(8, 'little')).digest()
-        mix = int.from_bytes(mix, 'little') % n
-
-        for _ in range(64):
-            mix = self.cache[mix] ^ int.from_bytes(mix.to_bytes(4, 'little'), 'little')
-            mix = int.from_bytes(hashlib.sha3_256(mix.to_bytes(4, 'little')).digest()[:4], 'little')
-
-        return hashlib.sha3_256(mix.to_bytes(4, 'little')).digest(), mix.to_bytes(4, 'little')
-
-    def mine(self, header: bytes, difficulty: int, start_nonce: int = 0) -> Optional[Tuple[int, bytes]]:
-        """Mine a block with the given header and difficulty"""
-        epoch = int.from_bytes(header[:4], 'big') // 30000
-
-        # Try to load cache, generate if not available
-        if not self.load_cache(epoch):
-            self.generate_cache(epoch)
-
-        target = 2 ** (256 - difficulty)
-        nonce = start_nonce
-
-        while True:
-            mix_digest, result = self.hashimoto(header, nonce, self.cache_size)
-            if int.from_bytes(result, 'big') < target:
-                return nonce, mix_digest
-            nonce += 1
-
-    def verify(self, header: bytes, nonce: int, mix_digest: bytes, difficulty: int) -> bool:
-        """Verify a block's proof of work"""
-        epoch = int.from_bytes(header[:4], 'big') // 30000
-        if not self.load_cache(epoch):
-            self.generate_cache(epoch)
-
-        target = 2 ** (256 - difficulty)
-        _, result = self.hashimoto(header, nonce, self.cache_size)
-        return int.from_bytes(result, 'big') < target
-
-class EthashMiner:
-    def __init__(self, difficulty: int = 4):
-        self.ethash = Ethash()
-        self.difficulty = difficulty
-        self.is_mining = False
-        self.current_block_height = 0
-
-    def mine_block(self, header: bytes) -> Optional[Tuple[int, bytes, int]]:
-        """Mine a block with the given header"""
-        result = self.ethash.mine(header, self.difficulty)
-        if result:
-            nonce, mix_digest = result
-            reward = get_block_reward(self.current_block_height)
-            self.current_block_height += 1
-            return nonce, mix_digest, reward
-        return None
-
-    def verify_block(self, header: bytes, nonce: int, mix_digest: bytes) -> bool:
-        """Verify a block's proof of work"""
-        return self.ethash.verify(header, nonce, mix_digest, self.difficulty)
-
-    def start_mining(self, header: bytes) -> None:
-        """Start mining with the given header"""
-        self.is_mining = True
-        while self.is_mining:
-            result = self.mine_block(header)
-            if result:
-                nonce, mix_digest, reward = result
-                print(f"Block found! Nonce: {nonce}")
-                print(f"Mix digest: {mix_digest.hex()}")
-                print(f"Mining reward: {reward} {TOKEN_SYMBOL}")
-                break
-            time.sleep(0.1)  # Prevent CPU overload
-
-    def stop_mining(self) -> None:
-        """Stop mining"""
-        self.is_mining = False
-
-    def get_current_reward(self) -> int:
-        """Get the current block reward"""
+import hashlib
+import numpy as np
+from typing import Tuple, List, Optional, Dict, Callable
+import os
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, Future
+from ..config.token import get_block_reward, TOKEN_SYMBOL
+
+WORD = struct.Struct('<I')
+NONCE = struct.Struct('<Q')
+
+# Nonces evaluated per hashimoto_batch call while mining
+BATCH_SIZE = 4096
+
+# Blocks per epoch; every epoch has its own seed hash and cache
+EPOCH_LENGTH = 30000
+
+# Start building the next epoch's cache this many blocks before the boundary
+PREGENERATE_DISTANCE = 1000
+
+# Cache file header: magic, format version, epoch, word count, seed hash (padded to 64 bytes)
+CACHE_MAGIC = b'XGPE'
+CACHE_FORMAT_VERSION = 1
+CACHE_HEADER = struct.Struct('<4sIIQ32s12x')
+
+# Full dataset (DAG): every item mixes DATASET_PARENTS pseudo-randomly chosen cache words
+DATASET_SIZE = 1024 * 1024 * 64  # 64MB dataset
+DATASET_PARENTS = 16
+DATASET_MAGIC = b'XGPD'
+DATASET_CHUNK = 1 << 20  # Items generated per worker task
+FNV_PRIME = 0x01000193
+
+def build_cache(seed: bytes, n: int) -> np.ndarray:
+    """Build an n-word cache from a seed hash"""
+    # Every word depends on the one before it, so the loop stays sequential; it works on
+    # plain ints and packed bytes to skip NumPy scalar boxing and int/bytes round trips
+    sha3 = hashlib.sha3_256
+    pack = WORD.pack
+    unpack = WORD.unpack_from
+    cache = [0] * n
+
+    # Initialize cache
+    word = unpack(sha3(seed).digest())[0]
+    cache[0] = word
+    for i in range(1, n):
+        word = unpack(sha3(pack(word)).digest())[0]
+        cache[i] = word
+
+    # Perform cache generation rounds
+    for _ in range(3):
+        for i in range(n):
+            word = cache[i]
+            word ^= cache[word % n]
+            cache[i] = unpack(sha3(pack(word)).digest())[0]
+
+    return np.array(cache, dtype=np.uint32)
+
+def build_caches(seeds: List[bytes], n: int, processes: Optional[int] = None) -> List[np.ndarray]:
+    """Build caches for several seeds, one process per seed"""
+    if len(seeds) == 1 or processes == 1:
+        return [build_cache(seed, n) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(build_cache, seeds, [n] * len(seeds)))
+
+def calc_dataset_item(cache: np.ndarray, index: int) -> int:
+    """Compute one dataset item from the cache"""
+    n = len(cache)
+    mix = int(cache[index % n]) ^ index
+    for j in range(DATASET_PARENTS):
+        parent = ((((index ^ j) * FNV_PRIME) & 0xffffffff) ^ mix) % n
+        mix = ((mix * FNV_PRIME) & 0xffffffff) ^ int(cache[parent])
+    return mix
+
+def calc_dataset_items(cache: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Compute dataset items for an array of indices; matches calc_dataset_item"""
+    n = len(cache)
+    prime = np.uint32(FNV_PRIME)
+    indices = indices.astype('<u4')
+    # uint32 array arithmetic wraps modulo 2 ** 32 like the masked scalar version
+    mix = cache[indices % n] ^ indices
+    for j in range(DATASET_PARENTS):
+        parent = ((indices ^ np.uint32(j)) * prime ^ mix) % n
+        mix = (mix * prime) ^ cache[parent]
+    return mix
+
+def map_words(path: str, magic: bytes, epoch: int, words: int, seed: bytes,
+              mode: str = 'r') -> Optional[np.memmap]:
+    """Map the words of a cache or dataset file after validating its header"""
+    try:
+        with open(path, 'rb') as f:
+            header = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+        if (header != (magic, CACHE_FORMAT_VERSION, epoch, words, seed)
+                or os.path.getsize(path) != CACHE_HEADER.size + words * 4):
+            return None
+        return np.memmap(path, dtype='<u4', mode=mode, offset=CACHE_HEADER.size, shape=(words,))
+    except (OSError, ValueError, struct.error):
+        return None
+
+def write_cache_file(path: str, epoch: int, seed: bytes, cache: np.ndarray) -> None:
+    """Atomically write a cache with its validation header"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_FORMAT_VERSION, epoch, len(cache), seed))
+        f.write(cache.astype('<u4').tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def generate_cache_file(path: str, epoch: int, seed: bytes, n: int) -> str:
+    """Build a cache and write it to path; runs in a background process"""
+    write_cache_file(path, epoch, seed, build_cache(seed, n))
+    return path
+
+def _fill_dataset_range(dataset_path: str, cache_path: str, epoch: int, seed: bytes,
+                        n: int, words: int, start: int, end: int) -> None:
+    """Compute dataset items [start, end) into a dataset file; runs in a worker process"""
+    cache = map_words(cache_path, CACHE_MAGIC, epoch, n, seed)
+    dataset = np.memmap(dataset_path, dtype='<u4', mode='r+', offset=CACHE_HEADER.size, shape=(words,))
+    dataset[start:end] = calc_dataset_items(cache, np.arange(start, end, dtype='<u4'))
+    dataset.flush()
+
+def generate_dataset_file(path: str, cache_path: str, epoch: int, seed: bytes, n: int,
+                          words: int, processes: Optional[int] = None) -> str:
+    """Build a dataset file from a cache file, spreading item ranges over processes"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        # The header is only written once every item is in place
+        f.write(b'\x00' * CACHE_HEADER.size)
+        f.truncate(CACHE_HEADER.size + words * 4)
+
+    tasks = [
+        (tmp_path, cache_path, epoch, seed, n, words, start, min(start + DATASET_CHUNK, words))
+        for start in range(0, words, DATASET_CHUNK)
+    ]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        list(executor.map(_fill_dataset_range, *zip(*tasks)))
+
+    with open(tmp_path, 'r+b') as f:
+        f.write(CACHE_HEADER.pack(DATASET_MAGIC, CACHE_FORMAT_VERSION, epoch, words, seed))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+class Ethash:
+    def __init__(self, cache_size: int = 1024 * 1024 * 16,  # 16MB cache
+                 cache_dir: str = "ethash", max_cached_epochs: int = 3, batch_size: int = BATCH_SIZE,
+                 full_size: int = DATASET_SIZE, full: bool = False, processes: Optional[int] = None):
+        self.cache_size = cache_size
+        self.full_size = full_size
+        self.full = full  # Mine against the full dataset instead of computing items from the cache
+        self.processes = processes
+        self.batch_size = batch_size
+        self.cache = None
+        self.cache_epoch = -1
+        self.dataset = None
+        self.dataset_epoch = -1
+        self.cache_dir = cache_dir
+        self.max_cached_epochs = max_cached_epochs
+
+        # Recently used caches by epoch, least recently used first
+        self.caches: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+        # Seed hashes of epochs 0..len-1
+        self._seedhashes: List[bytes] = [b'\x00' * 32]
+        self._lock = threading.Lock()
+        self._pregenerating: Dict[int, Future] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def get_seedhash(self, epoch: int) -> bytes:
+        """Get the seed hash for a given epoch"""
+        with self._lock:
+            # Extend the memoized seed chain from the highest epoch seen so far
+            seedhashes = self._seedhashes
+            while len(seedhashes) <= epoch:
+                seedhashes.append(hashlib.sha3_256(seedhashes[-1]).digest())
+            return seedhashes[epoch]
+
+    def cache_path(self, epoch: int) -> str:
+        """Get the cache file path for an epoch"""
+        seed = self.get_seedhash(epoch)
+        return os.path.join(self.cache_dir, f"cache-{epoch}-{seed[:8].hex()}.dat")
+
+    def _activate(self, epoch: int, cache: np.ndarray) -> None:
+        """Make a cache the current one and record it as most recently used"""
+        self.caches[epoch] = cache
+        self.caches.move_to_end(epoch)
+        while len(self.caches) > self.max_cached_epochs:
+            self.caches.popitem(last=False)
+        self.cache = cache
+        self.cache_epoch = epoch
+
+    def generate_cache(self, epoch: int) -> None:
+        """Generate the cache for a given epoch"""
+        if self.cache_epoch == epoch and self.cache is not None:
+            return
+
+        seed = self.get_seedhash(epoch)
+        cache = build_cache(seed, self.cache_size // 64)
+
+        # Save cache to file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_cache_file(self.cache_path(epoch), epoch, seed, cache)
+        self._activate(epoch, cache)
+
+    def load_cache(self, epoch: int) -> bool:
+        """Load cache from file if it exists"""
+        if epoch in self.caches:
+            self._activate(epoch, self.caches[epoch])
+            return True
+
+        # Let a background build for this epoch finish rather than starting another one
+        future = self._pregenerating.pop(epoch, None)
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                return False
+
+        cache = map_words(self.cache_path(epoch), CACHE_MAGIC, epoch, self.cache_size // 64,
+                          self.get_seedhash(epoch))
+        if cache is None:
+            return False
+
+        self._activate(epoch, cache)
+        return True
+
+    def prepare_cache(self, epoch: int) -> None:
+        """Make the cache for an epoch current, loading or generating it as needed"""
+        if not self.load_cache(epoch):
+            self.generate_cache(epoch)
+
+    def dataset_path(self, epoch: int) -> str:
+        """Get the full dataset file path for an epoch"""
+        seed = self.get_seedhash(epoch)
+        return os.path.join(self.cache_dir, f"full-{epoch}-{seed[:8].hex()}.dat")
+
+    def load_dataset(self, epoch: int) -> bool:
+        """Map the full dataset for an epoch if it has been generated"""
+        if self.dataset_epoch == epoch and self.dataset is not None:
+            return True
+        dataset = map_words(self.dataset_path(epoch), DATASET_MAGIC, epoch, self.full_size // 4,
+                            self.get_seedhash(epoch))
+        if dataset is None:
+            return False
+        self.dataset = dataset
+        self.dataset_epoch = epoch
+        return True
+
+    def generate_dataset(self, epoch: int) -> None:
+        """Generate the full dataset for an epoch from its cache file"""
+        self.prepare_cache(epoch)
+        generate_dataset_file(
+            self.dataset_path(epoch), self.cache_path(epoch), epoch, self.get_seedhash(epoch),
+            self.cache_size // 64, self.full_size // 4, self.processes
+        )
+        if not self.load_dataset(epoch):
+            raise ValueError(f"Failed to load generated dataset for epoch {epoch}")
+
+    def prepare_dataset(self, epoch: int) -> None:
+        """Make the full dataset for an epoch current, generating it if needed"""
+        if not self.load_dataset(epoch):
+            self.generate_dataset(epoch)
+
+    def _dataset_lookup(self, full_size: int) -> Optional[np.ndarray]:
+        """Get the mapped dataset if it belongs to the current cache, else None for light mode"""
+        if (self.dataset is not None and self.dataset_epoch == self.cache_epoch
+                and len(self.dataset) == full_size // 4):
+            return self.dataset
+        return None
+
+    def pregenerate(self, epoch: int) -> Optional[Future]:
+        """Build an epoch's cache file in a background process"""
+        if epoch in self.caches or epoch in self._pregenerating or os.path.exists(self.cache_path(epoch)):
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        future = self._executor.submit(
+            generate_cache_file, self.cache_path(epoch), epoch, self.get_seedhash(epoch), self.cache_size // 64
+        )
+        self._pregenerating[epoch] = future
+        return future
+
+    def maybe_pregenerate(self, block_number: int) -> None:
+        """Start building the next epoch's cache when the epoch boundary is close"""
+        if block_number % EPOCH_LENGTH >= EPOCH_LENGTH - PREGENERATE_DISTANCE:
+            self.pregenerate(block_number // EPOCH_LENGTH + 1)
+
+    def close(self) -> None:
+        """Stop the background cache builder"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._pregenerating.clear()
+
+    def hashimoto(self, header: bytes, nonce: int, full_size: int) -> Tuple[bytes, bytes]:
+        """Hashimoto algorithm implementation"""
+        if self.cache is None:
+            raise ValueError("Cache not initialized")
+
+        n = len(self.cache)
+        full_n = full_size // 4
+        dataset = self._dataset_lookup(full_size)
+        seed = hashlib.sha3_256(header + NONCE.pack(nonce)).digest()
+        mix = int.from_bytes(seed, 'little') % n
+
+        for _ in range(64):
+            # Full mode reads the dataset; light mode computes the same item from the cache
+            index = mix % full_n
+            item = int(dataset[index]) if dataset is not None else calc_dataset_item(self.cache, index)
+            mix = item ^ mix
+            mix = int.from_bytes(hashlib.sha3_256(mix.to_bytes(4, 'little')).digest()[:4], 'little')
+
+        mix_digest = hashlib.sha3_256(mix.to_bytes(4, 'little')).digest()
+        return mix_digest, hashlib.sha3_256(seed + mix_digest).digest()
+
+    def hashimoto_batch(self, header: bytes, start_nonce: int, count: int,
+                        full_size: Optional[int] = None) -> Tuple[List[bytes], List[bytes]]:
+        """Run hashimoto for count consecutive nonces, returning their mix digests and results"""
+        if self.cache is None:
+            raise ValueError("Cache not initialized")
+
+        sha3 = hashlib.sha3_256
+        cache = self.cache
+        n = len(cache)
+        full_size = self.full_size if full_size is None else full_size
+        full_n = full_size // 4
+        dataset = self._dataset_lookup(full_size)
+        pack_nonce = NONCE.pack
+        seeds = [sha3(header + pack_nonce(nonce)).digest()
+                 for nonce in range(start_nonce, start_nonce + count)]
+        mix = np.array([int.from_bytes(seed, 'little') % n for seed in seeds], dtype='<u4')
+
+        # Every nonce walks its own chain, so each round is one gather and one hash per lane
+        offsets = range(0, 4 * count, 4)
+        for _ in range(64):
+            indices = mix % full_n
+            items = dataset[indices] if dataset is not None else calc_dataset_items(cache, indices)
+            data = (items ^ mix).astype('<u4').tobytes()
+            mix = np.frombuffer(b''.join([sha3(data[i:i + 4]).digest()[:4] for i in offsets]), dtype='<u4')
+
+        data = mix.tobytes()
+        mix_digests = [sha3(data[i:i + 4]).digest() for i in offsets]
+        results = [sha3(seed + mix_digest).digest() for seed, mix_digest in zip(seeds, mix_digests)]
+        return mix_digests, results
+
+    def search_batch(self, header: bytes, start_nonce: int, count: int,
+                     difficulty: int) -> Optional[Tuple[int, bytes]]:
+        """Return the first nonce in [start_nonce, start_nonce + count) that meets the difficulty"""
+        target = 2 ** (256 - difficulty)
+        mix_digests, results = self.hashimoto_batch(header, start_nonce, count)
+        for i, result in enumerate(results):
+            if int.from_bytes(result, 'big') < target:
+                return start_nonce + i, mix_digests[i]
+        return None
+
+    def mine(self, header: bytes, difficulty: int, start_nonce: int = 0,
+             should_stop: Optional[Callable[[], bool]] = None) -> Optional[Tuple[int, bytes]]:
+        """Mine a block with the given header and difficulty, checking should_stop between batches"""
+        block_number = int.from_bytes(header[:4], 'big')
+        epoch = block_number // EPOCH_LENGTH
+
+        # Try to load cache, generate if not available
+        self.prepare_cache(epoch)
+        if self.full:
+            self.prepare_dataset(epoch)
+        self.maybe_pregenerate(block_number)
+
+        nonce = start_nonce
+        while should_stop is None or not should_stop():
+            found = self.search_batch(header, nonce, self.batch_size, difficulty)
+            if found:
+                return found
+            nonce += self.batch_size
+        return None
+
+    def verify(self, header: bytes, nonce: int, mix_digest: bytes, difficulty: int) -> bool:
+        """Verify a block's proof of work"""
+        epoch = int.from_bytes(header[:4], 'big') // EPOCH_LENGTH
+        self.prepare_cache(epoch)
+
+        target = 2 ** (256 - difficulty)
+        expected_digest, result = self.hashimoto(header, nonce, self.full_size)
+        return expected_digest == mix_digest and int.from_bytes(result, 'big') < target
+
+class EthashMiner:
+    def __init__(self, difficulty: int = 4, full: bool = False):
+        self.ethash = Ethash(full=full)
+        self.difficulty = difficulty
+        self.is_mining = False
+        self.current_block_height = 0
+
+    def mine_block(self, header: bytes) -> Optional[Tuple[int, bytes, int]]:
+        """Mine a block with the given header"""
+        result = self.ethash.mine(header, self.difficulty, should_stop=lambda: not self.is_mining)
+        if result:
+            nonce, mix_digest = result
+            reward = get_block_reward(self.current_block_height)
+            self.current_block_height += 1
+            return nonce, mix_digest, reward
+        return None
+
+    def verify_block(self, header: bytes, nonce: int, mix_digest: bytes) -> bool:
+        """Verify a block's proof of work"""
+        return self.ethash.verify(header, nonce, mix_digest, self.difficulty)
+
+    def start_mining(self, header: bytes) -> None:
+        """Start mining with the given header"""
+        self.is_mining = True
+        # mine_block only returns without a result once stop_mining was called
+        result = self.mine_block(header)
+        self.is_mining = False
+        if result:
+            nonce, mix_digest, reward = result
+            print(f"Block found! Nonce: {nonce}")
+            print(f"Mix digest: {mix_digest.hex()}")
+            print(f"Mining reward: {reward} {TOKEN_SYMBOL}")
+
+    def stop_mining(self) -> None:
+        """Stop mining"""
+        self.is_mining = False
+
+    def get_current_reward(self) -> int:
+        """Get the current block reward"""
         return get_block_reward(self.current_block_height) 
\ No newline at end of file
@@ -1,32 +1,79 @@
-import time
-from typing import Optional
-from ..core.blockchain import Blockchain
-from ..wallet.wallet import Wallet
-
-class Miner:
-    def __init__(self, blockchain: Blockchain, wallet: Wallet):
-        self.blockchain = blockchain
-        self.wallet = wallet
-        self.is_mining = False
-
-    def start_mining(self) -> None:
-        self.is_mining = True
-        while self.is_mining:
-            # Check if there are pending transactions
-            if len(self.blockchain.pending_transactions) > 0:
-                print(f"Mining block {len(self.blockchain.chain)}...")
-                self.blockchain.mine_pending_transactions(self.wallet.address)
-                print(f"Block mined! Reward: {self.blockchain.mining_reward}")
-            time.sleep(1)  # Prevent CPU overload
-
-    def stop_mining(self) -> None:
-        self.is_mining = False
-
-    def get_mining_status(self) -> dict:
-        return {
-            "is_mining": self.is_mining,
-            "miner_address": self.wallet.address,
-            "pending_transactions": len(self.blockchain.pending_transactions),
-            "current_block": len(self.blockchain.chain),
-            "mining_reward": self.blockchain.mining_reward
-        } 
\ No newline at end of file
+from typing import Optional, Callable, Dict
+from ..core.block import Block
+from ..core.blockchain import Blockchain
+from ..wallet.wallet import Wallet
+from .parallel import ParallelMiner
+from .template import TemplateBuilder
+
+class Miner:
+    def __init__(self, blockchain: Blockchain, wallet: Wallet, processes: Optional[int] = None):
+        self.blockchain = blockchain
+        self.wallet = wallet
+        self.is_mining = False
+        self.engine = ParallelMiner(processes)
+        self.templates = TemplateBuilder(blockchain, wallet.address)
+
+    def start_mining(self) -> None:
+        self.is_mining = True
+        try:
+            while self.is_mining:
+                # Blocks are mined even with an empty pool; their reward is how coins are created
+                print(f"Mining block {len(self.blockchain.chain)}...")
+                block = self.mine_block(lambda: not self.is_mining)
+                if block is not None:
+                    print(f"Block mined! Reward: {self.blockchain.mining_reward} "
+                          f"({self.engine.hashrate:.0f} H/s)")
+        finally:
+            self.engine.close()
+
+    def mine_block(self, should_stop: Optional[Callable[[], bool]] = None) -> Optional[Block]:
+        """Mine the best template, moving to better templates as transactions arrive"""
+        block = self.templates.update()
+        tip = block.previous_hash
+        header_prefix = block.header_prefix()
+        templates: Dict[bytes, Block] = {header_prefix: block}
+
+        def next_work() -> Optional[bytes]:
+            template = self.templates.update()
+            if template.previous_hash != tip:
+                return None
+            prefix = template.header_prefix()
+            if prefix in templates:
+                return None
+            templates[prefix] = template
+            return prefix
+
+        def stale() -> bool:
+            # Templates on an old tip cannot be extended, so give up the search
+            if self.blockchain.get_latest_block().hash != tip:
+                return True
+            return should_stop is not None and should_stop()
+
+        result = self.engine.search(header_prefix, self.blockchain.difficulty, 0, stale, next_work)
+        if result is None:
+            return None
+        nonce, block_hash, header_prefix = result
+        block = templates[header_prefix]
+        block.nonce = nonce
+        block.hash = block_hash
+        # A peer block may have extended the tip after the search finished
+        return block if self.blockchain.add_mined_block(block) else None
+
+    def stop_mining(self) -> None:
+        self.is_mining = False
+        self.engine.cancel()
+
+    def on_new_tip(self) -> None:
+        """Abandon the current search because another block extended the chain"""
+        self.engine.cancel()
+
+    def get_mining_status(self) -> dict:
+        return {
+            "is_mining": self.is_mining,
+            "miner_address": self.wallet.address,
+            "pending_transactions": len(self.blockchain.pending_transactions),
+            "current_block": len(self.blockchain.chain),
+            "mining_reward": self.blockchain.mining_reward,
+            "hashrate": self.engine.hashrate,
+            "workers": self.engine.get_stats()['workers']
+        }
\ No newline at end of file
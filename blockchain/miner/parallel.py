@@ -0,0 +1,140 @@
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Optional, Tuple, Callable
+from ..core.block import NONCE
+
+# Nonces hashed between checks of the shared cutoff
+CHECK_INTERVAL = 4096
+
+NO_CUTOFF = 2 ** 64 - 1
+
+_cutoff = None
+
+def _init_worker(cutoff) -> None:
+    global _cutoff
+    _cutoff = cutoff
+
+def _search_range(header_prefix: bytes, target_value: int, start: int,
+                  end: int) -> Tuple[Optional[int], Optional[str], int, float, int]:
+    """Scan nonces in [start, end) and return (nonce, hash, hashes, elapsed, pid)"""
+    began = time.perf_counter()
+    midstate = hashlib.sha256(header_prefix)
+    pack_nonce = NONCE.pack
+    nonce = start
+    while nonce < end:
+        # Stop once another worker has solved a lower nonce or the search was cancelled
+        cutoff = _cutoff.value
+        if nonce >= cutoff:
+            break
+        stop = min(end, cutoff, nonce + CHECK_INTERVAL)
+        while nonce < stop:
+            attempt = midstate.copy()
+            attempt.update(pack_nonce(nonce))
+            digest = attempt.digest()
+            if int.from_bytes(digest, 'big') < target_value:
+                with _cutoff.get_lock():
+                    if nonce < _cutoff.value:
+                        _cutoff.value = nonce
+                return nonce, digest.hex(), nonce - start + 1, time.perf_counter() - began, os.getpid()
+            nonce += 1
+    return None, None, nonce - start, time.perf_counter() - began, os.getpid()
+
+class ParallelMiner:
+    def __init__(self, processes: Optional[int] = None, chunk_size: int = 1 << 16):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._cutoff = multiprocessing.Value('Q', NO_CUTOFF)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cancelled = False
+        self.worker_stats: Dict[int, Dict[str, Any]] = {}
+        self.hashrate = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_worker,
+                initargs=(self._cutoff,)
+            )
+        return self._executor
+
+    def search(self, header_prefix: bytes, difficulty: int, start_nonce: int = 0,
+               should_stop: Optional[Callable[[], bool]] = None,
+               next_work: Optional[Callable[[], Optional[bytes]]] = None) -> Optional[Tuple[int, str, bytes]]:
+        """Find the lowest nonce whose header hash meets the difficulty
+
+        next_work may return a new header prefix, which later chunks search without
+        restarting the workers. Returns (nonce, hash, header prefix that was solved).
+        """
+        executor = self._get_executor()
+        target_value = 1 << (256 - 4 * difficulty)
+        self._cutoff.value = NO_CUTOFF
+        self._cancelled = False
+
+        futures = {}
+        next_start = start_nonce
+        best: Optional[Tuple[int, str, bytes]] = None
+        began = time.perf_counter()
+        hashes = 0
+
+        while True:
+            # Keep every worker busy with consecutive chunks until a solution shows up
+            while best is None and len(futures) < self.processes * 2:
+                futures[next_start] = (header_prefix, executor.submit(
+                    _search_range, header_prefix, target_value, next_start, next_start + self.chunk_size
+                ))
+                next_start += self.chunk_size
+
+            done, _ = wait([future for _, future in futures.values()], timeout=0.1, return_when=FIRST_COMPLETED)
+            if self._cancelled or (should_stop is not None and should_stop()):
+                self.cancel()
+                wait([future for _, future in futures.values()])
+                return None
+
+            for chunk_start in [start for start, (_, future) in futures.items() if future in done]:
+                prefix, future = futures.pop(chunk_start)
+                nonce, block_hash, count, elapsed, pid = future.result()
+                hashes += count
+                self._record(pid, count, elapsed)
+                if nonce is not None and (best is None or nonce < best[0]):
+                    best = (nonce, block_hash, prefix)
+
+            # Chunks in flight finish on the old template; new chunks use the new one
+            if best is None and next_work is not None:
+                header_prefix = next_work() or header_prefix
+
+            if best is not None and not futures:
+                break
+            self.hashrate = hashes / max(time.perf_counter() - began, 1e-9)
+
+        self.hashrate = hashes / max(time.perf_counter() - began, 1e-9)
+        return best
+
+    def _record(self, pid: int, hashes: int, elapsed: float) -> None:
+        stats = self.worker_stats.setdefault(pid, {'hashes': 0, 'elapsed': 0.0, 'hashrate': 0.0})
+        stats['hashes'] += hashes
+        stats['elapsed'] += elapsed
+        if stats['elapsed'] > 0:
+            stats['hashrate'] = stats['hashes'] / stats['elapsed']
+
+    def cancel(self) -> None:
+        """Stop all workers of the running search"""
+        self._cancelled = True
+        self._cutoff.value = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'processes': self.processes,
+            'hashrate': self.hashrate,
+            'workers': {str(pid): dict(stats) for pid, stats in self.worker_stats.items()}
+        }
+
+    def close(self) -> None:
+        """Cancel any search and shut down the worker processes"""
+        self.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
\ No newline at end of file
@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional
+from .miner import Miner
+
+# Number of found blocks kept for the status report
+FOUND_HISTORY = 50
+
+class MiningService:
+    """Runs a Miner in a background thread controlled through a command queue"""
+
+    def __init__(self, miner: Miner, found_history: int = FOUND_HISTORY):
+        self.miner = miner
+        self.is_mining = False
+        self.found_blocks = deque(maxlen=found_history)
+        self.blocks_found = 0
+        self.started_at: Optional[float] = None
+        self._commands: queue.Queue = queue.Queue()
+        self._interrupt = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='mining-service', daemon=True)
+        self._thread.start()
+
+    def start(self) -> None:
+        """Start mining new blocks"""
+        self._commands.put('start')
+        self._interrupt.set()
+
+    def stop(self) -> None:
+        """Stop mining, abandoning the current search"""
+        self._commands.put('stop')
+        self._interrupt.set()
+        self.miner.engine.cancel()
+
+    def new_work(self) -> None:
+        """Wake the worker after new transactions arrived
+
+        A running search is not abandoned; it moves on to the updated template.
+        """
+        self._commands.put('new_work')
+
+    def close(self) -> None:
+        """Stop the worker thread and shut down the mining processes"""
+        self._commands.put('close')
+        self._interrupt.set()
+        self.miner.engine.cancel()
+        self._thread.join()
+        self.miner.engine.close()
+
+    def status(self) -> Dict[str, Any]:
+        """Get a snapshot of the mining state"""
+        status = self.miner.get_mining_status()
+        with self._lock:
+            status.update({
+                'is_mining': self.is_mining,
+                'uptime': time.time() - self.started_at if self.started_at else 0.0,
+                'template': self.miner.templates.summary() if self.is_mining else None,
+                'blocks_found': self.blocks_found,
+                'found_blocks': list(self.found_blocks)
+            })
+        return status
+
+    def _interrupted(self) -> bool:
+        return self._interrupt.is_set()
+
+    def _next_command(self) -> Optional[str]:
+        """Take the next command, waiting only while not mining"""
+        try:
+            if not self.is_mining:
+                return self._commands.get()
+            return self._commands.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _run(self) -> None:
+        while True:
+            # Commands sent from here on interrupt the next search
+            self._interrupt.clear()
+            command = self._next_command()
+            if command == 'close':
+                break
+            if command in ('start', 'stop'):
+                with self._lock:
+                    self.is_mining = command == 'start'
+                    self.miner.is_mining = self.is_mining
+                    self.started_at = time.time() if self.is_mining else None
+            if command is not None:
+                # Drain the queue before starting the next search
+                continue
+            if self.is_mining:
+                # An empty pool still gives a reward-only block, so a fresh chain can get going
+                self._mine()
+
+        with self._lock:
+            self.is_mining = False
+            self.miner.is_mining = False
+
+    def _mine(self) -> None:
+        """Mine one block from the pending transactions, if any"""
+        # The miner's template builder hands new transactions to the running search
+        block = self.miner.mine_block(self._interrupted)
+        if block is None:
+            return
+
+        with self._lock:
+            self.blocks_found += 1
+            self.found_blocks.append({
+                'index': block.index,
+                'hash': block.hash,
+                'nonce': block.nonce,
+                'transactions': len(block.transactions),
+                'reward': self.miner.blockchain.mining_reward,
+                'hashrate': self.miner.engine.hashrate,
+                'found_at': time.time()
+            })
\ No newline at end of file
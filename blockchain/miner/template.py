@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+from ..config.block import MAX_BLOCK_SIZE, MAX_BLOCK_GAS, transaction_gas
+from ..core.block import Block, transaction_hash
+from ..core.blockchain import Blockchain
+from ..core.mempool import transaction_fee
+
+class TemplateBuilder:
+    """Keeps the most valuable candidate block up to date as the mempool changes"""
+
+    def __init__(self, blockchain: Blockchain, miner_address: str,
+                 max_size: int = MAX_BLOCK_SIZE, max_gas: int = MAX_BLOCK_GAS):
+        self.blockchain = blockchain
+        self.miner_address = miner_address
+        self.max_size = max_size
+        self.max_gas = max_gas
+        self.block: Optional[Block] = None
+        self.generation = 0  # Bumped whenever a new template is built
+        self.fees = 0.0
+        self.size = 0
+        self.gas = 0
+        self._tip: Optional[str] = None
+        self._included: Dict[str, Dict[str, Any]] = {}
+        self._senders: Dict[str, int] = {}
+        self._min_fee = 0.0
+        # Mempool events are queued on the intake thread and applied by update()
+        self._events: deque = deque()
+        self._lock = threading.Lock()
+        blockchain.pending_transactions.listeners.append(self._on_event)
+
+    def _on_event(self, event: str, tx_hash: str, transaction: Dict[str, Any]) -> None:
+        self._events.append((event, tx_hash, transaction))
+
+    def close(self) -> None:
+        """Stop following the mempool"""
+        self.blockchain.pending_transactions.listeners.remove(self._on_event)
+
+    def update(self) -> Block:
+        """Return the current template, rebuilding or extending it if the pool or tip changed"""
+        with self._lock:
+            if self.block is None or self.blockchain.get_latest_block().hash != self._tip:
+                self._events.clear()
+                self._rebuild()
+                return self.block
+
+            appended: List[Dict[str, Any]] = []
+            rebuild = False
+            while self._events:
+                event, tx_hash, transaction = self._events.popleft()
+                if event == 'remove':
+                    # A transaction in the template was evicted or expired
+                    if tx_hash in self._included:
+                        rebuild = True
+                elif not rebuild and not self._append(tx_hash, transaction, appended):
+                    # A transaction that does not fit may still outbid one in the template
+                    if transaction_fee(transaction) > self._min_fee:
+                        rebuild = True
+
+            if rebuild:
+                self._events.clear()
+                self._rebuild()
+            elif appended:
+                self._set_transactions(self.block.transactions[:-1] + appended, self.block.index, self._tip)
+            return self.block
+
+    def _append(self, tx_hash: str, transaction: Dict[str, Any], appended: List[Dict[str, Any]]) -> bool:
+        """Add a new transaction to the template if it fits and its sender's earlier ones are in it"""
+        sender = transaction['from']
+        size = len(json.dumps(transaction, sort_keys=True).encode())
+        gas = transaction_gas(transaction)
+        if self.size + size > self.max_size or self.gas + gas > self.max_gas:
+            return False
+        if self.blockchain.pending_transactions.sender_count(sender) != self._senders.get(sender, 0) + 1:
+            return False
+        appended.append(transaction)
+        self._include(tx_hash, transaction, size, gas)
+        return True
+
+    def _include(self, tx_hash: str, transaction: Dict[str, Any], size: int, gas: int) -> None:
+        fee = transaction_fee(transaction)
+        self._min_fee = min(self._min_fee, fee) if self._included else fee
+        self._included[tx_hash] = transaction
+        self._senders[transaction['from']] = self._senders.get(transaction['from'], 0) + 1
+        self.fees += fee
+        self.size += size
+        self.gas += gas
+
+    def _rebuild(self) -> None:
+        """Select a new set of transactions from the mempool"""
+        latest = self.blockchain.get_latest_block()
+        self._tip = latest.hash
+        self._included = {}
+        self._senders = {}
+        self.fees = 0.0
+        self.size = self.gas = 0
+        for transaction in self.blockchain.select_transactions(max_bytes=self.max_size, max_gas=self.max_gas):
+            self._include(transaction_hash(transaction).hex(), transaction,
+                          len(json.dumps(transaction, sort_keys=True).encode()), transaction_gas(transaction))
+        self._set_transactions(list(self._included.values()), latest.index + 1, latest.hash)
+
+    def _set_transactions(self, transactions: List[Dict[str, Any]], index: int, previous_hash: str) -> None:
+        self.block = Block(
+            index,
+            transactions + [self.blockchain.reward_transaction(self.miner_address)],
+            time.time(),
+            previous_hash
+        )
+        self.generation += 1
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Describe the current template for status reports"""
+        with self._lock:
+            if self.block is None:
+                return None
+            return {
+                'generation': self.generation,
+                'index': self.block.index,
+                'previous_hash': self.block.previous_hash,
+                'transactions': len(self.block.transactions),
+                'fees': self.fees,
+                'size': self.size,
+                'gas': self.gas,
+                'created_at': self.block.timestamp
+            }
\ No newline at end of file
@@ -0,0 +1,86 @@
+import base64
+import hashlib
+import os
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from ..core.block import Block
+
+# Bytes per short transaction ID
+SHORT_ID_SIZE = 6
+
+def short_id_key(block_hash: str, nonce: bytes) -> bytes:
+    """Per-block key for short IDs, so colliding transactions cannot be crafted in advance"""
+    return hashlib.sha256(bytes.fromhex(block_hash) + nonce).digest()[:16]
+
+def short_id(key: bytes, tx_hash: bytes) -> bytes:
+    return hashlib.blake2b(tx_hash, digest_size=SHORT_ID_SIZE, key=key).digest()
+
+def _prefill(transaction: Dict[str, Any]) -> bool:
+    # Reward transactions are created by the miner and are in no one's mempool
+    return transaction.get('from') == 'network'
+
+def encode_compact_block(block: Block) -> Dict[str, Any]:
+    """Header plus short IDs of the transactions receivers are expected to have already"""
+    nonce = os.urandom(8)
+    key = short_id_key(block.hash, nonce)
+    short_ids = []
+    prefilled = []
+    for index, (transaction, tx_hash) in enumerate(zip(block.transactions, block.transaction_hashes)):
+        if _prefill(transaction):
+            prefilled.append([index, transaction])
+        else:
+            short_ids.append(short_id(key, tx_hash))
+    return {
+        'header': block.header_dict(),
+        'nonce': nonce.hex(),
+        'short_ids': base64.b64encode(b''.join(short_ids)).decode(),
+        'prefilled': prefilled
+    }
+
+class CompactBlock:
+    """A block being rebuilt from a compact block and the receiver's own transactions"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.header = Block.from_header(payload['header'])
+        raw = base64.b64decode(payload['short_ids'])
+        if len(raw) % SHORT_ID_SIZE:
+            raise ValueError("Malformed short IDs")
+        self.key = short_id_key(self.header.hash, bytes.fromhex(payload['nonce']))
+        count = len(raw) // SHORT_ID_SIZE + len(payload['prefilled'])
+        self.transactions: List[Optional[Dict[str, Any]]] = [None] * count
+        self.short_ids: Dict[bytes, int] = {}
+        for index, transaction in payload['prefilled']:
+            if not 0 <= index < count or self.transactions[index] is not None:
+                raise ValueError("Malformed prefilled transactions")
+            self.transactions[index] = transaction
+        position = 0
+        for index in range(count):
+            if self.transactions[index] is None:
+                self.short_ids[raw[position:position + SHORT_ID_SIZE]] = index
+                position += SHORT_ID_SIZE
+
+    def fill(self, pool: Iterable[Tuple[str, Dict[str, Any]]]) -> List[int]:
+        """Place known (hash, transaction) pairs by short ID, returning the indexes still missing"""
+        matched: Dict[int, Optional[Dict[str, Any]]] = {}
+        for tx_hash, transaction in pool:
+            index = self.short_ids.get(short_id(self.key, bytes.fromhex(tx_hash)))
+            if index is not None:
+                # Two transactions with the same short ID leave the slot to be requested
+                matched[index] = None if index in matched else transaction
+        for index, transaction in matched.items():
+            self.transactions[index] = transaction
+        return self.missing()
+
+    def missing(self) -> List[int]:
+        return [index for index, transaction in enumerate(self.transactions) if transaction is None]
+
+    def add(self, indexes: List[int], transactions: List[Dict[str, Any]]) -> None:
+        for index, transaction in zip(indexes, transactions):
+            self.transactions[index] = transaction
+
+    def block(self) -> Block:
+        """The rebuilt block, which only matches its header hash if every transaction is right"""
+        header = self.header
+        block = Block(header.index, list(self.transactions), header.timestamp, header.previous_hash,
+                      header.nonce, header.miner_address, header.version)
+        block.hash = header.hash
+        return block
\ No newline at end of file
@@ -1 +1,692 @@
- 
\ No newline at end of file
+import asyncio
+import json
+import os
+import struct
+import time
+from collections import Counter, OrderedDict
+from enum import IntEnum
+from typing import Dict, Any, List, Optional, Tuple, Callable, Awaitable
+from ..core.block import Block, LEGACY_BLOCK_VERSION, transaction_hash, is_well_formed_transaction
+from ..core.blockchain import Blockchain
+from .compact import CompactBlock, encode_compact_block
+
+PROTOCOL_VERSION = 1
+
+# Payload length, message type; the payload is JSON
+FRAME_HEADER = struct.Struct('>IB')
+MAX_FRAME_SIZE = 32 * 1024 * 1024
+
+# Frames queued per peer before senders have to wait
+SEND_QUEUE_SIZE = 1024
+
+# Seconds without traffic before a ping is sent, and before a silent peer is dropped
+KEEPALIVE_INTERVAL = 30
+PEER_TIMEOUT = 90
+
+# Seconds to wait for a handshake, and for a peer to deliver requested inventory
+HANDSHAKE_TIMEOUT = 10
+REQUEST_TIMEOUT = 10
+
+# Outbound connections kept open by the connection manager, and its reconnect backoff
+MAX_OUTBOUND = 8
+MAX_BACKOFF = 300
+MAINTAIN_INTERVAL = 1
+
+# Inventory remembered per peer and per node, and items per INV or GETDATA message
+MAX_KNOWN_INVENTORY = 50000
+MAX_INV_ITEMS = 1000
+
+# Headers per HEADERS message, and serialized blocks per BLOCKS message
+MAX_HEADERS = 2000
+MAX_BLOCKS_BYTES = 8 * 1024 * 1024
+
+# Compact blocks waiting for missing transactions
+MAX_PARTIAL_BLOCKS = 16
+
+# Signed transactions held until their sender's earlier nonces arrive
+MAX_FUTURE_TRANSACTIONS = 1000
+
+# Inventory kinds
+INV_TX = 'tx'
+INV_BLOCK = 'block'
+
+Inventory = Tuple[str, str]
+
+class MessageType(IntEnum):
+    HELLO = 0
+    PING = 1
+    PONG = 2
+    INV = 3
+    GETDATA = 4
+    NOTFOUND = 5
+    TX = 6
+    BLOCK = 7
+    GETHEADERS = 8
+    HEADERS = 9
+    GETBLOCKS = 10
+    BLOCKS = 11
+    CMPCTBLOCK = 12
+    GETBLOCKTXN = 13
+    BLOCKTXN = 14
+
+class ProtocolError(Exception):
+    pass
+
+def encode_frame(message_type: int, payload: Dict[str, Any]) -> bytes:
+    """Length-prefixed frame carrying a JSON payload"""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    if len(body) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Message too large: {len(body)} bytes")
+    return FRAME_HEADER.pack(len(body), message_type) + body
+
+def _remember(known: 'OrderedDict[Inventory, None]', item: Inventory) -> None:
+    known[item] = None
+    known.move_to_end(item)
+    if len(known) > MAX_KNOWN_INVENTORY:
+        known.popitem(last=False)
+
+class Peer:
+    """A connection to another node, writing frames from its own bounded queue"""
+
+    def __init__(self, node: 'Node', reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 inbound: bool, address: Optional[Tuple[str, int]] = None):
+        self.node = node
+        self.reader = reader
+        self.writer = writer
+        self.inbound = inbound
+        self.host = writer.get_extra_info('peername')[0]
+        # Address the peer accepts connections on, known from the handshake for inbound peers
+        self.address = address
+        self.node_id: Optional[str] = None
+        self.height = 0
+        self.compact = False  # Whether the peer takes compact blocks
+        self.latency: Optional[float] = None
+        self.ready = asyncio.Event()
+        self.closed = False
+        # Inventory the peer announced or was sent, so nothing crosses the link twice
+        self.known: 'OrderedDict[Inventory, None]' = OrderedDict()
+        # Messages and bytes by message type
+        self.sent: Counter = Counter()
+        self.received: Counter = Counter()
+        self.sent_bytes: Counter = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        now = time.monotonic()
+        self.last_sent = now
+        self.last_received = now
+        self._ping: Optional[Tuple[int, float]] = None
+        self._queue: asyncio.Queue = asyncio.Queue(SEND_QUEUE_SIZE)
+        # Announcements waiting to go out together in the next INV
+        self._inventory: 'OrderedDict[Inventory, None]' = OrderedDict()
+        self._inventory_scheduled = False
+        self._tasks: List[asyncio.Task] = []
+
+    def __repr__(self) -> str:
+        return f"Peer({self.node_id or '?'} {'in' if self.inbound else 'out'} {self.address or self.host})"
+
+    def start(self) -> None:
+        self._tasks = [asyncio.ensure_future(self._read_loop()), asyncio.ensure_future(self._write_loop())]
+
+    async def send(self, message_type: int, payload: Dict[str, Any]) -> None:
+        """Queue a message, waiting while the peer's send queue is full"""
+        if not self.closed:
+            await self._queue.put((message_type, encode_frame(message_type, payload)))
+
+    def send_nowait(self, message_type: int, payload: Dict[str, Any]) -> bool:
+        """Queue a message unless the send queue is full"""
+        if self.closed:
+            return False
+        try:
+            self._queue.put_nowait((message_type, encode_frame(message_type, payload)))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def announce(self, item: Inventory) -> None:
+        """Announce inventory the peer does not know about yet"""
+        if self.closed or item in self.known:
+            return
+        _remember(self.known, item)
+        self._inventory[item] = None
+        if not self._inventory_scheduled:
+            # Wake the writer; if the queue is full it flushes the inventory after its next frame anyway
+            self._inventory_scheduled = True
+            try:
+                self._queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    def _flush_inventory(self) -> None:
+        self._inventory_scheduled = False
+        while self._inventory:
+            items = []
+            while self._inventory and len(items) < MAX_INV_ITEMS:
+                items.append(list(self._inventory.popitem(last=False)[0]))
+            self._write(MessageType.INV, encode_frame(MessageType.INV, {'items': items}))
+
+    def _write(self, message_type: int, frame: bytes) -> None:
+        self.writer.write(frame)
+        name = MessageType(message_type).name
+        self.sent[name] += 1
+        self.sent_bytes[name] += len(frame)
+        self.bytes_sent += len(frame)
+        self.last_sent = time.monotonic()
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is not None:
+                    self._write(*item)
+                # Write out whatever else is queued before waiting for the socket
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        self._write(*item)
+                if self._inventory:
+                    self._flush_inventory()
+                await self.writer.drain()
+        except (ConnectionError, OSError):
+            await self.close()
+
+    async def _read_loop(self) -> None:
+        try:
+            while True:
+                header = await self.reader.readexactly(FRAME_HEADER.size)
+                length, message_type = FRAME_HEADER.unpack(header)
+                if length > MAX_FRAME_SIZE:
+                    raise ProtocolError(f"Frame too large: {length} bytes")
+                payload = json.loads(await self.reader.readexactly(length)) if length else {}
+                self.last_received = time.monotonic()
+                self.bytes_received += FRAME_HEADER.size + length
+                await self.node._dispatch(self, message_type, payload)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError, ValueError, KeyError,
+                IndexError, TypeError, struct.error, OverflowError, ProtocolError):
+            # Disconnects, malformed frames and invalid messages all end the connection
+            pass
+        finally:
+            await self.close()
+
+    def ping(self) -> None:
+        nonce = int.from_bytes(os.urandom(8), 'big')
+        if self.send_nowait(MessageType.PING, {'nonce': nonce}):
+            self._ping = (nonce, time.monotonic())
+
+    def pong(self, nonce: int) -> None:
+        if self._ping is not None and self._ping[0] == nonce:
+            self.latency = time.monotonic() - self._ping[1]
+            self._ping = None
+
+    async def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        current = asyncio.current_task()
+        for task in self._tasks:
+            if task is not current:
+                task.cancel()
+        self.writer.close()
+        self.node._unregister(self)
+        self.ready.set()
+
+Handler = Callable[[Peer, Dict[str, Any]], Awaitable[None]]
+
+class Node:
+    """Asyncio peer-to-peer node relaying transactions and blocks by inventory announcements
+
+    Every object is announced with an INV to the peers that do not know it yet
+    and only sent to peers that ask for it with GETDATA, so it crosses each
+    link at most once. New blocks are pushed to peers that take them as
+    compact blocks instead: the header and short IDs of the transactions,
+    which receivers look up in their own mempool. Other modules extend the
+    protocol through handlers.
+    """
+
+    def __init__(self, blockchain: Blockchain, host: str = '127.0.0.1', port: int = 0,
+                 max_outbound: int = MAX_OUTBOUND, node_id: Optional[str] = None, compact: bool = True):
+        self.blockchain = blockchain
+        self.host = host
+        self.port = port
+        self.max_outbound = max_outbound
+        self.compact = compact
+        self.node_id = node_id or os.urandom(16).hex()
+        self.peers: Dict[str, Peer] = {}
+        # Addresses the connection manager keeps outbound connections to: failures, next attempt
+        self.addresses: Dict[Tuple[str, int], Dict[str, float]] = {}
+        self.handlers: Dict[int, Handler] = {
+            MessageType.HELLO: self._on_hello,
+            MessageType.PING: self._on_ping,
+            MessageType.PONG: self._on_pong,
+            MessageType.INV: self._on_inv,
+            MessageType.GETDATA: self._on_getdata,
+            MessageType.NOTFOUND: self._on_notfound,
+            MessageType.TX: self._on_tx,
+            MessageType.BLOCK: self._on_block,
+            MessageType.GETHEADERS: self._on_getheaders,
+            MessageType.GETBLOCKS: self._on_getblocks,
+            MessageType.CMPCTBLOCK: self._on_cmpctblock,
+            MessageType.GETBLOCKTXN: self._on_getblocktxn,
+            MessageType.BLOCKTXN: self._on_blocktxn
+        }
+        # Called with (peer, block) for blocks that are ahead of the tip, e.g. to start a sync
+        self.orphan_listeners: List[Callable[[Peer, Block], None]] = []
+        self._seen: 'OrderedDict[Inventory, None]' = OrderedDict()
+        self._recent_blocks: 'OrderedDict[str, Block]' = OrderedDict()
+        self._partial_blocks: 'OrderedDict[str, Tuple[CompactBlock, Peer]]' = OrderedDict()
+        # Transactions gossiped ahead of their sender's next nonce, by (sender, nonce)
+        self._future_transactions: 'OrderedDict[Tuple[str, int], Dict[str, Any]]' = OrderedDict()
+        # Inventory asked for: (peer, deadline), and peers that announced it but were not asked yet
+        self._requested: Dict[Inventory, Tuple[Peer, float]] = {}
+        self._announcers: Dict[Inventory, List[Peer]] = {}
+        # Connections still in their handshake, and addresses being dialled
+        self._handshaking: set = set()
+        self._dialling: set = set()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._maintenance: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        """Listen for peers and start the connection manager"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._maintenance = asyncio.ensure_future(self._maintain())
+        # Relay transactions however they reach the mempool, including from other threads
+        self.blockchain.pending_transactions.listeners.append(self._on_mempool_event)
+
+    async def stop(self) -> None:
+        self.blockchain.pending_transactions.listeners.remove(self._on_mempool_event)
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for peer in list(self.peers.values()) + list(self._handshaking):
+            await peer.close()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return (self.host, self.port)
+
+    def add_address(self, host: str, port: int) -> None:
+        """Have the connection manager keep a connection to a node open"""
+        self.addresses.setdefault((host, port), {'failures': 0, 'retry_at': 0.0})
+
+    async def connect(self, host: str, port: int) -> Peer:
+        """Open an outbound connection, or return the open connection to that node"""
+        for peer in self.peers.values():
+            if peer.address == (host, port):
+                return peer
+        reader, writer = await asyncio.open_connection(host, port)
+        peer = Peer(self, reader, writer, inbound=False, address=(host, port))
+        self._handshaking.add(peer)
+        peer.start()
+        try:
+            await peer.send(MessageType.HELLO, self._hello())
+            await asyncio.wait_for(peer.ready.wait(), HANDSHAKE_TIMEOUT)
+        except asyncio.TimeoutError:
+            await peer.close()
+            raise ConnectionError(f"Handshake with {host}:{port} timed out")
+        if peer.closed:
+            # Dropped as a duplicate of a connection the nodes already have
+            existing = self.peers.get(peer.node_id)
+            if existing is None:
+                raise ConnectionError(f"Connection to {host}:{port} was closed")
+            return existing
+        return peer
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = Peer(self, reader, writer, inbound=True)
+        self._handshaking.add(peer)
+        peer.start()
+
+    def _hello(self) -> Dict[str, Any]:
+        return {
+            'version': PROTOCOL_VERSION,
+            'node_id': self.node_id,
+            'port': self.port,
+            'height': self.blockchain.get_latest_block().index,
+            'compact': self.compact
+        }
+
+    def _initiator(self, peer: Peer) -> str:
+        return peer.node_id if peer.inbound else self.node_id
+
+    def _register(self, peer: Peer) -> bool:
+        if peer.node_id == self.node_id:
+            return False
+        existing = self.peers.get(peer.node_id)
+        if existing is not None:
+            # Nodes that dialled each other at once both keep the connection opened by the smaller id
+            if self._initiator(existing) <= self._initiator(peer):
+                return False
+            asyncio.ensure_future(existing.close())
+        self.peers[peer.node_id] = peer
+        return True
+
+    def _unregister(self, peer: Peer) -> None:
+        self._handshaking.discard(peer)
+        if self.peers.get(peer.node_id) is peer:
+            del self.peers[peer.node_id]
+        # Ask other peers for whatever this one still owed us
+        for item, (owner, _) in list(self._requested.items()):
+            if owner is peer:
+                del self._requested[item]
+                self._request_next(item)
+
+    async def _dispatch(self, peer: Peer, message_type: int, payload: Dict[str, Any]) -> None:
+        if peer.node_id is None and message_type != MessageType.HELLO:
+            raise ProtocolError("Message before handshake")
+        handler = self.handlers.get(message_type)
+        if handler is None:
+            raise ProtocolError(f"Unknown message type: {message_type}")
+        peer.received[MessageType(message_type).name] += 1
+        await handler(peer, payload)
+
+    async def _on_hello(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        if peer.node_id is not None:
+            raise ProtocolError("Repeated handshake")
+        if payload['version'] != PROTOCOL_VERSION:
+            raise ProtocolError(f"Unsupported protocol version: {payload['version']}")
+        peer.node_id = payload['node_id']
+        peer.height = payload['height']
+        peer.compact = bool(payload.get('compact'))
+        if peer.inbound:
+            peer.address = (peer.host, payload['port'])
+        self._handshaking.discard(peer)
+        if not self._register(peer):
+            await peer.close()
+            return
+        if peer.inbound:
+            await peer.send(MessageType.HELLO, self._hello())
+        peer.ready.set()
+
+    async def _on_ping(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        await peer.send(MessageType.PONG, {'nonce': payload['nonce']})
+
+    async def _on_pong(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        peer.pong(payload['nonce'])
+
+    def has(self, item: Inventory) -> bool:
+        """Check whether the node already has a transaction or block"""
+        if item in self._seen:
+            return True
+        kind, item_hash = item
+        if kind == INV_TX:
+            return item_hash in self.blockchain.pending_transactions
+        return item_hash in self._recent_blocks or self.blockchain.get_block_by_hash(item_hash) is not None
+
+    def _mark_seen(self, item: Inventory) -> None:
+        _remember(self._seen, item)
+        self._requested.pop(item, None)
+        self._announcers.pop(item, None)
+
+    async def _on_inv(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        wanted = []
+        now = time.monotonic()
+        for kind, item_hash in payload['items']:
+            item = (kind, item_hash)
+            _remember(peer.known, item)
+            if kind not in (INV_TX, INV_BLOCK) or self.has(item):
+                continue
+            requested = self._requested.get(item)
+            if requested is not None and requested[1] > now:
+                # Already on its way from another peer; ask this one if that request fails
+                announcers = self._announcers.setdefault(item, [])
+                if peer not in announcers:
+                    announcers.append(peer)
+                continue
+            self._requested[item] = (peer, now + REQUEST_TIMEOUT)
+            wanted.append([kind, item_hash])
+        if wanted:
+            await peer.send(MessageType.GETDATA, {'items': wanted})
+
+    def _request_next(self, item: Inventory) -> None:
+        """Ask the next peer that announced an item after a request failed"""
+        announcers = self._announcers.get(item)
+        while announcers:
+            peer = announcers.pop(0)
+            if not peer.closed and peer.send_nowait(MessageType.GETDATA, {'items': [list(item)]}):
+                self._requested[item] = (peer, time.monotonic() + REQUEST_TIMEOUT)
+                return
+        self._announcers.pop(item, None)
+
+    async def _on_getdata(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        missing = []
+        for kind, item_hash in payload['items'][:MAX_INV_ITEMS]:
+            _remember(peer.known, (kind, item_hash))
+            if kind == INV_TX:
+                transaction = self.blockchain.pending_transactions.get(item_hash)
+                if transaction is not None:
+                    await peer.send(MessageType.TX, {'transaction': transaction})
+                    continue
+            elif kind == INV_BLOCK:
+                block = self.get_block(item_hash)
+                if block is not None:
+                    await peer.send(MessageType.BLOCK, {'block': block.to_dict()})
+                    continue
+            missing.append([kind, item_hash])
+        if missing:
+            await peer.send(MessageType.NOTFOUND, {'items': missing})
+
+    async def _on_notfound(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        for kind, item_hash in payload['items']:
+            item = (kind, item_hash)
+            requested = self._requested.get(item)
+            if requested is not None and requested[0] is peer:
+                del self._requested[item]
+                self._request_next(item)
+
+    def get_block(self, block_hash: str) -> Optional[Block]:
+        block = self._recent_blocks.get(block_hash)
+        return block if block is not None else self.blockchain.get_block_by_hash(block_hash)
+
+    async def _on_tx(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        transaction = payload['transaction']
+        item = (INV_TX, transaction_hash(transaction).hex())
+        _remember(peer.known, item)
+        # Accepted transactions are relayed by the mempool listener
+        if self.blockchain.add_pending_transaction(transaction):
+            self._mark_seen(item)
+            self._add_following(transaction['from'])
+            return
+        # Rejected transactions are not marked seen, so another announcement can fetch them again
+        self._requested.pop(item, None)
+        self._hold(transaction)
+
+    def _hold(self, transaction: Any) -> None:
+        """Keep a signed transaction that arrived before its sender's earlier nonces"""
+        if not is_well_formed_transaction(transaction):
+            return
+        key = (transaction['from'], transaction['nonce'])
+        if transaction['nonce'] <= self.blockchain.next_nonce(key[0]) or key in self._future_transactions:
+            return
+        if not self.blockchain.verify_transaction(transaction):
+            return
+        self._future_transactions[key] = transaction
+        if len(self._future_transactions) > MAX_FUTURE_TRANSACTIONS:
+            self._future_transactions.popitem(last=False)
+
+    def _add_following(self, sender: str) -> None:
+        """Add the held transactions of a sender that are now next in nonce order"""
+        while self._future_transactions:
+            transaction = self._future_transactions.pop((sender, self.blockchain.next_nonce(sender)), None)
+            if transaction is None or not self.blockchain.add_pending_transaction(transaction):
+                return
+            self._mark_seen((INV_TX, transaction_hash(transaction).hex()))
+
+    async def _on_block(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        block = Block.from_dict(payload['block'])
+        item = (INV_BLOCK, block.hash)
+        _remember(peer.known, item)
+        peer.height = max(peer.height, block.index)
+        if self.blockchain.add_block(block):
+            self._mark_seen(item)
+            self.announce_block(block)
+            return
+        # Not on our tip; forget the request so a later announcement can fetch it again
+        self._requested.pop(item, None)
+        if block.index > self.blockchain.get_latest_block().index + 1:
+            for listener in self.orphan_listeners:
+                listener(peer, block)
+
+    async def _on_getheaders(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        # Continue after the first locator hash on our chain, or from genesis if none is
+        start = 0
+        for block_hash in payload['locator']:
+            height = self.blockchain.get_height(block_hash)
+            if height is not None:
+                start = height + 1
+                break
+        end = start + min(payload.get('limit', MAX_HEADERS), MAX_HEADERS)
+        headers = [block.header_dict() for block in self.blockchain.iter_blocks(start, end)]
+        await peer.send(MessageType.HEADERS, {'id': payload.get('id'), 'headers': headers,
+                                              'height': self.blockchain.get_latest_block().index})
+
+    async def _on_getblocks(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        # Serve consecutive blocks from a height while they match the requested hashes
+        start = payload['start']
+        blocks = []
+        size = 0
+        for block, expected in zip(self.blockchain.iter_blocks(start, start + len(payload['hashes'])),
+                                   payload['hashes']):
+            if block.hash != expected:
+                break
+            data = block.to_dict()
+            size += len(json.dumps(data))
+            if blocks and size > MAX_BLOCKS_BYTES:
+                break
+            blocks.append(data)
+        await peer.send(MessageType.BLOCKS, {'id': payload.get('id'), 'start': start, 'blocks': blocks})
+
+    def announce_block(self, block: Block) -> None:
+        """Announce a block that was added to the chain, e.g. one mined locally"""
+        _remember(self._seen, (INV_BLOCK, block.hash))
+        self._recent_blocks[block.hash] = block
+        if len(self._recent_blocks) > 64:
+            self._recent_blocks.popitem(last=False)
+        item = (INV_BLOCK, block.hash)
+        compact = None
+        for peer in self.peers.values():
+            if not (self.compact and peer.compact) or item in peer.known:
+                peer.announce(item)
+                continue
+            # Push the compact block right away, saving the INV and GETDATA round trip
+            if compact is None:
+                compact = encode_compact_block(block)
+            _remember(peer.known, item)
+            if not peer.send_nowait(MessageType.CMPCTBLOCK, compact):
+                del peer.known[item]
+                peer.announce(item)
+
+    async def _on_cmpctblock(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        compact = CompactBlock(payload)
+        header = compact.header
+        _remember(peer.known, (INV_BLOCK, header.hash))
+        peer.height = max(peer.height, header.index)
+        if header.hash in self._partial_blocks:
+            return
+        tip = self.blockchain.get_latest_block()
+        if header.previous_hash != tip.hash:
+            if header.index > tip.index + 1:
+                for listener in self.orphan_listeners:
+                    listener(peer, header)
+            return
+        if not header.meets_difficulty(self.blockchain.difficulty) or (
+                header.version != LEGACY_BLOCK_VERSION and header.calculate_hash() != header.hash):
+            raise ProtocolError("Invalid compact block header")
+
+        missing = compact.fill(self.blockchain.pending_transactions.items())
+        if missing:
+            self._partial_blocks[header.hash] = (compact, peer)
+            if len(self._partial_blocks) > MAX_PARTIAL_BLOCKS:
+                self._partial_blocks.popitem(last=False)
+            await peer.send(MessageType.GETBLOCKTXN, {'hash': header.hash, 'indexes': missing})
+            return
+        await self._finish_compact(peer, compact)
+
+    async def _finish_compact(self, peer: Peer, compact: CompactBlock) -> None:
+        block = compact.block()
+        item = (INV_BLOCK, block.hash)
+        if self.blockchain.add_block(block):
+            self._mark_seen(item)
+            self.announce_block(block)
+        elif self.blockchain.get_latest_block().hash == block.previous_hash:
+            # A short ID matched the wrong transaction; fetch the full block instead
+            self._requested[item] = (peer, time.monotonic() + REQUEST_TIMEOUT)
+            await peer.send(MessageType.GETDATA, {'items': [list(item)]})
+
+    async def _on_getblocktxn(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        block = self.get_block(payload['hash'])
+        if block is None:
+            await peer.send(MessageType.NOTFOUND, {'items': [[INV_BLOCK, payload['hash']]]})
+            return
+        indexes = [index for index in payload['indexes'] if 0 <= index < len(block.transactions)]
+        await peer.send(MessageType.BLOCKTXN, {
+            'hash': block.hash,
+            'indexes': indexes,
+            'transactions': [block.transactions[index] for index in indexes]
+        })
+
+    async def _on_blocktxn(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        partial = self._partial_blocks.get(payload['hash'])
+        if partial is None or partial[1] is not peer:
+            return
+        del self._partial_blocks[payload['hash']]
+        compact = partial[0]
+        compact.add(payload['indexes'], payload['transactions'])
+        if compact.missing():
+            item = (INV_BLOCK, payload['hash'])
+            self._requested[item] = (peer, time.monotonic() + REQUEST_TIMEOUT)
+            await peer.send(MessageType.GETDATA, {'items': [list(item)]})
+            return
+        await self._finish_compact(peer, compact)
+
+    def _announce(self, item: Inventory) -> None:
+        for peer in self.peers.values():
+            peer.announce(item)
+
+    def _on_mempool_event(self, event: str, tx_hash: str, transaction: Dict[str, Any]) -> None:
+        # Called under the mempool lock, possibly outside the event loop thread
+        if event == 'add' and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._announce, (INV_TX, tx_hash))
+
+    async def _maintain(self) -> None:
+        """Keep peers alive, retry lost requests and keep the outbound connections open"""
+        while True:
+            await asyncio.sleep(MAINTAIN_INTERVAL)
+            now = time.monotonic()
+            for peer in list(self._handshaking):
+                if now - peer.last_received > HANDSHAKE_TIMEOUT:
+                    await peer.close()
+            for peer in list(self.peers.values()):
+                if now - peer.last_received > PEER_TIMEOUT:
+                    await peer.close()
+                elif now - peer.last_sent > KEEPALIVE_INTERVAL:
+                    peer.ping()
+
+            for item, (peer, deadline) in list(self._requested.items()):
+                if deadline <= now:
+                    del self._requested[item]
+                    self._request_next(item)
+
+            outbound = sum(1 for peer in self.peers.values() if not peer.inbound)
+            connected = {peer.address for peer in self.peers.values()}
+            for address, state in self.addresses.items():
+                if outbound >= self.max_outbound:
+                    break
+                if address in connected or address in self._dialling or state['retry_at'] > now:
+                    continue
+                self._dialling.add(address)
+                asyncio.ensure_future(self._dial(address, state))
+                outbound += 1
+
+    async def _dial(self, address: Tuple[str, int], state: Dict[str, float]) -> None:
+        try:
+            await self.connect(*address)
+            state['failures'] = 0
+        except (ConnectionError, OSError):
+            state['failures'] += 1
+            state['retry_at'] = time.monotonic() + min(MAX_BACKOFF, 2 ** state['failures'])
+        finally:
+            self._dialling.discard(address)
\ No newline at end of file
@@ -0,0 +1,358 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, Any, List, Optional, Tuple
+from ..core.block import Block, LEGACY_BLOCK_VERSION
+from .p2p import Node, Peer, MessageType, MAX_HEADERS, REQUEST_TIMEOUT
+
+# Blocks per GETBLOCKS request, requests in flight per peer, and blocks downloaded ahead of the tip
+BLOCKS_PER_REQUEST = 32
+MAX_REQUESTS_PER_PEER = 4
+DOWNLOAD_WINDOW = 1024
+
+# Seconds the range the chain is waiting on may be outstanding before another peer is asked too,
+# at least, and in multiples of the time the fastest peer would need for it
+STALL_TIMEOUT = 0.25
+STALL_FACTOR = 4
+
+# Blocks applied between yields to the event loop
+APPLY_BATCH = 16
+
+# Hashes at the tip of a block locator before the steps start doubling
+LOCATOR_DENSE = 10
+
+class SyncError(Exception):
+    pass
+
+class _Request:
+    __slots__ = ('id', 'peer', 'start', 'count', 'sent_at', 'deadline')
+
+    def __init__(self, request_id: int, peer: Peer, start: int, count: int, now: float):
+        self.id = request_id
+        self.peer = peer
+        self.start = start
+        self.count = count
+        self.sent_at = now
+        self.deadline = now + REQUEST_TIMEOUT
+
+class ChainSync:
+    """Headers-first block download from several peers at once
+
+    Headers come in batches from the best peer and are checked for linkage and
+    proof of work before any body is requested. Bodies are requested in ranges
+    from every peer that has them, within a window ahead of the tip, and a
+    separate task checks them against their headers and applies them in order
+    while later ranges download. The range the chain is waiting on is asked of
+    another peer too when the first is slow.
+    """
+
+    def __init__(self, node: Node, blocks_per_request: int = BLOCKS_PER_REQUEST,
+                 max_requests_per_peer: int = MAX_REQUESTS_PER_PEER, window: int = DOWNLOAD_WINDOW,
+                 stall_timeout: float = STALL_TIMEOUT):
+        self.node = node
+        self.blockchain = node.blockchain
+        self.blocks_per_request = blocks_per_request
+        self.max_requests_per_peer = max_requests_per_peer
+        self.window = window
+        self.stall_timeout = stall_timeout
+        self.running = False
+        self.stats: Dict[str, Any] = {}
+        self._ids = itertools.count()
+        self._header_waiters: Dict[int, asyncio.Future] = {}
+        self._requests: Dict[int, _Request] = {}
+        node.handlers[MessageType.HEADERS] = self._on_headers
+        node.handlers[MessageType.BLOCKS] = self._on_blocks
+        node.orphan_listeners.append(self._on_orphan)
+
+    def _on_orphan(self, peer: Peer, block: Block) -> None:
+        # A gossiped block far ahead of the tip means this node fell behind
+        if not self.running:
+            asyncio.ensure_future(self._run_quietly())
+
+    async def _run_quietly(self) -> None:
+        try:
+            await self.run()
+        except SyncError:
+            pass
+
+    async def run(self) -> Dict[str, Any]:
+        """Download and apply blocks until the chain reaches the best peer's height"""
+        if self.running:
+            raise SyncError("Sync already running")
+        self.running = True
+        try:
+            return await self._sync()
+        finally:
+            self.running = False
+            self._requests.clear()
+            self._header_waiters.clear()
+
+    def _reset(self) -> None:
+        tip = self.blockchain.get_latest_block()
+        self._base = tip.index
+        self._applied = tip.index
+        self._headers: List[Block] = []  # Headers of the blocks after the base
+        self._last_header = tip
+        self._headers_done = False
+        self._bodies: Dict[int, Tuple[Block, Peer]] = {}
+        # Ranges not yet downloaded: start -> count, and the starts waiting for a request
+        self._ranges: Dict[int, int] = {}
+        self._queue: List[int] = []
+        self._in_flight: Dict[Peer, int] = {}
+        self._rates: Dict[Peer, float] = {}  # Blocks per second, smoothed
+        self._wake = asyncio.Event()
+        self._body_ready = asyncio.Event()
+        self.stats = {'blocks': 0, 'requests': 0, 'rerequests': 0, 'timeouts': 0, 'peers': {}}
+
+    async def _sync(self) -> Dict[str, Any]:
+        self._reset()
+        started = time.perf_counter()
+        received = sum(peer.bytes_received for peer in self.node.peers.values())
+        headers = asyncio.ensure_future(self._download_headers())
+        apply = asyncio.ensure_future(self._apply())
+        try:
+            while not apply.done():
+                if headers.done() and headers.exception() is not None:
+                    raise headers.exception()
+                self._schedule()
+                if not self.node.peers and not self._requests:
+                    raise SyncError("No peers to sync from")
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), 0.1)
+                except asyncio.TimeoutError:
+                    pass
+            apply.result()
+        finally:
+            headers.cancel()
+            apply.cancel()
+
+        elapsed = time.perf_counter() - started
+        self.stats.update({
+            'height': self._applied,
+            'seconds': elapsed,
+            'blocks_per_second': self.stats['blocks'] / elapsed if elapsed else 0.0,
+            'bytes_received': sum(peer.bytes_received for peer in self.node.peers.values()) - received
+        })
+        return self.stats
+
+    def _locator(self) -> List[str]:
+        """Hashes from the newest header back to genesis, dense at the tip and sparse below"""
+        locator = [header.hash for header in self._headers[-1:]]
+        height = self._base
+        step = 1
+        while height > 0:
+            locator.append(self.blockchain.get_block(height).hash)
+            if len(locator) >= LOCATOR_DENSE:
+                step *= 2
+            height -= step
+        locator.append(self.blockchain.get_block(0).hash)
+        return locator
+
+    def _check_header(self, header: Block, previous: Block) -> bool:
+        if header.index != previous.index + 1 or header.previous_hash != previous.hash:
+            return False
+        if not header.meets_difficulty(self.blockchain.difficulty):
+            return False
+        # Version 1 hashes cover the transactions, so those are only checked with the body
+        return header.version == LEGACY_BLOCK_VERSION or header.calculate_hash() == header.hash
+
+    async def _download_headers(self) -> None:
+        exhausted = set()
+        unconnected = 0
+        while True:
+            candidates = [peer for peer in self.node.peers.values()
+                          if peer not in exhausted and peer.height > self._last_header.index]
+            if not candidates:
+                if unconnected and not self._headers:
+                    # E.g. the peers are on a chain with another genesis block
+                    raise SyncError("No peer's headers connect to the local chain")
+                self._headers_done = True
+                self._body_ready.set()
+                return
+            peer = max(candidates, key=lambda candidate: candidate.height)
+            request_id = next(self._ids)
+            waiter = asyncio.get_running_loop().create_future()
+            self._header_waiters[request_id] = waiter
+            await peer.send(MessageType.GETHEADERS, {'id': request_id, 'locator': self._locator(),
+                                                     'limit': MAX_HEADERS})
+            try:
+                payload = await asyncio.wait_for(waiter, REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                exhausted.add(peer)
+                continue
+            finally:
+                self._header_waiters.pop(request_id, None)
+
+            previous = self._last_header
+            batch = []
+            for data in payload['headers']:
+                header = Block.from_header(data)
+                if not self._check_header(header, previous):
+                    break
+                batch.append(header)
+                previous = header
+            if not batch:
+                # Nothing that extends our headers, e.g. the peer is on another branch
+                exhausted.add(peer)
+                unconnected += 1
+                continue
+            self._add_headers(batch)
+
+    def _add_headers(self, batch: List[Block]) -> None:
+        self._headers.extend(batch)
+        self._last_header = batch[-1]
+        start = batch[0].index
+        end = batch[-1].index + 1
+        for range_start in range(start, end, self.blocks_per_request):
+            self._ranges[range_start] = min(self.blocks_per_request, end - range_start)
+            heapq.heappush(self._queue, range_start)
+        self._wake.set()
+
+    async def _on_headers(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        peer.height = max(peer.height, payload.get('height', 0))
+        waiter = self._header_waiters.get(payload.get('id'))
+        if waiter is not None and not waiter.done():
+            waiter.set_result(payload)
+
+    def _slots(self, peer: Peer, best: float) -> int:
+        # Peers that have not answered yet or are far slower than the best get one request at a time
+        rate = self._rates.get(peer)
+        if rate is None or rate < best / 4:
+            return 1
+        return self.max_requests_per_peer
+
+    def _free_peers(self, end: int, exclude: Optional[Peer] = None) -> List[Peer]:
+        """Peers with a free request slot that have the blocks up to end, fastest first"""
+        best = max(self._rates.values(), default=0.0)
+        peers = [peer for peer in self.node.peers.values()
+                 if peer is not exclude and peer.height >= end
+                 and self._in_flight.get(peer, 0) < self._slots(peer, best)]
+        peers.sort(key=lambda peer: (self._in_flight.get(peer, 0), -self._rates.get(peer, 0.0)))
+        return peers
+
+    def _request(self, peer: Peer, start: int, count: int, now: float) -> bool:
+        request = _Request(next(self._ids), peer, start, count, now)
+        hashes = [header.hash for header in self._headers[start - self._base - 1:start - self._base - 1 + count]]
+        if not peer.send_nowait(MessageType.GETBLOCKS, {'id': request.id, 'start': start, 'hashes': hashes}):
+            return False
+        self._requests[request.id] = request
+        self._in_flight[peer] = self._in_flight.get(peer, 0) + 1
+        self.stats['requests'] += 1
+        return True
+
+    def _schedule(self) -> None:
+        now = time.monotonic()
+        for request in list(self._requests.values()):
+            if request.peer.closed or request.deadline <= now:
+                self._fail(request)
+                self.stats['timeouts'] += 1
+
+        # Ask a second, faster peer for the range the chain is waiting on
+        waiting = self._applied + 1
+        head = [request for request in self._requests.values()
+                if request.start <= waiting < request.start + request.count]
+        if len(head) == 1:
+            request = head[0]
+            best = max(self._rates.values(), default=0.0)
+            expected = request.count / best if best else 0.0
+            if now - request.sent_at > max(self.stall_timeout, STALL_FACTOR * expected):
+                peers = self._free_peers(request.start + request.count - 1, exclude=request.peer)
+                faster = [peer for peer in peers
+                          if self._rates.get(peer, 0.0) >= self._rates.get(request.peer, 0.0)]
+                if faster and self._request(faster[0], request.start, request.count, now):
+                    # The staller gets fewer ranges from now on
+                    self._rates[request.peer] = self._rates.get(request.peer, 0.0) / 2
+                    self.stats['rerequests'] += 1
+
+        # Hand out ranges within the window to peers with free slots
+        limit = self._applied + self.window
+        while self._queue and self._queue[0] <= limit:
+            start = self._queue[0]
+            count = self._ranges.get(start)
+            if count is None:
+                heapq.heappop(self._queue)
+                continue
+            peers = self._free_peers(start + count - 1)
+            if not peers or not self._request(peers[0], start, count, now):
+                break
+            heapq.heappop(self._queue)
+
+    def _release(self, request: _Request) -> None:
+        self._requests.pop(request.id, None)
+        self._in_flight[request.peer] -= 1
+
+    def _fail(self, request: _Request) -> None:
+        self._release(request)
+        self._rates[request.peer] = self._rates.get(request.peer, 0.0) / 2
+        # Queue the range again unless another request for it is still outstanding
+        if request.start in self._ranges and not any(other.start == request.start
+                                                     for other in self._requests.values()):
+            heapq.heappush(self._queue, request.start)
+
+    async def _on_blocks(self, peer: Peer, payload: Dict[str, Any]) -> None:
+        request = self._requests.get(payload.get('id'))
+        if request is None or request.peer is not peer:
+            return
+        blocks = payload['blocks'][:request.count]
+        if not blocks:
+            # The peer does not have the range after all
+            peer.height = min(peer.height, request.start - 1)
+            self._fail(request)
+            self._wake.set()
+            return
+        self._release(request)
+
+        elapsed = max(time.monotonic() - request.sent_at, 1e-6)
+        rate = self._rates.get(peer)
+        self._rates[peer] = len(blocks) / elapsed if rate is None else 0.7 * rate + 0.3 * len(blocks) / elapsed
+
+        for offset, data in enumerate(blocks):
+            height = request.start + offset
+            if height > self._applied and height not in self._bodies:
+                self._bodies[height] = (Block.from_dict(data), peer)
+        if request.start in self._ranges:
+            del self._ranges[request.start]
+            if len(blocks) < request.count:
+                # A short reply, e.g. to keep the message small; queue the rest
+                rest = request.start + len(blocks)
+                self._ranges[rest] = request.count - len(blocks)
+                heapq.heappush(self._queue, rest)
+        self._body_ready.set()
+        self._wake.set()
+
+    async def _apply(self) -> None:
+        """Check bodies against their headers and add them to the chain in order"""
+        while True:
+            applied = 0
+            while self._applied + 1 in self._bodies:
+                height = self._applied + 1
+                block, peer = self._bodies.pop(height)
+                header = self._headers[height - self._base - 1]
+                if self.blockchain.get_latest_block().hash == header.hash:
+                    # Already added, e.g. relayed by gossip while the sync ran
+                    self._applied = height
+                    continue
+                # The header chain is valid, so a body that does not hash to its header is bad
+                if block.hash != header.hash or not self.blockchain.add_block(block):
+                    if self.blockchain.get_latest_block().hash != header.previous_hash:
+                        raise SyncError(f"Chain tip moved away from the downloaded headers at height {height}")
+                    await peer.close()
+                    self._ranges[height] = 1
+                    heapq.heappush(self._queue, height)
+                    break
+                self._applied = height
+                self.stats['blocks'] += 1
+                peers = self.stats['peers']
+                peers[peer.node_id] = peers.get(peer.node_id, 0) + 1
+                applied += 1
+                if applied % APPLY_BATCH == 0:
+                    # Let downloads proceed while a long run of blocks is applied
+                    self._wake.set()
+                    await asyncio.sleep(0)
+            self._wake.set()
+            if self._headers_done and self._applied >= self._last_header.index:
+                return
+            self._body_ready.clear()
+            await self._body_ready.wait()
\ No newline at end of file
@@ -1,168 +1,561 @@
-from typing import Dict, Any, List, Optional
-import hashlib
-import hmac
-import time
-import json
-from Crypto.Cipher import AES
-from Crypto.Random import get_random_bytes
-from Crypto.Protocol.KDF import PBKDF2
-from Crypto.Util.Padding import pad, unpad
-
-class SecurityManager:
-    def __init__(self):
-        self.salt = get_random_bytes(16)
-        self.key = None
-        self.encrypted_data = {}
-
-    def derive_key(self, password: str) -> bytes:
-        """Derive a key from a password using PBKDF2"""
-        return PBKDF2(
-            password.encode(),
-            self.salt,
-            dkLen=32,
-            count=100000
-        )
-
-    def encrypt_data(self, data: Dict[str, Any], password: str) -> bytes:
-        """Encrypt data using AES-256-GCM"""
-        if not self.key:
-            self.key = self.derive_key(password)
-
-        # Convert data to JSON
-        json_data = json.dumps(data).encode()
-
-        # Generate a random IV
-        iv = get_random_bytes(12)
-
-        # Create cipher
-        cipher = AES.new(self.key, AES.MODE_GCM, nonce=iv)
-
-        # Encrypt the data
-        ciphertext, tag = cipher.encrypt_and_digest(pad(json_data, AES.block_size))
-
-        # Combine IV, tag, and ciphertext
-        encrypted_data = iv + tag + ciphertext
-        return encrypted_data
-
-    def decrypt_data(self, encrypted_data: bytes, password: str) -> Dict[str, Any]:
-        """Decrypt data using AES-256-GCM"""
-        if not self.key:
-            self.key = self.derive_key(password)
-
-        # Extract IV, tag, and ciphertext
-        iv = encrypted_data[:12]
-        tag = encrypted_data[12:28]
-        ciphertext = encrypted_data[28:]
-
-        # Create cipher
-        cipher = AES.new(self.key, AES.MODE_GCM, nonce=iv)
-
-        # Decrypt the data
-        try:
-            decrypted_data = unpad(cipher.decrypt_and_verify(ciphertext, tag), AES.block_size)
-            return json.loads(decrypted_data.decode())
-        except (ValueError, KeyError):
-            raise ValueError("Invalid password or corrupted data")
-
-class TransactionSecurity:
-    def __init__(self):
-        self.replay_protection = {}
-        self.max_replay_window = 3600  # 1 hour
-
-    def add_replay_protection(self, transaction_hash: str) -> None:
-        """Add a transaction to replay protection"""
-        self.replay_protection[transaction_hash] = time.time()
-
-    def check_replay_protection(self, transaction_hash: str) -> bool:
-        """Check if a transaction is protected from replay attacks"""
-        if transaction_hash in self.replay_protection:
-            # Check if the transaction is still within the replay window
-            if time.time() - self.replay_protection[transaction_hash] > self.max_replay_window:
-                del self.replay_protection[transaction_hash]
-                return False
-            return True
-        return False
-
-    def clean_expired_protection(self) -> None:
-        """Clean up expired replay protection entries"""
-        current_time = time.time()
-        expired = [
-            tx_hash for tx_hash, timestamp in self.replay_protection.items()
-            if current_time - timestamp > self.max_replay_window
-        ]
-        for tx_hash in expired:
-            del self.replay_protection[tx_hash]
-
-class BlockSecurity:
-    def __init__(self):
-        self.block_timestamps = {}
-        self.min_block_time = 15  # Minimum seconds between blocks
-
-    def check_block_timing(self, block_hash: str, timestamp: float) -> bool:
-        """Check if a block's timing is valid"""
-        if not self.block_timestamps:
-            self.block_timestamps[block_hash] = timestamp
-            return True
-
-        last_timestamp = max(self.block_timestamps.values())
-        if timestamp - last_timestamp < self.min_block_time:
-            return False
-
-        self.block_timestamps[block_hash] = timestamp
-        return True
-
-    def clean_old_timestamps(self, max_age: int = 3600) -> None:
-        """Clean up old block timestamps"""
-        current_time = time.time()
-        expired = [
-            block_hash for block_hash, timestamp in self.block_timestamps.items()
-            if current_time - timestamp > max_age
-        ]
-        for block_hash in expired:
-            del self.block_timestamps[block_hash]
-
-class NetworkSecurity:
-    def __init__(self):
-        self.peer_blacklist = set()
-        self.rate_limits = {}
-        self.max_requests = 100  # Maximum requests per minute
-        self.rate_limit_window = 60  # 1 minute window
-
-    def add_to_blacklist(self, peer_address: str) -> None:
-        """Add a peer to the blacklist"""
-        self.peer_blacklist.add(peer_address)
-
-    def is_blacklisted(self, peer_address: str) -> bool:
-        """Check if a peer is blacklisted"""
-        return peer_address in self.peer_blacklist
-
-    def check_rate_limit(self, peer_address: str) -> bool:
-        """Check if a peer has exceeded the rate limit"""
-        current_time = time.time()
-        if peer_address not in self.rate_limits:
-            self.rate_limits[peer_address] = []
-
-        # Remove old requests
-        self.rate_limits[peer_address] = [
-            t for t in self.rate_limits[peer_address]
-            if current_time - t < self.rate_limit_window
-        ]
-
-        # Check if the peer has exceeded the rate limit
-        if len(self.rate_limits[peer_address]) >= self.max_requests:
-            return False
-
-        # Add the current request
-        self.rate_limits[peer_address].append(current_time)
-        return True
-
-    def clean_rate_limits(self) -> None:
-        """Clean up old rate limit entries"""
-        current_time = time.time()
-        for peer_address in list(self.rate_limits.keys()):
-            self.rate_limits[peer_address] = [
-                t for t in self.rate_limits[peer_address]
-                if current_time - t < self.rate_limit_window
-            ]
-            if not self.rate_limits[peer_address]:
-                del self.rate_limits[peer_address] 
\ No newline at end of file
+from typing import Dict, Any, List, Optional, Tuple, BinaryIO, Iterable, Iterator
+import bisect
+import hashlib
+import io
+import math
+import os
+import struct
+import threading
+import time
+import json
+from collections import OrderedDict, deque
+from Crypto.Cipher import AES
+from Crypto.Random import get_random_bytes
+from Crypto.Protocol.KDF import PBKDF2
+from Crypto.Util.Padding import unpad
+
+# Key derivation parameters for newly encrypted data
+KDF_PBKDF2 = 1
+KDF_ITERATIONS = 100000
+SALT_SIZE = 16
+
+# Derived keys kept in memory, and for how many seconds
+KEY_CACHE_SIZE = 16
+KEY_CACHE_TTL = 300
+
+# Plaintext bytes per encrypted chunk
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Distinct from the other file magics, e.g. the Ethash cache's b'XGPE'
+ENCRYPTED_MAGIC = b'XGPC'
+ENCRYPTED_VERSION = 1
+# magic, version, kdf, iterations, salt, nonce prefix, chunk size
+ENCRYPTED_HEADER = struct.Struct('<4sBBI16s8sI')
+# final flag, ciphertext length; followed by the ciphertext and its tag
+CHUNK_HEADER = struct.Struct('<BI')
+TAG_SIZE = 16
+
+class SecurityManager:
+    def __init__(self, iterations: int = KDF_ITERATIONS, key_cache_size: int = KEY_CACHE_SIZE,
+                 key_cache_ttl: float = KEY_CACHE_TTL):
+        self.salt = get_random_bytes(SALT_SIZE)
+        self.iterations = iterations
+        self.key = None
+        self.encrypted_data = {}
+        self.key_cache_size = key_cache_size
+        self.key_cache_ttl = key_cache_ttl
+        self._keys: 'OrderedDict[bytes, Tuple[bytes, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def derive_key(self, password: str, salt: Optional[bytes] = None,
+                   iterations: Optional[int] = None) -> bytes:
+        """Derive a key from a password using PBKDF2, reusing recently derived keys"""
+        salt = self.salt if salt is None else salt
+        iterations = iterations or self.iterations
+        # Cache by a digest so the password itself is not kept
+        cache_key = hashlib.sha256(struct.pack('<I', iterations) + salt + password.encode()).digest()
+        now = time.time()
+        with self._lock:
+            cached = self._keys.get(cache_key)
+            if cached is not None:
+                if cached[1] > now:
+                    self._keys.move_to_end(cache_key)
+                    return cached[0]
+                del self._keys[cache_key]
+
+        key = PBKDF2(
+            password.encode(),
+            salt,
+            dkLen=32,
+            count=iterations
+        )
+        with self._lock:
+            self._keys[cache_key] = (key, now + self.key_cache_ttl)
+            while len(self._keys) > self.key_cache_size:
+                self._keys.popitem(last=False)
+        return key
+
+    def clear_key_cache(self) -> None:
+        """Forget all derived keys"""
+        with self._lock:
+            self._keys.clear()
+
+    def encrypt_data(self, data: Dict[str, Any], password: str) -> bytes:
+        """Encrypt data using AES-256-GCM"""
+        output = io.BytesIO()
+        self.encrypt_stream(io.BytesIO(json.dumps(data).encode()), output, password)
+        return output.getvalue()
+
+    def decrypt_data(self, encrypted_data: bytes, password: str) -> Dict[str, Any]:
+        """Decrypt data using AES-256-GCM"""
+        if encrypted_data[:len(ENCRYPTED_MAGIC)] == ENCRYPTED_MAGIC:
+            output = io.BytesIO()
+            try:
+                self.decrypt_stream(io.BytesIO(encrypted_data), output, password)
+                return json.loads(output.getvalue().decode())
+            except ValueError:
+                # A legacy IV may start with the magic bytes by chance
+                pass
+        return self._decrypt_legacy(encrypted_data, password)
+
+    def _decrypt_legacy(self, encrypted_data: bytes, password: str) -> Dict[str, Any]:
+        """Decrypt data written before the salt was stored with it, using this instance's salt"""
+        # Derived per call so a wrong password is not remembered as the key
+        self.key = self.derive_key(password, self.salt, KDF_ITERATIONS)
+
+        # Extract IV, tag, and ciphertext
+        iv = encrypted_data[:12]
+        tag = encrypted_data[12:28]
+        ciphertext = encrypted_data[28:]
+
+        # Create cipher
+        cipher = AES.new(self.key, AES.MODE_GCM, nonce=iv)
+
+        # Decrypt the data
+        try:
+            decrypted_data = unpad(cipher.decrypt_and_verify(ciphertext, tag), AES.block_size)
+            return json.loads(decrypted_data.decode())
+        except (ValueError, KeyError):
+            raise ValueError("Invalid password or corrupted data")
+
+    def encrypt_stream(self, source: BinaryIO, destination: BinaryIO, password: str,
+                       chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+        """Encrypt a stream chunk by chunk, returning the number of bytes written"""
+        header = ENCRYPTED_HEADER.pack(ENCRYPTED_MAGIC, ENCRYPTED_VERSION, KDF_PBKDF2, self.iterations,
+                                       self.salt, get_random_bytes(8), chunk_size)
+        key = self.derive_key(password, self.salt, self.iterations)
+        destination.write(header)
+        written = len(header)
+
+        # Read one chunk ahead so the last chunk can be marked as final
+        chunk = source.read(chunk_size)
+        index = 0
+        while True:
+            following = source.read(chunk_size) if len(chunk) == chunk_size else b''
+            final = not following
+            ciphertext, tag = self._chunk_cipher(key, header, index, final).encrypt_and_digest(chunk)
+            destination.write(CHUNK_HEADER.pack(final, len(ciphertext)) + ciphertext + tag)
+            written += CHUNK_HEADER.size + len(ciphertext) + TAG_SIZE
+            if final:
+                return written
+            chunk = following
+            index += 1
+
+    def decrypt_stream(self, source: BinaryIO, destination: BinaryIO, password: str) -> int:
+        """Decrypt a stream written by encrypt_stream, returning the number of plaintext bytes
+
+        Chunks are written out as they are verified, so output from a stream that
+        fails part way must be discarded.
+        """
+        header = source.read(ENCRYPTED_HEADER.size)
+        if len(header) < ENCRYPTED_HEADER.size:
+            raise ValueError("Invalid password or corrupted data")
+        magic, version, kdf, iterations, salt, _, chunk_size = ENCRYPTED_HEADER.unpack(header)
+        if magic != ENCRYPTED_MAGIC or version != ENCRYPTED_VERSION or kdf != KDF_PBKDF2:
+            raise ValueError("Unsupported encryption format")
+        key = self.derive_key(password, salt, iterations)
+
+        written = 0
+        index = 0
+        while True:
+            record = source.read(CHUNK_HEADER.size)
+            if len(record) < CHUNK_HEADER.size:
+                # The final chunk is missing, so the data was truncated
+                raise ValueError("Invalid password or corrupted data")
+            final, length = CHUNK_HEADER.unpack(record)
+            if length > chunk_size:
+                raise ValueError("Invalid password or corrupted data")
+            ciphertext = source.read(length)
+            tag = source.read(TAG_SIZE)
+            try:
+                chunk = self._chunk_cipher(key, header, index, bool(final)).decrypt_and_verify(ciphertext, tag)
+            except ValueError:
+                raise ValueError("Invalid password or corrupted data")
+            destination.write(chunk)
+            written += len(chunk)
+            if final:
+                return written
+            index += 1
+
+    @staticmethod
+    def _chunk_cipher(key: bytes, header: bytes, index: int, final: bool):
+        # Chunks are bound to the header, their position and whether they end the stream,
+        # so they cannot be reordered, dropped or moved between streams
+        nonce = header[ENCRYPTED_HEADER.size - 12:ENCRYPTED_HEADER.size - 4] + struct.pack('>I', index)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(header + struct.pack('<QB', index, final))
+        return cipher
+
+    def encrypt_file(self, path: str, encrypted_path: str, password: str) -> int:
+        """Encrypt a file, such as a wallet or chain state backup"""
+        with open(path, 'rb') as source, open(encrypted_path, 'wb') as destination:
+            return self.encrypt_stream(source, destination, password)
+
+    def decrypt_file(self, encrypted_path: str, path: str, password: str) -> int:
+        """Decrypt a file, replacing the destination only once every chunk verified"""
+        tmp_path = path + '.tmp'
+        try:
+            with open(encrypted_path, 'rb') as source, open(tmp_path, 'wb') as destination:
+                written = self.decrypt_stream(source, destination, password)
+        except ValueError:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, path)
+        return written
+
+# Replay protection defaults
+REPLAY_WINDOW = 3600  # 1 hour
+REPLAY_MAX_ENTRIES = 1000000
+# False positive rate of the Bloom filter that covers entries evicted by the cap
+BLOOM_ERROR_RATE = 1e-6
+
+class BloomFilter:
+    """Fixed-size set membership filter with no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: the i-th position is h1 + i * h2
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        array = self._array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+class ReplayStore:
+    """Transaction hashes seen within a time window, expired in insertion order
+
+    Entries live in a dict for exact lookups and in a deque ordered by expiry,
+    so expiring is a pop from the front. The dict is capped at max_entries by
+    evicting the oldest entries early. With a Bloom error rate, evicted hashes
+    are kept in up to two Bloom filters until their window has passed, at a few
+    bytes per hash instead of a dict entry.
+    """
+
+    def __init__(self, window: float = REPLAY_WINDOW, max_entries: int = REPLAY_MAX_ENTRIES,
+                 bloom_error_rate: Optional[float] = None, bloom_capacity: Optional[int] = None):
+        self.window = window
+        self.max_entries = max_entries
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom_capacity = bloom_capacity or max_entries
+        self.evicted = 0
+        self._entries: Dict[str, float] = {}
+        self._expiries: deque = deque()
+        # [filter, latest expiry of a hash in it], oldest first
+        self._blooms: List[List[Any]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, tx_hash: str) -> bool:
+        return self.check(tx_hash)
+
+    def _expire(self, now: float) -> None:
+        expiries = self._expiries
+        entries = self._entries
+        while expiries and expiries[0][0] <= now:
+            expires, tx_hash = expiries.popleft()
+            # A hash added again has a later expiry further back in the queue
+            if entries.get(tx_hash) == expires:
+                del entries[tx_hash]
+        while self._blooms and self._blooms[0][1] <= now:
+            self._blooms.pop(0)
+
+    def _seen(self, tx_hash: str, now: float) -> bool:
+        expires = self._entries.get(tx_hash)
+        if expires is not None:
+            return expires > now
+        # Filters only exist while hashes evicted by the cap are still in their window
+        return any(until > now and tx_hash in bloom for bloom, until in self._blooms)
+
+    def _insert(self, tx_hash: str, now: float) -> None:
+        expires = now + self.window
+        self._entries[tx_hash] = expires
+        self._expiries.append((expires, tx_hash))
+
+        # Evict the oldest entries once over the cap
+        while len(self._entries) > self.max_entries:
+            evicted_expiry, evicted_hash = self._expiries.popleft()
+            if self._entries.get(evicted_hash) == evicted_expiry:
+                del self._entries[evicted_hash]
+                self.evicted += 1
+                if self.bloom_error_rate:
+                    self._bloom_add(evicted_hash, evicted_expiry)
+        # Re-added hashes leave stale queue items behind
+        if len(self._expiries) > 2 * len(self._entries) + 1024:
+            self._expiries = deque(item for item in self._expiries if self._entries.get(item[1]) == item[0])
+
+    def _bloom_add(self, tx_hash: str, expires: float) -> None:
+        if not self._blooms or self._blooms[-1][0].count >= self.bloom_capacity:
+            # Past two full filters the oldest evicted hashes lose their protection
+            self._blooms = self._blooms[-1:] + [[BloomFilter(self.bloom_capacity, self.bloom_error_rate), expires]]
+        current = self._blooms[-1]
+        current[0].add(tx_hash)
+        current[1] = max(current[1], expires)
+
+    def check(self, tx_hash: str, now: Optional[float] = None) -> bool:
+        """Check whether a hash was seen within the window"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._seen(tx_hash, now)
+
+    def add(self, tx_hash: str, now: Optional[float] = None) -> None:
+        """Record a hash, restarting its window if it was already seen"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            self._insert(tx_hash, now)
+
+    def check_and_add(self, tx_hashes: Iterable[str], now: Optional[float] = None) -> List[bool]:
+        """Record the unseen hashes of a batch, returning True for each hash that was new
+
+        A hash repeated within the batch is only new the first time.
+        """
+        now = time.time() if now is None else now
+        results = []
+        with self._lock:
+            self._expire(now)
+            for tx_hash in tx_hashes:
+                fresh = not self._seen(tx_hash, now)
+                if fresh:
+                    self._insert(tx_hash, now)
+                results.append(fresh)
+        return results
+
+    def expire(self, now: Optional[float] = None) -> None:
+        """Drop entries whose window has passed"""
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+
+class TransactionSecurity:
+    def __init__(self, max_entries: int = REPLAY_MAX_ENTRIES, bloom_error_rate: Optional[float] = BLOOM_ERROR_RATE):
+        self.max_replay_window = REPLAY_WINDOW
+        self.replay_protection = ReplayStore(self.max_replay_window, max_entries, bloom_error_rate)
+
+    def add_replay_protection(self, transaction_hash: str) -> None:
+        """Add a transaction to replay protection"""
+        self.replay_protection.add(transaction_hash)
+
+    def check_replay_protection(self, transaction_hash: str) -> bool:
+        """Check if a transaction is protected from replay attacks"""
+        return self.replay_protection.check(transaction_hash)
+
+    def check_and_add_replay_protection(self, transaction_hashes: Iterable[str]) -> List[bool]:
+        """Protect a block's transactions at once, returning False for each replayed one"""
+        return self.replay_protection.check_and_add(transaction_hashes)
+
+    def clean_expired_protection(self) -> None:
+        """Clean up expired replay protection entries"""
+        self.replay_protection.expire()
+
+# Blocks whose timestamps make up the median time past
+MEDIAN_TIME_SPAN = 11
+# Blocks that can be disconnected again on a reorg
+MAX_REORG_DEPTH = 100
+
+class BlockSecurity:
+    """Timing checks against a window of the latest blocks on the current tip
+
+    The window is a ring buffer of (hash, timestamp) with a sorted copy of its
+    timestamps, so the median time past is an index lookup. Every connected
+    block pushes an undo record, so a reorg disconnects blocks back to the
+    fork point and restores the timestamps they pushed out of the window.
+    """
+
+    def __init__(self, window: int = MEDIAN_TIME_SPAN, max_reorg_depth: int = MAX_REORG_DEPTH):
+        self.min_block_time = 15  # Minimum seconds between blocks
+        self.window = window
+        self._hashes: List[Optional[str]] = [None] * window
+        self._times: List[float] = [0.0] * window
+        self._start = 0  # Position of the oldest block in the ring
+        self._size = 0
+        self._sorted: List[float] = []
+        # Block pushed out of the window by each connected block, newest last
+        self._undo: deque = deque(maxlen=max_reorg_depth)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def tip(self) -> Optional[str]:
+        """Hash of the latest connected block"""
+        return self._hashes[(self._start + self._size - 1) % self.window] if self._size else None
+
+    def last_timestamp(self) -> Optional[float]:
+        return self._times[(self._start + self._size - 1) % self.window] if self._size else None
+
+    def median_time_past(self) -> Optional[float]:
+        """Median timestamp of the blocks in the window"""
+        return self._sorted[len(self._sorted) // 2] if self._sorted else None
+
+    def check_block_timing(self, block_hash: str, timestamp: float) -> bool:
+        """Check if a block's timing is valid and connect it if so"""
+        if self._size:
+            if timestamp <= self.median_time_past():
+                return False
+            if timestamp - self.last_timestamp() < self.min_block_time:
+                return False
+        self.connect_block(block_hash, timestamp)
+        return True
+
+    def connect_block(self, block_hash: str, timestamp: float) -> None:
+        """Add a block to the tip without checking it"""
+        if self._size < self.window:
+            position = (self._start + self._size) % self.window
+            self._size += 1
+            evicted = None
+        else:
+            position = self._start
+            evicted = (self._hashes[position], self._times[position])
+            self._sorted.pop(bisect.bisect_left(self._sorted, evicted[1]))
+            self._start = (self._start + 1) % self.window
+        self._hashes[position] = block_hash
+        self._times[position] = timestamp
+        bisect.insort(self._sorted, timestamp)
+        self._undo.append(evicted)
+
+    def disconnect_block(self) -> str:
+        """Remove the tip, e.g. during a reorg, returning its hash"""
+        if not self._undo:
+            raise ValueError("No block to disconnect within the reorg depth")
+        evicted = self._undo.pop()
+        position = (self._start + self._size - 1) % self.window
+        block_hash = self._hashes[position]
+        self._sorted.pop(bisect.bisect_left(self._sorted, self._times[position]))
+        if evicted is None:
+            self._hashes[position] = None
+            self._size -= 1
+        else:
+            # The restored block becomes the oldest in the window again
+            self._hashes[position], self._times[position] = evicted
+            self._start = position
+            bisect.insort(self._sorted, evicted[1])
+        return block_hash
+
+    def rollback_to(self, block_hash: str) -> int:
+        """Disconnect blocks until block_hash is the tip, returning how many were removed"""
+        removed = 0
+        while self.tip != block_hash:
+            self.disconnect_block()
+            removed += 1
+        return removed
+
+    def reset(self, blocks: List[Tuple[str, float]]) -> None:
+        """Start over from the latest (hash, timestamp) pairs of a chain, oldest first"""
+        self._hashes = [None] * self.window
+        self._times = [0.0] * self.window
+        self._start = self._size = 0
+        self._sorted = []
+        for block_hash, timestamp in blocks[-self.window:]:
+            self.connect_block(block_hash, timestamp)
+        self._undo.clear()
+
+    def clean_old_timestamps(self, max_depth: int = MAX_REORG_DEPTH) -> None:
+        """Forget undo records more than max_depth blocks below the tip"""
+        while len(self._undo) > max_depth:
+            self._undo.popleft()
+
+# Rate limit of each endpoint class, as (requests, window in seconds)
+RATE_LIMITS = {
+    'default': (100, 60)  # 100 requests per minute
+}
+RATE_LIMIT_SHARDS = 16
+
+class RateLimiter:
+    """GCRA rate limiter with one timestamp per peer and endpoint class
+
+    Each key stores its theoretical arrival time (TAT): when the next request
+    would be on schedule if requests came at the steady rate. A request is
+    allowed if it is no more than the burst allowance ahead of that schedule.
+    Keys live in sharded LRU dicts; a key whose TAT has passed is identical to
+    an unseen one, so idle keys are dropped from the cold end as requests come in.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, float]]] = None, shards: int = RATE_LIMIT_SHARDS):
+        # Per class: (emission interval, burst allowance); unknown classes fall back to 'default'
+        self.limits: Dict[str, Tuple[float, float]] = {}
+        for endpoint, (requests, window) in dict(RATE_LIMITS, **(limits or {})).items():
+            self.set_limit(endpoint, requests, window)
+        self._shards: List['OrderedDict[Tuple[str, str], float]'] = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def set_limit(self, endpoint: str, requests: int, window: float) -> None:
+        """Allow bursts of up to requests, refilled evenly over the window"""
+        if requests < 1 or window <= 0:
+            raise ValueError(f"Rate limit for {endpoint} needs at least one request per positive window")
+        interval = window / requests
+        self.limits[endpoint] = (interval, interval * requests)
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+    def allow(self, peer: str, endpoint: str = 'default', now: Optional[float] = None) -> bool:
+        """Record a request from a peer, returning False if it is over the limit"""
+        interval, burst = self.limits.get(endpoint) or self.limits['default']
+        now = time.time() if now is None else now
+        key = (peer, endpoint)
+        index = hash(key) % len(self._shards)
+        shard = self._shards[index]
+        with self._locks[index]:
+            tat = max(shard.get(key, now), now) + interval
+            # Allow for rounding in the accumulated arrival times
+            if tat - now > burst * (1 + 1e-9):
+                return False
+            shard[key] = tat
+            shard.move_to_end(key)
+            # Drop a couple of idle keys per request so memory follows the active peers
+            for _ in range(2):
+                oldest = next(iter(shard))
+                if shard[oldest] > now:
+                    break
+                del shard[oldest]
+            return True
+
+    def evict_idle(self, now: Optional[float] = None) -> None:
+        """Drop every key whose limit has fully recovered"""
+        now = time.time() if now is None else now
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                for key in [key for key, tat in shard.items() if tat <= now]:
+                    del shard[key]
+
+class NetworkSecurity:
+    def __init__(self):
+        self.peer_blacklist = set()
+        self.max_requests = 100  # Maximum requests per minute
+        self.rate_limit_window = 60  # 1 minute window
+        self.rate_limiter = RateLimiter(dict(RATE_LIMITS, default=(self.max_requests, self.rate_limit_window)))
+
+    def add_to_blacklist(self, peer_address: str) -> None:
+        """Add a peer to the blacklist"""
+        self.peer_blacklist.add(peer_address)
+
+    def is_blacklisted(self, peer_address: str) -> bool:
+        """Check if a peer is blacklisted"""
+        return peer_address in self.peer_blacklist
+
+    def set_rate_limit(self, endpoint: str, max_requests: int, window: float) -> None:
+        """Configure the rate limit of an endpoint class"""
+        self.rate_limiter.set_limit(endpoint, max_requests, window)
+
+    def check_rate_limit(self, peer_address: str, endpoint: str = 'default') -> bool:
+        """Check if a peer has exceeded the rate limit"""
+        return self.rate_limiter.allow(peer_address, endpoint)
+
+    def clean_rate_limits(self) -> None:
+        """Clean up old rate limit entries"""
+        self.rate_limiter.evict_idle()
\ No newline at end of file
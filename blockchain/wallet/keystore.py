@@ -0,0 +1,168 @@
+import json
+import os
+import struct
+from typing import Dict, Any, List, Optional, Iterator
+from .wallet import Wallet, DEFAULT_KEY_TYPE
+from ..security.security import SecurityManager
+
+KEYSTORE_MAGIC = b'XGPK'
+KEYSTORE_VERSION = 1
+# magic, version, index offset, index length
+KEYSTORE_HEADER = struct.Struct('<4sIQQ')
+
+class Keystore:
+    """Many wallet accounts in one file, with an index so accounts load lazily
+
+    The file holds a fixed header pointing at a JSON index of
+    {address, key_type, offset, length} entries. Each account record is the
+    JSON wallet dictionary at its offset. Only the index is read on open;
+    records are read, and keys parsed, when an account is used. With a
+    password, new records are encrypted; the salt and KDF parameters are
+    stored in each record and the derived key is cached, so only the first
+    account used pays for key derivation.
+    """
+
+    def __init__(self, path: str, password: Optional[str] = None):
+        self.path = path
+        self.password = password
+        self.security = SecurityManager()
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self._wallets: Dict[str, Wallet] = {}
+        self._end = KEYSTORE_HEADER.size  # Where the next record is written
+        self._index_length = 0
+        self._stale = 0  # Bytes taken by replaced indexes
+        if os.path.exists(path):
+            self._load_index()
+
+    def _load_index(self) -> None:
+        with open(self.path, 'rb') as f:
+            header = f.read(KEYSTORE_HEADER.size)
+            if len(header) < KEYSTORE_HEADER.size:
+                raise ValueError(f"Invalid keystore: {self.path}")
+            magic, version, index_offset, index_length = KEYSTORE_HEADER.unpack(header)
+            if magic != KEYSTORE_MAGIC or version != KEYSTORE_VERSION:
+                raise ValueError(f"Invalid keystore: {self.path}")
+            f.seek(index_offset)
+            entries = json.loads(f.read(index_length)) if index_length else []
+        self.index = {entry['address']: entry for entry in entries}
+        self._end = index_offset + index_length
+        self._index_length = index_length
+        self._stale = index_offset - KEYSTORE_HEADER.size - sum(entry['length'] for entry in entries)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def addresses(self) -> List[str]:
+        return list(self.index)
+
+    @property
+    def default_address(self) -> Optional[str]:
+        """The first account added to the keystore"""
+        return next(iter(self.index), None)
+
+    def _read_record(self, f, address: str) -> bytes:
+        entry = self.index.get(address)
+        if entry is None:
+            raise KeyError(f"Account not found: {address}")
+        f.seek(entry['offset'])
+        return f.read(entry['length'])
+
+    def get(self, address: str) -> Wallet:
+        """Load an account, reading its record only on first access"""
+        wallet = self._wallets.get(address)
+        if wallet is None:
+            with open(self.path, 'rb') as f:
+                record = self._read_record(f, address)
+            if self.index[address].get('encrypted'):
+                if self.password is None:
+                    raise ValueError(f"Account is encrypted: {address}")
+                wallet = Wallet.from_dict(self.security.decrypt_data(record, self.password))
+            else:
+                wallet = Wallet.from_dict(json.loads(record))
+            self._wallets[address] = wallet
+        return wallet
+
+    def create(self, key_type: str = DEFAULT_KEY_TYPE) -> Wallet:
+        """Generate a new account and add it to the keystore"""
+        wallet = Wallet(key_type)
+        self.add(wallet)
+        return wallet
+
+    def add(self, *wallets: Wallet) -> None:
+        """Append account records followed by a new index"""
+        for wallet in wallets:
+            if wallet.address in self.index:
+                raise ValueError(f"Account already exists: {wallet.address}")
+        if not os.path.exists(self.path):
+            with open(self.path, 'wb') as f:
+                f.write(KEYSTORE_HEADER.pack(KEYSTORE_MAGIC, KEYSTORE_VERSION, KEYSTORE_HEADER.size, 0))
+
+        records = []
+        entries = list(self.index.values())
+        offset = self._end
+        for wallet in wallets:
+            if self.password is None:
+                record = json.dumps(wallet.to_dict()).encode()
+            else:
+                record = self.security.encrypt_data(wallet.to_dict(), self.password)
+            records.append(record)
+            entries.append({
+                'address': wallet.address,
+                'key_type': wallet.key_type,
+                'encrypted': self.password is not None,
+                'offset': offset,
+                'length': len(record)
+            })
+            offset += len(record)
+        index = json.dumps(entries).encode()
+
+        # The header keeps pointing at the old index until the new one is on disk
+        with open(self.path, 'r+b') as f:
+            f.seek(self._end)
+            f.write(b''.join(records) + index)
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(KEYSTORE_HEADER.pack(KEYSTORE_MAGIC, KEYSTORE_VERSION, offset, len(index)))
+            f.flush()
+            os.fsync(f.fileno())
+
+        for wallet in wallets:
+            self._wallets[wallet.address] = wallet
+        self.index = {entry['address']: entry for entry in entries}
+        self._stale += self._index_length
+        self._end = offset + len(index)
+        self._index_length = len(index)
+        if self._stale > self._end // 2:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the keystore without the space taken by replaced indexes"""
+        tmp_path = self.path + '.tmp'
+        entries = []
+        with open(self.path, 'rb') as src, open(tmp_path, 'wb') as f:
+            offset = KEYSTORE_HEADER.size
+            f.seek(offset)
+            for address, entry in self.index.items():
+                record = self._read_record(src, address)
+                f.write(record)
+                entries.append(dict(entry, offset=offset))
+                offset += len(record)
+            index = json.dumps(entries).encode()
+            f.write(index)
+            f.seek(0)
+            f.write(KEYSTORE_HEADER.pack(KEYSTORE_MAGIC, KEYSTORE_VERSION, offset, len(index)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.index = {entry['address']: entry for entry in entries}
+        self._end = offset + len(index)
+        self._index_length = len(index)
+        self._stale = 0
\ No newline at end of file
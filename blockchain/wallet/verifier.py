@@ -0,0 +1,181 @@
+from Crypto.PublicKey import RSA, ECC
+from Crypto.Signature import PKCS1_v1_5, eddsa
+from Crypto.Hash import SHA256
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+# Parsed public keys kept in memory
+KEY_CACHE_SIZE = 1024
+
+# Verification results kept in memory, keyed by (transaction hash, signature, public key)
+VERDICT_CACHE_SIZE = 100000
+
+# Batches smaller than this are verified in the calling process
+PARALLEL_THRESHOLD = 64
+
+# Signatures per worker task
+CHUNK_SIZE = 256
+
+def is_ed25519_key(public_key: str) -> bool:
+    """Ed25519 public keys are 32 raw bytes in hex, RSA keys are base64 encoded PEM"""
+    return len(public_key) == 64
+
+def address_from_public_key(public_key: str) -> str:
+    """Fixed-length address derived from a hex encoded Ed25519 public key"""
+    return hashlib.sha256(bytes.fromhex(public_key)).hexdigest()[:40]
+
+def signing_payload(transaction: Dict[str, Any]) -> bytes:
+    """Serialized transaction without its signature, as it is signed"""
+    transaction_copy = transaction.copy()
+    if 'signature' in transaction_copy:
+        del transaction_copy['signature']
+    return json.dumps(transaction_copy, sort_keys=True).encode()
+
+_worker_verifier = None
+
+def _verify_chunk(items: List[Tuple[bytes, str, str]]) -> List[bool]:
+    """Verify (payload, signature, public key) items in a worker process"""
+    global _worker_verifier
+    if _worker_verifier is None:
+        _worker_verifier = SignatureVerifier(processes=1)
+    return [_worker_verifier.check(payload, signature, public_key)
+            for payload, signature, public_key in items]
+
+class SignatureVerifier:
+    """Verifies transaction signatures with cached keys and verdicts"""
+
+    def __init__(self, key_cache_size: int = KEY_CACHE_SIZE, verdict_cache_size: int = VERDICT_CACHE_SIZE,
+                 processes: Optional[int] = None):
+        self.key_cache_size = key_cache_size
+        self.verdict_cache_size = verdict_cache_size
+        self.processes = processes or os.cpu_count() or 1
+        self._keys: 'OrderedDict[str, Union[RSA.RsaKey, ECC.EccKey]]' = OrderedDict()
+        self._verdicts: 'OrderedDict[Tuple[bytes, str, str], bool]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def public_key(self, public_key: str) -> Union[RSA.RsaKey, ECC.EccKey]:
+        """Parse an encoded public key, reusing keys parsed before"""
+        with self._lock:
+            key = self._keys.get(public_key)
+            if key is not None:
+                self._keys.move_to_end(public_key)
+                return key
+        if is_ed25519_key(public_key):
+            key = eddsa.import_public_key(bytes.fromhex(public_key))
+        else:
+            key = RSA.import_key(base64.b64decode(public_key))
+        with self._lock:
+            self._keys[public_key] = key
+            while len(self._keys) > self.key_cache_size:
+                self._keys.popitem(last=False)
+        return key
+
+    def check(self, payload: bytes, signature: str, public_key: str) -> bool:
+        """Verify a signature over a signing payload without consulting the verdict cache"""
+        try:
+            key = self.public_key(public_key)
+            if isinstance(key, RSA.RsaKey):
+                return PKCS1_v1_5.new(key).verify(SHA256.new(payload), base64.b64decode(signature))
+            # Ed25519 signs the payload itself and raises if the signature does not match
+            eddsa.new(key, 'rfc8032').verify(payload, base64.b64decode(signature))
+            return True
+        except (ValueError, TypeError, IndexError):
+            # Malformed keys and signatures never verify
+            return False
+
+    def _cached(self, key: Tuple[bytes, str, str]) -> Optional[bool]:
+        with self._lock:
+            verdict = self._verdicts.get(key)
+            if verdict is not None:
+                self._verdicts.move_to_end(key)
+            return verdict
+
+    def _remember(self, key: Tuple[bytes, str, str], verdict: bool) -> None:
+        with self._lock:
+            self._verdicts[key] = verdict
+            while len(self._verdicts) > self.verdict_cache_size:
+                self._verdicts.popitem(last=False)
+
+    @staticmethod
+    def signer_matches(transaction: Dict[str, Any], public_key: str) -> bool:
+        """Check that the sender address belongs to the public key"""
+        if 'from' not in transaction:
+            return True
+        if not is_ed25519_key(public_key):
+            # RSA addresses are the encoded public key itself
+            return transaction['from'] == public_key
+        try:
+            return transaction['from'] == address_from_public_key(public_key)
+        except ValueError:
+            return False
+
+    def verify(self, transaction: Dict[str, Any], signature: str, public_key: str) -> bool:
+        """Verify the signature of a transaction"""
+        if not self.signer_matches(transaction, public_key):
+            return False
+        payload = signing_payload(transaction)
+        # The public key is part of the key so a verdict cannot vouch for another signer
+        key = (SHA256.new(payload).digest(), signature, public_key)
+        verdict = self._cached(key)
+        if verdict is None:
+            verdict = self.check(payload, signature, public_key)
+            self._remember(key, verdict)
+        return verdict
+
+    def verify_batch(self, items: List[Tuple[Dict[str, Any], str, str]]) -> List[bool]:
+        """Verify (transaction, signature, public key) items, spreading cache misses over processes"""
+        results: List[Optional[bool]] = [None] * len(items)
+        misses: Dict[Tuple[bytes, str, str], List[int]] = {}
+        work: List[Tuple[bytes, str, str]] = []
+        for index, (transaction, signature, public_key) in enumerate(items):
+            if not self.signer_matches(transaction, public_key):
+                results[index] = False
+                continue
+            payload = signing_payload(transaction)
+            key = (SHA256.new(payload).digest(), signature, public_key)
+            verdict = self._cached(key)
+            if verdict is not None:
+                results[index] = verdict
+            elif key in misses:
+                misses[key].append(index)
+            else:
+                misses[key] = [index]
+                work.append((payload, signature, public_key))
+
+        if len(work) < PARALLEL_THRESHOLD or self.processes == 1:
+            verdicts = [self.check(payload, signature, public_key)
+                        for payload, signature, public_key in work]
+        else:
+            # Group signatures by signer so each worker parses as few keys as possible
+            order = sorted(range(len(work)), key=lambda i: work[i][2])
+            chunks = [[work[i] for i in order[start:start + CHUNK_SIZE]]
+                      for start in range(0, len(order), CHUNK_SIZE)]
+            verdicts = [False] * len(work)
+            chunk_results = self._get_executor().map(_verify_chunk, chunks)
+            for start, chunk_verdicts in zip(range(0, len(order), CHUNK_SIZE), chunk_results):
+                for offset, verdict in enumerate(chunk_verdicts):
+                    verdicts[order[start + offset]] = verdict
+
+        for (key, indices), verdict in zip(misses.items(), verdicts):
+            self._remember(key, verdict)
+            for index in indices:
+                results[index] = verdict
+        return results
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        return self._executor
+
+    def close(self) -> None:
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
\ No newline at end of file
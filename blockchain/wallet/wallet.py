@@ -1,63 +1,129 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
-from Crypto.Hash import SHA256
-import base64
-import json
-
-class Wallet:
-    def __init__(self):
-        self.private_key = RSA.generate(2048)
-        self.public_key = self.private_key.publickey()
-        self.address = self.generate_address()
-
-    def generate_address(self) -> str:
-        # Generate a simple address from the public key
-        public_key_bytes = self.public_key.export_key()
-        return base64.b64encode(public_key_bytes).decode('utf-8')
-
-    def sign_transaction(self, transaction: dict) -> str:
-        # Create a copy of the transaction without the signature
-        transaction_copy = transaction.copy()
-        if 'signature' in transaction_copy:
-            del transaction_copy['signature']
-
-        # Create a hash of the transaction
-        transaction_hash = SHA256.new(json.dumps(transaction_copy, sort_keys=True).encode())
-
-        # Sign the hash
-        signer = PKCS1_v1_5.new(self.private_key)
-        signature = signer.sign(transaction_hash)
-
-        # Return the signature as a base64 string
-        return base64.b64encode(signature).decode('utf-8')
-
-    def verify_transaction(self, transaction: dict, signature: str, public_key: str) -> bool:
-        # Create a copy of the transaction without the signature
-        transaction_copy = transaction.copy()
-        if 'signature' in transaction_copy:
-            del transaction_copy['signature']
-
-        # Create a hash of the transaction
-        transaction_hash = SHA256.new(json.dumps(transaction_copy, sort_keys=True).encode())
-
-        # Import the public key
-        public_key_obj = RSA.import_key(base64.b64decode(public_key))
-
-        # Verify the signature
-        verifier = PKCS1_v1_5.new(public_key_obj)
-        return verifier.verify(transaction_hash, base64.b64decode(signature))
-
-    def to_dict(self) -> dict:
-        return {
-            'address': self.address,
-            'public_key': self.public_key.export_key().decode('utf-8'),
-            'private_key': self.private_key.export_key().decode('utf-8')
-        }
-
-    @classmethod
-    def from_dict(cls, wallet_dict: dict) -> 'Wallet':
-        wallet = cls()
-        wallet.private_key = RSA.import_key(wallet_dict['private_key'].encode())
-        wallet.public_key = RSA.import_key(wallet_dict['public_key'].encode())
-        wallet.address = wallet_dict['address']
-        return wallet 
\ No newline at end of file
+from Crypto.PublicKey import RSA, ECC
+from Crypto.Signature import PKCS1_v1_5, eddsa
+from Crypto.Hash import SHA256
+import base64
+import json
+from .verifier import SignatureVerifier, address_from_public_key
+
+# Supported key types; Ed25519 keys are generated and verified much faster than RSA
+# keys and give 40 character addresses instead of the base64 encoded public key
+KEY_TYPE_RSA = 'rsa'
+KEY_TYPE_ED25519 = 'ed25519'
+DEFAULT_KEY_TYPE = KEY_TYPE_ED25519
+
+class Wallet:
+    # Shared by all wallets so keys parsed for one are reused by the others
+    verifier = SignatureVerifier()
+
+    def __init__(self, key_type: str = DEFAULT_KEY_TYPE):
+        if key_type not in (KEY_TYPE_RSA, KEY_TYPE_ED25519):
+            raise ValueError(f"Unsupported key type: {key_type}")
+        self.key_type = key_type
+        if key_type == KEY_TYPE_RSA:
+            self.private_key = RSA.generate(2048)
+        else:
+            self.private_key = ECC.generate(curve='Ed25519')
+        self.public_key = self.private_key.public_key()
+        self.address = self.generate_address()
+
+    @property
+    def private_key(self):
+        # Keys loaded by from_dict are only parsed once they are needed
+        if self._private_key is None:
+            self._private_key = self._import_key(self._private_pem)
+        return self._private_key
+
+    @private_key.setter
+    def private_key(self, key) -> None:
+        self._private_key = key
+        self._private_pem = None
+
+    @property
+    def public_key(self):
+        if self._public_key is None:
+            self._public_key = self._import_key(self._public_pem)
+        return self._public_key
+
+    @public_key.setter
+    def public_key(self, key) -> None:
+        self._public_key = key
+        self._public_pem = None
+
+    def _import_key(self, pem: str):
+        if self.key_type == KEY_TYPE_ED25519:
+            return ECC.import_key(pem)
+        return RSA.import_key(pem.encode())
+
+    def generate_address(self) -> str:
+        if self.key_type == KEY_TYPE_ED25519:
+            # Hash the public key into a fixed-length address
+            return address_from_public_key(self.public_key_string())
+        # Generate a simple address from the public key
+        public_key_bytes = self.public_key.export_key()
+        return base64.b64encode(public_key_bytes).decode('utf-8')
+
+    def public_key_string(self) -> str:
+        """Public key as carried in a transaction's 'public_key' field"""
+        if self.key_type == KEY_TYPE_ED25519:
+            return self.public_key.export_key(format='raw').hex()
+        return self.address
+
+    def sign_transaction(self, transaction: dict) -> str:
+        # Create a copy of the transaction without the signature
+        transaction_copy = transaction.copy()
+        if 'signature' in transaction_copy:
+            del transaction_copy['signature']
+        payload = json.dumps(transaction_copy, sort_keys=True).encode()
+
+        if self.key_type == KEY_TYPE_ED25519:
+            # Ed25519 hashes the payload itself
+            signature = eddsa.new(self.private_key, 'rfc8032').sign(payload)
+        else:
+            # Sign a hash of the transaction
+            signer = PKCS1_v1_5.new(self.private_key)
+            signature = signer.sign(SHA256.new(payload))
+
+        # Return the signature as a base64 string
+        return base64.b64encode(signature).decode('utf-8')
+
+    def verify_transaction(self, transaction: dict, signature: str, public_key: str) -> bool:
+        # Parsed keys and verdicts are cached by the shared verifier
+        return self.verifier.verify(transaction, signature, public_key)
+
+    @classmethod
+    def verify_transactions(cls, items: list) -> list:
+        """Verify a batch of (transaction, signature, public key) items"""
+        return cls.verifier.verify_batch(items)
+
+    def _export_key(self, key) -> str:
+        if self.key_type == KEY_TYPE_ED25519:
+            return key.export_key(format='PEM')
+        return key.export_key().decode('utf-8')
+
+    def to_dict(self) -> dict:
+        # Keys that were never parsed are written back as they were loaded
+        public_key = self._public_pem if self._public_pem is not None else self._export_key(self._public_key)
+        private_key = self._private_pem if self._private_pem is not None else self._export_key(self._private_key)
+        return {
+            'key_type': self.key_type,
+            'address': self.address,
+            'public_key': public_key,
+            'private_key': private_key
+        }
+
+    @classmethod
+    def from_dict(cls, wallet_dict: dict) -> 'Wallet':
+        # Wallets saved before key types were added are RSA wallets
+        key_type = wallet_dict.get('key_type', KEY_TYPE_RSA)
+        if key_type not in (KEY_TYPE_RSA, KEY_TYPE_ED25519):
+            raise ValueError(f"Unsupported key type: {key_type}")
+
+        # Skip __init__ so no throwaway key is generated; keys are parsed on first use
+        wallet = cls.__new__(cls)
+        wallet.key_type = key_type
+        wallet._private_key = None
+        wallet._private_pem = wallet_dict['private_key']
+        wallet._public_key = None
+        wallet._public_pem = wallet_dict['public_key']
+        wallet.address = wallet_dict['address']
+        return wallet
\ No newline at end of file
@@ -1,118 +1,150 @@
-from flask import Flask, jsonify, request
-from flask_cors import CORS
-import json
-from ..core.blockchain import Blockchain
-from ..wallet.wallet import Wallet
-from ..miner.miner import Miner
-from ..api.contract_api import contract_api
-
-app = Flask(__name__)
-CORS(app)
-
-# Global variables
-blockchain = None
-wallet = None
-miner = None
-
-# Register blueprints
-app.register_blueprint(contract_api, url_prefix='/api/contracts')
-
-def load_blockchain():
-    global blockchain, wallet, miner
-    try:
-        with open('blockchain.json', 'r') as f:
-            blockchain_data = json.load(f)
-        with open('wallet.json', 'r') as f:
-            wallet_data = json.load(f)
-        
-        blockchain = Blockchain()
-        blockchain.chain = blockchain_data['chain']
-        wallet = Wallet.from_dict(wallet_data)
-        miner = Miner(blockchain, wallet)
-    except FileNotFoundError:
-        blockchain = Blockchain()
-        wallet = Wallet()
-        miner = Miner(blockchain, wallet)
-
-@app.route('/api/blockchain', methods=['GET'])
-def get_blockchain():
-    if blockchain is None:
-        load_blockchain()
-    return jsonify(blockchain.to_dict())
-
-@app.route('/api/wallet', methods=['GET'])
-def get_wallet():
-    if wallet is None:
-        load_blockchain()
-    return jsonify(wallet.to_dict())
-
-@app.route('/api/balance', methods=['GET'])
-def get_balance():
-    if blockchain is None or wallet is None:
-        load_blockchain()
-    balance = blockchain.get_balance(wallet.address)
-    return jsonify({'balance': balance})
-
-@app.route('/api/transaction', methods=['POST'])
-def create_transaction():
-    if blockchain is None or wallet is None:
-        load_blockchain()
-    
-    data = request.get_json()
-    recipient = data.get('recipient')
-    amount = float(data.get('amount'))
-    
-    if not recipient or not amount:
-        return jsonify({'error': 'Missing recipient or amount'}), 400
-    
-    # Create and sign transaction
-    transaction = {
-        'from': wallet.address,
-        'to': recipient,
-        'amount': amount
-    }
-    signature = wallet.sign_transaction(transaction)
-    transaction['signature'] = signature
-    
-    # Add transaction to blockchain
-    blockchain.add_transaction(wallet.address, recipient, amount)
-    
-    # Save updated blockchain
-    with open('blockchain.json', 'w') as f:
-        json.dump(blockchain.to_dict(), f, indent=4)
-    
-    return jsonify({'message': 'Transaction created', 'transaction': transaction})
-
-@app.route('/api/mine', methods=['POST'])
-def start_mining():
-    if miner is None:
-        load_blockchain()
-    
-    if not miner.is_mining:
-        miner.start_mining()
-        return jsonify({'message': 'Mining started'})
-    return jsonify({'message': 'Mining already in progress'})
-
-@app.route('/api/mine/stop', methods=['POST'])
-def stop_mining():
-    if miner is None:
-        load_blockchain()
-    
-    if miner.is_mining:
-        miner.stop_mining()
-        return jsonify({'message': 'Mining stopped'})
-    return jsonify({'message': 'Mining not in progress'})
-
-@app.route('/api/mine/status', methods=['GET'])
-def mining_status():
-    if miner is None:
-        load_blockchain()
-    return jsonify(miner.get_mining_status())
-
-@app.route('/health', methods=['GET'])
-def health_check():
-    return {'status': 'healthy'}
-
-if __name__ == '__main__':
-    load_blockchain()
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+import json
+import math
+import os
+from ..core.blockchain import Blockchain
+from ..wallet.wallet import Wallet
+from ..miner.miner import Miner
+from ..miner.service import MiningService
+from ..api.contract_api import contract_api
+
+app = Flask(__name__)
+CORS(app)
+
+CHAIN_DIR = 'chaindata'
+LEGACY_CHAIN_FILE = 'blockchain.json'
+
+# Worker processes used for mining, defaults to all CPU cores
+MINING_PROCESSES = int(os.environ.get('MINING_PROCESSES', 0)) or None
+
+# Global variables
+blockchain = None
+wallet = None
+miner = None
+mining_service = None
+
+# Register blueprints
+app.register_blueprint(contract_api, url_prefix='/api/contracts')
+
+def load_blockchain():
+    global blockchain, wallet, miner, mining_service
+    blockchain = Blockchain.open(CHAIN_DIR, create=True, legacy_file=LEGACY_CHAIN_FILE)
+    try:
+        with open('wallet.json', 'r') as f:
+            wallet_data = json.load(f)
+        wallet = Wallet.from_dict(wallet_data)
+    except FileNotFoundError:
+        wallet = Wallet()
+    miner = Miner(blockchain, wallet, MINING_PROCESSES)
+    mining_service = MiningService(miner)
+
+@app.route('/api/blockchain', methods=['GET'])
+def get_blockchain():
+    if blockchain is None:
+        load_blockchain()
+    return jsonify(blockchain.to_dict())
+
+@app.route('/api/blocks', methods=['GET'])
+def get_blocks():
+    if blockchain is None:
+        load_blockchain()
+    start = request.args.get('start', 0, type=int)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    blocks = [block.to_dict() for block in blockchain.iter_blocks(start, start + limit)]
+    return jsonify({'height': len(blockchain.chain) - 1, 'blocks': blocks})
+
+@app.route('/api/blocks/<int:height>', methods=['GET'])
+def get_block(height):
+    if blockchain is None:
+        load_blockchain()
+    block = blockchain.get_block(height)
+    if block is None:
+        return jsonify({'error': 'Block not found'}), 404
+    return jsonify(block.to_dict())
+
+@app.route('/api/blocks/hash/<block_hash>', methods=['GET'])
+def get_block_by_hash(block_hash):
+    if blockchain is None:
+        load_blockchain()
+    block = blockchain.get_block_by_hash(block_hash)
+    if block is None:
+        return jsonify({'error': 'Block not found'}), 404
+    return jsonify(block.to_dict())
+
+@app.route('/api/wallet', methods=['GET'])
+def get_wallet():
+    if wallet is None:
+        load_blockchain()
+    return jsonify(wallet.to_dict())
+
+@app.route('/api/balance', methods=['GET'])
+def get_balance():
+    if blockchain is None or wallet is None:
+        load_blockchain()
+    height = request.args.get('height', type=int)
+    try:
+        balance = blockchain.get_balance(wallet.address, height)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'balance': balance})
+
+@app.route('/api/transaction', methods=['POST'])
+def create_transaction():
+    if blockchain is None or wallet is None:
+        load_blockchain()
+    
+    data = request.get_json()
+    recipient = data.get('recipient')
+    if not recipient or not data.get('amount'):
+        return jsonify({'error': 'Missing recipient or amount'}), 400
+    try:
+        amount = float(data['amount'])
+        fee = float(data.get('fee', 0))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Amount and fee must be numbers'}), 400
+    if not (math.isfinite(amount) and math.isfinite(fee)) or amount <= 0 or fee < 0:
+        return jsonify({'error': 'Amount must be positive and fee non-negative'}), 400
+    
+    # Sign the transaction and add it to the blockchain (journaled by the block store)
+    transaction = blockchain.add_transaction(wallet, recipient, amount, fee)
+    if transaction is None:
+        return jsonify({'error': 'Transaction rejected (invalid amount or fee, insufficient balance, duplicate or fee too low)'}), 409
+    mining_service.new_work()
+    
+    return jsonify({'message': 'Transaction created', 'transaction': transaction})
+
+@app.route('/api/mine', methods=['POST'])
+def start_mining():
+    if miner is None:
+        load_blockchain()
+    
+    # The mining service runs in its own thread, so this returns immediately
+    if not mining_service.is_mining:
+        mining_service.start()
+        return jsonify({'message': 'Mining started'})
+    return jsonify({'message': 'Mining already in progress'})
+
+@app.route('/api/mine/stop', methods=['POST'])
+def stop_mining():
+    if miner is None:
+        load_blockchain()
+    
+    if mining_service.is_mining:
+        mining_service.stop()
+        return jsonify({'message': 'Mining stopped'})
+    return jsonify({'message': 'Mining not in progress'})
+
+@app.route('/api/mine/status', methods=['GET'])
+def mining_status():
+    if miner is None:
+        load_blockchain()
+    return jsonify(mining_service.status())
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return {'status': 'healthy'}
+
+if __name__ == '__main__':
+    load_blockchain()
     app.run(host='0.0.0.0', port=5000) 
\ No newline at end of file